@@ -0,0 +1,33 @@
+"""create link short code sequence
+
+Revision ID: e3653f9355ae
+Revises: d1523b119180
+Create Date: 2026-10-18 19:26:26.757854
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e3653f9355ae"
+down_revision: Union[str, Sequence[str], None] = "d1523b119180"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        sa.schema.CreateSequence(
+            sa.Sequence("link_short_code_seq", start=1, maxvalue=62**8 - 1)
+        )
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(sa.schema.DropSequence(sa.Sequence("link_short_code_seq")))
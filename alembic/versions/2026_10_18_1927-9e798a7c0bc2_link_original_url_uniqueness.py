@@ -0,0 +1,62 @@
+"""link original url uniqueness
+
+Revision ID: 9e798a7c0bc2
+Revises: e3653f9355ae
+Create Date: 2026-10-18 19:27:41.519036
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "9e798a7c0bc2"
+down_revision: Union[str, Sequence[str], None] = "e3653f9355ae"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "link",
+        sa.Column("dedup_rank", sa.SmallInteger(), server_default="0", nullable=False),
+    )
+    # Links that were already duplicated keep working, they just move out of
+    # the way of the uniqueness guarantee instead of being deleted.
+    op.execute(
+        """
+        UPDATE link SET dedup_rank = d.rank
+        FROM (
+            SELECT id, row_number() OVER (
+                PARTITION BY user_id, md5(original_url) ORDER BY created_at, id
+            ) - 1 AS rank
+            FROM link
+        ) AS d
+        WHERE link.id = d.id AND d.rank > 0
+        """
+    )
+    op.create_index(
+        "ux_link_original_url",
+        "link",
+        [sa.text("md5(original_url)"), "dedup_rank"],
+        unique=True,
+        postgresql_where=sa.text("user_id IS NULL"),
+    )
+    op.create_index(
+        "ux_link_user_original_url",
+        "link",
+        ["user_id", sa.text("md5(original_url)"), "dedup_rank"],
+        unique=True,
+        postgresql_where=sa.text("user_id IS NOT NULL"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ux_link_user_original_url", table_name="link")
+    op.drop_index("ux_link_original_url", table_name="link")
+    op.drop_column("link", "dedup_rank")
@@ -0,0 +1,196 @@
+"""link original url hash
+
+Revision ID: 30847547d3c9
+Revises: 9e798a7c0bc2
+Create Date: 2026-10-18 19:33:12.402151
+
+"""
+
+from hashlib import blake2b
+from typing import Sequence, Union
+from urllib.parse import urlsplit, urlunsplit
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "30847547d3c9"
+down_revision: Union[str, Sequence[str], None] = "9e798a7c0bc2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+# `src.backend.utils.normalize_url` and `url_digest` as of this revision, so
+# later changes to the application's normalisation do not change what the
+# migration writes.
+_DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+
+def _normalize_url(url: str) -> str:
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    userinfo, at, hostport = parts.netloc.rpartition("@")
+    host, colon, port = hostport.lower().rpartition(":")
+    if not colon or "]" in port:
+        host, port = hostport.lower(), ""
+    if port and _DEFAULT_PORTS.get(scheme) != port:
+        host = f"{host}:{port}"
+    path = parts.path.rstrip("/") if parts.path != "/" else ""
+    query = "&".join(sorted(parts.query.split("&"))) if parts.query else ""
+    return urlunsplit((scheme, f"{userinfo}{at}{host}", path, query, parts.fragment))
+
+
+def _url_digest(url: str) -> bytes:
+    return blake2b(_normalize_url(url).encode("utf8"), digest_size=16).digest()
+
+
+def _backfill(connection: sa.Connection) -> None:
+    select_batch = sa.text(
+        "SELECT id, original_url FROM link "
+        "WHERE CAST(:last_id AS UUID) IS NULL OR id > :last_id "
+        "ORDER BY id LIMIT :limit"
+    )
+    update_batch = sa.text(
+        "UPDATE link SET original_url_hash = v.hash "
+        "FROM unnest(CAST(:ids AS UUID[]), CAST(:hashes AS BYTEA[])) AS v(id, hash) "
+        "WHERE link.id = v.id"
+    )
+    last_id = None
+    while True:
+        rows = connection.execute(
+            select_batch, {"last_id": last_id, "limit": BATCH_SIZE}
+        ).all()
+        if not rows:
+            break
+        connection.execute(
+            update_batch,
+            {
+                "ids": [row.id for row in rows],
+                "hashes": [_url_digest(row.original_url) for row in rows],
+            },
+        )
+        last_id = rows[-1].id
+
+
+def _rerank(connection: sa.Connection) -> None:
+    """Rank spellings that only became equal after normalisation like the
+    exact duplicates before them, the oldest link stays canonical.
+
+    Only the rows whose rank changes are updated, in batches. They first move
+    to a negative rank, so no batch takes a rank another row of the group
+    still holds under the md5 unique indexes.
+    """
+    changed = connection.execute(
+        sa.text(
+            """
+            SELECT id, rank FROM (
+                SELECT id, dedup_rank, row_number() OVER (
+                    PARTITION BY user_id, original_url_hash
+                    ORDER BY dedup_rank, created_at, id
+                ) - 1 AS rank
+                FROM link
+            ) AS d
+            WHERE dedup_rank <> rank
+            """
+        )
+    ).all()
+    update_batch = sa.text(
+        "UPDATE link SET dedup_rank = v.rank "
+        "FROM unnest(CAST(:ids AS UUID[]), CAST(:ranks AS SMALLINT[])) AS v(id, rank) "
+        "WHERE link.id = v.id"
+    )
+    for final in (False, True):
+        for start in range(0, len(changed), BATCH_SIZE):
+            rows = changed[start : start + BATCH_SIZE]
+            connection.execute(
+                update_batch,
+                {
+                    "ids": [row.id for row in rows],
+                    "ranks": [row.rank if final else -row.rank - 1 for row in rows],
+                },
+            )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column("link", sa.Column("original_url_hash", sa.LargeBinary()))
+    # Every statement below commits on its own and the indexes are built
+    # concurrently, so `link` is never locked for the length of the migration.
+    with op.get_context().autocommit_block():
+        _backfill(op.get_bind())
+        _rerank(op.get_bind())
+        # The backfill left no NULL hash. Proving it with a NOT VALID CHECK
+        # reads `link` without blocking writes, and SET NOT NULL reuses the proof.
+        op.execute(
+            "ALTER TABLE link ADD CONSTRAINT link_original_url_hash_not_null "
+            "CHECK (original_url_hash IS NOT NULL) NOT VALID"
+        )
+        op.execute(
+            "ALTER TABLE link VALIDATE CONSTRAINT link_original_url_hash_not_null"
+        )
+        op.alter_column("link", "original_url_hash", nullable=False)
+        op.drop_constraint("link_original_url_hash_not_null", "link", type_="check")
+
+        op.create_index(
+            "ux_link_original_url_hash",
+            "link",
+            ["original_url_hash", "dedup_rank"],
+            unique=True,
+            postgresql_where=sa.text("user_id IS NULL"),
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ux_link_user_original_url_hash",
+            "link",
+            ["user_id", "original_url_hash", "dedup_rank"],
+            unique=True,
+            postgresql_where=sa.text("user_id IS NOT NULL"),
+            postgresql_concurrently=True,
+        )
+        for index in (
+            "ux_link_user_original_url",
+            "ux_link_original_url",
+            op.f("ix_link_original_url"),
+        ):
+            op.drop_index(index, table_name="link", postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ux_link_user_original_url_hash", table_name="link")
+    op.drop_index("ux_link_original_url_hash", table_name="link")
+    # Ranks only ever grew for spellings that are distinct before
+    # normalisation, recompute them for exact duplicates.
+    op.execute(
+        """
+        UPDATE link SET dedup_rank = d.rank
+        FROM (
+            SELECT id, row_number() OVER (
+                PARTITION BY user_id, md5(original_url)
+                ORDER BY dedup_rank, created_at, id
+            ) - 1 AS rank
+            FROM link
+        ) AS d
+        WHERE link.id = d.id AND link.dedup_rank <> d.rank
+        """
+    )
+    op.create_index(
+        op.f("ix_link_original_url"), "link", ["original_url"], unique=False
+    )
+    op.create_index(
+        "ux_link_original_url",
+        "link",
+        [sa.text("md5(original_url)"), "dedup_rank"],
+        unique=True,
+        postgresql_where=sa.text("user_id IS NULL"),
+    )
+    op.create_index(
+        "ux_link_user_original_url",
+        "link",
+        ["user_id", sa.text("md5(original_url)"), "dedup_rank"],
+        unique=True,
+        postgresql_where=sa.text("user_id IS NOT NULL"),
+    )
+    op.drop_column("link", "original_url_hash")
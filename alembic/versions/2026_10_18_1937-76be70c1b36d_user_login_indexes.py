@@ -0,0 +1,42 @@
+"""user login indexes
+
+Revision ID: 76be70c1b36d
+Revises: 30847547d3c9
+Create Date: 2026-10-18 19:37:02.118824
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "76be70c1b36d"
+down_revision: Union[str, Sequence[str], None] = "30847547d3c9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_user_username_lower",
+            "user",
+            [sa.text("lower(username)")],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            "ix_user_email_lower",
+            "user",
+            [sa.text("lower(email)")],
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_user_email_lower", table_name="user")
+    op.drop_index("ix_user_username_lower", table_name="user")
@@ -0,0 +1,34 @@
+"""link expires_at index
+
+Revision ID: 5b2f0c8e7a14
+Revises: 76be70c1b36d
+Create Date: 2026-10-18 19:41:27.530912
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5b2f0c8e7a14"
+down_revision: Union[str, Sequence[str], None] = "76be70c1b36d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f("ix_link_expires_at"),
+            "link",
+            ["expires_at"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_link_expires_at"), table_name="link")
@@ -0,0 +1,59 @@
+"""click analytics
+
+Revision ID: c41d9a6e2f83
+Revises: 5b2f0c8e7a14
+Create Date: 2026-10-18 19:52:44.207316
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c41d9a6e2f83"
+down_revision: Union[str, Sequence[str], None] = "5b2f0c8e7a14"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(sa.schema.CreateSequence(sa.Sequence("click_id_seq")))
+    op.create_table(
+        "click",
+        sa.Column("clicked_at", sa.DateTime(), nullable=False),
+        sa.Column(
+            "id",
+            sa.BigInteger(),
+            server_default=sa.text("nextval('click_id_seq')"),
+            nullable=False,
+        ),
+        sa.Column("short_url", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("referrer", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.Column("user_agent", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+        sa.PrimaryKeyConstraint("clicked_at", "id"),
+        postgresql_partition_by="RANGE (clicked_at)",
+    )
+    # Catches clicks outside of the daily partitions `ClickRollup` creates.
+    op.execute("CREATE TABLE click_default PARTITION OF click DEFAULT")
+    op.create_table(
+        "click_hourly",
+        sa.Column("short_url", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("hour", sa.DateTime(), nullable=False),
+        sa.Column("referrer", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("user_agent", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("clicks", sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint("short_url", "hour", "referrer", "user_agent"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("click_hourly")
+    # Drops every partition with it.
+    op.drop_table("click")
+    op.execute(sa.schema.DropSequence(sa.Sequence("click_id_seq")))
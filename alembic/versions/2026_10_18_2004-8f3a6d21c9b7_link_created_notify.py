@@ -0,0 +1,53 @@
+"""link created notify
+
+Revision ID: 8f3a6d21c9b7
+Revises: c41d9a6e2f83
+Create Date: 2026-10-18 20:04:51.662039
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "8f3a6d21c9b7"
+down_revision: Union[str, Sequence[str], None] = "c41d9a6e2f83"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # One notification per 500 inserted codes, a payload must stay under 8000
+    # bytes. Listened to by `src.backend.bloom.ShortCodeFilter`.
+    op.execute(
+        """
+        CREATE FUNCTION link_created_notify() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM pg_notify('link_created', string_agg(short_url, ','))
+            FROM (
+                SELECT short_url, (row_number() OVER () - 1) / 500 AS chunk
+                FROM inserted
+            ) AS codes
+            GROUP BY chunk;
+            RETURN NULL;
+        END
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER link_created_notify
+        AFTER INSERT ON link
+        REFERENCING NEW TABLE AS inserted
+        FOR EACH STATEMENT EXECUTE FUNCTION link_created_notify()
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER link_created_notify ON link")
+    op.execute("DROP FUNCTION link_created_notify()")
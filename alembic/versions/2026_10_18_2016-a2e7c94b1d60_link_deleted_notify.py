@@ -0,0 +1,53 @@
+"""link deleted notify
+
+Revision ID: a2e7c94b1d60
+Revises: 8f3a6d21c9b7
+Create Date: 2026-10-18 20:16:08.214377
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a2e7c94b1d60"
+down_revision: Union[str, Sequence[str], None] = "8f3a6d21c9b7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Same chunking as `link_created_notify`. Listened to by
+    # `src.backend.sharedtable.SharedTableWriter`.
+    op.execute(
+        """
+        CREATE FUNCTION link_deleted_notify() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM pg_notify('link_deleted', string_agg(short_url, ','))
+            FROM (
+                SELECT short_url, (row_number() OVER () - 1) / 500 AS chunk
+                FROM deleted
+            ) AS codes
+            GROUP BY chunk;
+            RETURN NULL;
+        END
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER link_deleted_notify
+        AFTER DELETE ON link
+        REFERENCING OLD TABLE AS deleted
+        FOR EACH STATEMENT EXECUTE FUNCTION link_deleted_notify()
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER link_deleted_notify ON link")
+    op.execute("DROP FUNCTION link_deleted_notify()")
@@ -0,0 +1,34 @@
+"""link user created_at index
+
+Revision ID: d93b5f0e6a27
+Revises: a2e7c94b1d60
+Create Date: 2026-10-18 20:31:44.107258
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d93b5f0e6a27"
+down_revision: Union[str, Sequence[str], None] = "a2e7c94b1d60"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_link_user_created_at",
+            "link",
+            ["user_id", "created_at", "id"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_link_user_created_at", table_name="link")
@@ -0,0 +1,118 @@
+"""link short url primary key
+
+Revision ID: 23d6f0787207
+Revises: d93b5f0e6a27
+Create Date: 2026-10-18 20:45:37.519804
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "23d6f0787207"
+down_revision: Union[str, Sequence[str], None] = "d93b5f0e6a27"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+# `SHORT_URL_MAX_LENGTH` when this revision was written.
+SHORT_URL_LENGTH = 16
+
+
+def _backfill(connection: sa.Connection) -> None:
+    update_batch = sa.text(
+        "UPDATE link SET code = short_url WHERE short_url IN ("
+        "SELECT short_url FROM link "
+        "WHERE CAST(:last AS VARCHAR) IS NULL OR short_url > :last "
+        "ORDER BY short_url LIMIT :limit"
+        ") RETURNING short_url"
+    )
+    last = None
+    while True:
+        codes = connection.execute(
+            update_batch, {"last": last, "limit": BATCH_SIZE}
+        ).scalars()
+        last = max(codes, default=None)
+        if last is None:
+            break
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # `short_url` becomes a bounded column that is the primary key, in place of
+    # the uuid `id` and its duplicate index. Changing the type in place would
+    # rewrite `link` under an exclusive lock, so a new column is filled in the
+    # background instead and swapped in.
+    op.add_column("link", sa.Column("code", sa.String(SHORT_URL_LENGTH)))
+    op.execute(
+        """
+        CREATE FUNCTION link_code_sync() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.code := NEW.short_url;
+            RETURN NEW;
+        END
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER link_code_sync
+        BEFORE INSERT OR UPDATE OF short_url ON link
+        FOR EACH ROW EXECUTE FUNCTION link_code_sync()
+        """
+    )
+    # Apart from the swap every statement commits on its own and the indexes
+    # are built and dropped concurrently, so `link` is only locked briefly.
+    with op.get_context().autocommit_block():
+        _backfill(op.get_bind())
+        # `code` is validated non-null under a lock that lets writes through,
+        # so SET NOT NULL holds its exclusive lock only to update the catalog.
+        op.execute(
+            "ALTER TABLE link ADD CONSTRAINT link_code_not_null "
+            "CHECK (code IS NOT NULL) NOT VALID"
+        )
+        op.execute("ALTER TABLE link VALIDATE CONSTRAINT link_code_not_null")
+        op.alter_column("link", "code", nullable=False)
+        op.drop_constraint("link_code_not_null", "link", type_="check")
+        op.create_index(
+            "ix_link_code", "link", ["code"], unique=True, postgresql_concurrently=True
+        )
+    # Give up rather than queue every other query behind the exclusive lock.
+    op.execute("SET LOCAL lock_timeout = '5s'")
+    op.execute("DROP TRIGGER link_code_sync ON link")
+    op.execute("DROP FUNCTION link_code_sync()")
+    op.drop_constraint("link_pkey", "link", type_="primary")
+    op.drop_column("link", "short_url")
+    op.alter_column("link", "code", new_column_name="short_url")
+    op.execute(
+        "ALTER TABLE link ADD CONSTRAINT link_pkey PRIMARY KEY USING INDEX ix_link_code"
+    )
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            op.f("ix_link_id"), table_name="link", postgresql_concurrently=True
+        )
+        op.drop_index(
+            op.f("ix_user_id"), table_name="user", postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f("ix_user_id"), "user", ["id"], unique=False)
+    op.create_index(op.f("ix_link_id"), "link", ["id"], unique=False)
+    op.drop_constraint("link_pkey", "link", type_="primary")
+    # Lifting the bound does not rewrite the table.
+    op.alter_column(
+        "link",
+        "short_url",
+        type_=sa.String(),
+        existing_type=sa.String(SHORT_URL_LENGTH),
+        existing_nullable=False,
+    )
+    op.create_index(op.f("ix_link_short_url"), "link", ["short_url"], unique=True)
+    op.create_primary_key("link_pkey", "link", ["id"])
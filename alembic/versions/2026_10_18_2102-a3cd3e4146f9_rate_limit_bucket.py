@@ -0,0 +1,70 @@
+"""rate limit bucket
+
+Revision ID: a3cd3e4146f9
+Revises: 23d6f0787207
+Create Date: 2026-10-18 21:02:19.640518
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+import sqlmodel.sql.sqltypes
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a3cd3e4146f9"
+down_revision: Union[str, Sequence[str], None] = "23d6f0787207"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Unlogged: losing the buckets in a crash only refills them.
+    op.create_table(
+        "rate_limit_bucket",
+        sa.Column("key", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("tokens", sa.Float(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("key"),
+        prefixes=["UNLOGGED"],
+    )
+    # Used by `src.backend.ratelimit.PostgresBuckets`, one round trip per
+    # request; the upsert locks the row, so concurrent takes queue up.
+    op.execute(
+        """
+        CREATE FUNCTION rate_limit_take(
+            bucket_key VARCHAR, rate FLOAT8, burst FLOAT8
+        ) RETURNS FLOAT8
+        LANGUAGE plpgsql AS $$
+        DECLARE
+            now TIMESTAMP := clock_timestamp();
+            available FLOAT8;
+        BEGIN
+            INSERT INTO rate_limit_bucket AS b (key, tokens, updated_at)
+            VALUES (bucket_key, burst, now)
+            ON CONFLICT (key) DO UPDATE SET
+                tokens = LEAST(
+                    burst,
+                    b.tokens + rate * EXTRACT(EPOCH FROM now - b.updated_at)
+                ),
+                updated_at = now
+            RETURNING tokens INTO available;
+            IF available >= 1 THEN
+                UPDATE rate_limit_bucket SET tokens = available - 1
+                WHERE key = bucket_key;
+                RETURN 0;
+            END IF;
+            RETURN (1 - available) / rate;
+        END
+        $$
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP FUNCTION rate_limit_take(VARCHAR, FLOAT8, FLOAT8)")
+    op.drop_table("rate_limit_bucket")
@@ -0,0 +1,56 @@
+"""user disabled notify
+
+Revision ID: 5e1b7c9d2f48
+Revises: a3cd3e4146f9
+Create Date: 2026-10-18 21:10:42.518203
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "5e1b7c9d2f48"
+down_revision: Union[str, Sequence[str], None] = "a3cd3e4146f9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Users change rarely, one notification per row. Listened to by
+    # `src.backend.invalidation.CacheInvalidator` in every worker.
+    op.execute(
+        """
+        CREATE FUNCTION user_disabled_notify() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            PERFORM pg_notify('user_disabled', OLD.id::text);
+            RETURN NULL;
+        END
+        $$
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER user_disabled_notify
+        AFTER UPDATE OF disabled ON "user"
+        FOR EACH ROW WHEN (NEW.disabled AND NOT OLD.disabled)
+        EXECUTE FUNCTION user_disabled_notify()
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER user_deleted_notify
+        AFTER DELETE ON "user"
+        FOR EACH ROW EXECUTE FUNCTION user_disabled_notify()
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute('DROP TRIGGER user_deleted_notify ON "user"')
+    op.execute('DROP TRIGGER user_disabled_notify ON "user"')
+    op.execute("DROP FUNCTION user_disabled_notify()")
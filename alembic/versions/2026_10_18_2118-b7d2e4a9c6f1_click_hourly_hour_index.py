@@ -0,0 +1,36 @@
+"""click_hourly hour index
+
+Revision ID: b7d2e4a9c6f1
+Revises: 5e1b7c9d2f48
+Create Date: 2026-10-18 21:18:05.904417
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b7d2e4a9c6f1"
+down_revision: Union[str, Sequence[str], None] = "5e1b7c9d2f48"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The primary key leads with short_url, so without it every rollup pass
+    # scans the whole table for `max(hour)`.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f("ix_click_hourly_hour"),
+            "click_hourly",
+            ["hour"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f("ix_click_hourly_hour"), table_name="click_hourly")
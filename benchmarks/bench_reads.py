@@ -0,0 +1,107 @@
+"""CPU and allocations per `/details` lookup: ORM entity, Core row, `reads`.
+
+    python -m benchmarks.bench_reads --lookups 5000
+
+Runs against the database from the DB_* settings, migrated to head and seeded
+(`benchmarks.seed`). Each path looks up the same codes one after the other
+and ends with what the endpoint hands to its response model. Prints the
+process CPU per lookup and the peak of memory allocated while one lookup
+runs, under uvloop where it is installed.
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import time
+import tracemalloc
+from collections.abc import Awaitable, Callable
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.backend.db.session import create_engine
+from src.backend.model import Link, LinkRead
+from src.backend.reads import _fetch_details
+
+SELECT_CORE = select(*(getattr(Link, name) for name in LinkRead.model_fields)).where(
+    Link.short_url == bindparam("short_url")
+)
+
+
+async def orm_lookup(engine: AsyncEngine, short_link: str) -> object:
+    async with AsyncSession(engine) as session:
+        result = await session.exec(select(Link).where(Link.short_url == short_link))
+        return LinkRead.model_validate(result.first())
+
+
+async def core_lookup(engine: AsyncEngine, short_link: str) -> object:
+    async with engine.connect() as conn:
+        result = await conn.execute(SELECT_CORE, {"short_url": short_link})
+        return LinkRead.model_validate(result.first()._mapping)  # type: ignore
+
+
+async def reads_lookup(engine: AsyncEngine, short_link: str) -> object:
+    return await _fetch_details(engine, short_link)
+
+
+Lookup = Callable[[AsyncEngine, str], Awaitable[object]]
+
+
+async def measure(
+    engine: AsyncEngine, lookup: Lookup, codes: list[str]
+) -> tuple[float, float]:
+    """(CPU microseconds, peak KiB allocated) per lookup."""
+    for code in codes[:100]:
+        await lookup(engine, code)
+    started = time.process_time()
+    for code in codes:
+        await lookup(engine, code)
+    cpu = (time.process_time() - started) / len(codes) * 1e6
+
+    peaks = 0
+    tracemalloc.start()
+    try:
+        for code in codes[:500]:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            await lookup(engine, code)
+            peaks += tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+    return cpu, peaks / min(len(codes), 500) / 1024
+
+
+async def main(lookups: int) -> None:
+    engine = create_engine()
+    try:
+        async with engine.connect() as conn:
+            result = await conn.execute(
+                text("SELECT short_url FROM link LIMIT :limit"), {"limit": lookups}
+            )
+            codes = list(result.scalars())
+        for name, lookup in (
+            ("orm", orm_lookup),
+            ("core", core_lookup),
+            ("reads", reads_lookup),
+        ):
+            cpu, peak = await measure(engine, lookup, codes)
+            print(f"{name:>6}: {cpu:7.1f} us CPU, {peak:6.1f} KiB peak per lookup")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--lookups", type=int, default=5000)
+    args = parser.parse_args()
+    # As in production; its transports also read into buffers tracemalloc
+    # does not see, which would otherwise dominate the peaks. Not installed
+    # on Windows, see pyproject.toml; asyncio's peaks include those buffers.
+    loop_factory = None
+    if importlib.util.find_spec("uvloop"):
+        import uvloop
+
+        loop_factory = uvloop.new_event_loop
+    asyncio.run(main(args.lookups), loop_factory=loop_factory)
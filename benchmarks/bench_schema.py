@@ -0,0 +1,118 @@
+"""Index size and insert throughput of `link` at two schema revisions.
+
+    python -m benchmarks.bench_schema --links 200000 --before d93b5f0e6a27
+
+Creates two scratch databases on the DB_* server, migrates one to `--before`
+and the other to `--after`, inserts the same links into both with the
+multi-row INSERT of `POST /shorten/batch` and prints rows/s and the size of
+`link` and of every index on it. The databases are dropped afterwards.
+"""
+
+import argparse
+import asyncio
+import time
+from uuid import uuid4
+
+import asyncpg
+from sqlalchemy import Connection, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from alembic import command
+from alembic.config import Config
+from src.backend.config import cfg
+from src.backend.model import Link
+from src.backend.repository import INSERT_LINKS
+from src.backend.shortcode import Scrambler, encode
+from src.backend.utils import url_digest
+
+SERVER_URL = f"{cfg.db_user}:{cfg.db_pass}@{cfg.db_host}:{cfg.db_port}"
+SELECT_SIZES = text(
+    """
+    SELECT c.relname AS name, pg_relation_size(c.oid) AS size
+    FROM pg_class AS c
+    WHERE c.oid = 'link'::regclass
+        OR c.oid IN (SELECT indexrelid FROM pg_index WHERE indrelid = 'link'::regclass)
+    ORDER BY c.relname
+    """
+)
+
+
+def _upgrade(connection: Connection, revision: str) -> None:
+    alembic_cfg = Config("alembic.ini")
+    alembic_cfg.attributes["connection"] = connection
+    command.upgrade(alembic_cfg, revision)
+
+
+async def measure(
+    revision: str, links: int, batch_size: int
+) -> tuple[float, dict[str, int]]:
+    """Rows/s inserting `links` links at `revision`, and the relation sizes."""
+    name = f"bench_schema_{uuid4().hex}"
+    server = await asyncpg.connect(dsn=f"postgresql://{SERVER_URL}")
+    await server.execute(f'CREATE DATABASE "{name}"')
+    engine = create_async_engine(f"postgresql+asyncpg://{SERVER_URL}/{name}")
+    try:
+        async with engine.connect() as conn:
+            await conn.run_sync(_upgrade, revision)
+            await conn.commit()
+        # Codes in production order: scrambled, so inserts land all over the
+        # index on `short_url`.
+        scrambler = Scrambler("bench_schema")
+        created_at, expires_at = Link.next_access_times()
+        elapsed = 0.0
+        async with engine.connect() as conn:
+            for start in range(0, links, batch_size):
+                numbers = range(start, min(start + batch_size, links))
+                urls = [f"https://bench.example.com/schema/{n}" for n in numbers]
+                params = {
+                    "original_urls": urls,
+                    "original_url_hashes": [url_digest(url) for url in urls],
+                    "short_urls": [encode(scrambler.scramble(n)) for n in numbers],
+                    "created_at": created_at,
+                    "expires_at": expires_at,
+                    "user_id": None,
+                }
+                started = time.perf_counter()
+                await conn.execute(INSERT_LINKS[False], params)
+                await conn.commit()
+                elapsed += time.perf_counter() - started
+        async with engine.connect() as conn:
+            await conn.execution_options(isolation_level="AUTOCOMMIT")
+            await conn.execute(text("VACUUM ANALYZE link"))
+            sizes = {row.name: row.size for row in await conn.execute(SELECT_SIZES)}
+        return links / elapsed, sizes
+    finally:
+        await engine.dispose()
+        await server.execute(f'DROP DATABASE "{name}"')
+        await server.close()
+
+
+def _kb(size: int | None) -> str:
+    return "-" if size is None else f"{size / 1024:,.0f} kB"
+
+
+async def main(before: str, after: str, links: int, batch_size: int) -> None:
+    before_rate, before_sizes = await measure(before, links, batch_size)
+    after_rate, after_sizes = await measure(after, links, batch_size)
+    print(f"{'':>32} {before:>14} {after:>14}")
+    print(f"{'insert rows/s':>32} {before_rate:14,.0f} {after_rate:14,.0f}")
+    for name in sorted(before_sizes.keys() | after_sizes.keys()):
+        print(
+            f"{name:>32} {_kb(before_sizes.get(name)):>14}"
+            f" {_kb(after_sizes.get(name)):>14}"
+        )
+    before_total, after_total = (
+        sum(size for name, size in sizes.items() if name != "link")
+        for sizes in (before_sizes, after_sizes)
+    )
+    print(f"{'all indexes':>32} {_kb(before_total):>14} {_kb(after_total):>14}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--before", default="d93b5f0e6a27")
+    parser.add_argument("--after", default="head")
+    parser.add_argument("--links", type=int, default=200_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+    asyncio.run(main(args.before, args.after, args.links, args.batch_size))
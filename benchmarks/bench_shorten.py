@@ -0,0 +1,112 @@
+"""Throughput of concurrent link creation: the old SELECT-then-INSERT path
+against the single INSERT ... ON CONFLICT ... RETURNING in `upsert_link`.
+
+    python -m benchmarks.bench_shorten --requests 2000 --concurrency 50
+
+Runs against the database from the DB_* settings, migrated to head.
+"""
+
+import argparse
+import asyncio
+import time
+from uuid import uuid4
+
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import col, func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.backend.config import cfg
+from src.backend.db.session import create_engine
+from src.backend.model import Link
+from src.backend.repository import (
+    allocate_codes,
+    get_link_by_full_url,
+    get_short_link,
+    upsert_link,
+)
+from src.backend.utils import url_digest
+
+
+async def legacy_create(engine: AsyncEngine, original_url: str) -> None:
+    async with AsyncSession(engine) as session:
+        result = await get_link_by_full_url(session, original_url)
+        if result.first():
+            return
+        short_link = uuid4().hex[:8]
+        while (await get_short_link(session, short_link)).first() is not None:
+            short_link = uuid4().hex[:8]
+        link = Link(
+            original_url=original_url,
+            original_url_hash=url_digest(original_url),
+            short_url=short_link,
+        )
+        session.add(link)
+        # Losing the check-then-insert race used to create a duplicate link,
+        # now the unique index turns it into a failed request.
+        await session.commit()
+        await session.refresh(link)
+
+
+async def upsert_create(engine: AsyncEngine, original_url: str) -> None:
+    (short_link,) = await allocate_codes(engine, 1)
+    await upsert_link(engine, original_url, short_link)
+
+
+async def run(engine, create, urls: list[str], concurrency: int) -> tuple[float, int]:
+    queue: asyncio.Queue[str] = asyncio.Queue()
+    for url in urls:
+        queue.put_nowait(url)
+    failures = 0
+
+    async def worker():
+        nonlocal failures
+        while not queue.empty():
+            try:
+                await create(engine, queue.get_nowait())
+            except IntegrityError:
+                failures += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return time.perf_counter() - started, failures
+
+
+async def main(requests: int, concurrency: int, duplicates: int) -> None:
+    engine = create_engine(
+        cfg.model_copy(update={"db_pool_size": concurrency, "db_max_overflow": 0})
+    )
+    prefix = f"https://bench.example.com/{uuid4().hex}"
+    try:
+        for name, create in (("legacy", legacy_create), ("upsert", upsert_create)):
+            # Every url is requested `duplicates` times in a row, so identical
+            # urls are in flight concurrently.
+            urls = [f"{prefix}/{name}/{n // duplicates}" for n in range(requests)]
+            elapsed, failures = await run(engine, create, urls, concurrency)
+            async with AsyncSession(engine) as session:
+                result = await session.exec(
+                    select(func.count()).where(
+                        col(Link.original_url).startswith(f"{prefix}/{name}/")
+                    )
+                )
+                rows = result.one()
+            print(
+                f"{name:>7}: {requests / elapsed:8.1f} req/s, {failures} failed, "
+                f"{rows} rows for {requests // duplicates} distinct urls"
+            )
+    finally:
+        async with engine.begin() as conn:
+            await conn.execute(
+                delete(Link).where(col(Link.original_url).startswith(prefix))
+            )
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--duplicates", type=int, default=2)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.duplicates))
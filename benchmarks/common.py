@@ -0,0 +1,97 @@
+"""Helpers shared by the benchmark scripts."""
+
+import bisect
+import itertools
+import json
+import platform
+import random
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+# Seeded links are `f"{SEED_PREFIX}/{rank}"`, so a rank maps back to its url.
+SEED_PREFIX = "https://bench.example.com/seed"
+BENCH_USER = "bench"
+BENCH_PASSWORD = "bench-password"
+
+
+def seed_url(rank: int, prefix: str = SEED_PREFIX) -> str:
+    return f"{prefix}/{rank}"
+
+
+class Zipf:
+    """Samples ranks `0..n-1` with probability proportional to `1 / (rank+1)**s`.
+
+    Rank 0 is the hottest key. Sampling is a bisect on precomputed cumulative
+    weights and seeded, so two runs with the same seed hit the same keys.
+    """
+
+    def __init__(self, n: int, s: float = 1.1, seed: int = 0) -> None:
+        self.n = n
+        self._cum_weights = list(
+            itertools.accumulate(1 / (rank + 1) ** s for rank in range(n))
+        )
+        self._random = random.Random(seed)
+
+    def sample(self) -> int:
+        point = self._random.random() * self._cum_weights[-1]
+        return min(bisect.bisect(self._cum_weights, point), self.n - 1)
+
+    def samples(self, k: int) -> list[int]:
+        return [self.sample() for _ in range(k)]
+
+
+def percentile(ordered: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not ordered:
+        return 0.0
+    index = max(0, min(len(ordered) - 1, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(
+    latencies: list[float], errors: int, elapsed: float, cpu: float = 0.0
+) -> dict[str, Any]:
+    """`cpu` is the process time spent, per request it is the cost of a request
+    when the app runs in-process."""
+    ordered = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "cpu_ms_per_request": round(cpu / len(latencies) * 1000, 3)
+        if latencies
+        else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+    }
+
+
+def environment() -> dict[str, str]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = ""
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+
+def save_results(path: Path, results: dict[str, Any]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2) + "\n")
+
+
+def load_results(path: Path) -> dict[str, Any]:
+    return json.loads(path.read_text())
@@ -0,0 +1,69 @@
+"""Compare two `benchmarks.load` result files and flag regressions.
+
+    python -m benchmarks.compare results/baseline.json results/current.json
+
+Exits with status 1 when any scenario lost more than `--threshold` of its
+throughput or got that much slower at p95 or p99.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Any
+
+from benchmarks.common import load_results
+
+# Metric and whether a higher value is better.
+METRICS = (
+    ("throughput", True),
+    ("p50_ms", False),
+    ("p95_ms", False),
+    ("p99_ms", False),
+    ("cpu_ms_per_request", False),
+)
+# p50 is reported but too noisy to fail a run on.
+GATED = {"throughput", "p95_ms", "p99_ms"}
+
+
+def compare(
+    baseline: dict[str, Any], current: dict[str, Any], threshold: float
+) -> list[str]:
+    """Print a comparison table and return the regressions found."""
+    regressions = []
+    for scenario, before in baseline["results"].items():
+        after = current["results"].get(scenario)
+        if after is None:
+            print(f"{scenario}: missing from the current results")
+            continue
+        for metric, higher_is_better in METRICS:
+            if metric not in before or metric not in after:
+                continue
+            old, new = before[metric], after[metric]
+            change = (new - old) / old if old else 0.0
+            worse = -change if higher_is_better else change
+            flag = ""
+            if metric in GATED and worse > threshold:
+                flag = "  REGRESSION"
+                regressions.append(f"{scenario} {metric}: {old} -> {new}")
+            print(
+                f"{scenario:>8} {metric:>10}: {old:>10} -> {new:>10} {change:+7.1%}{flag}"
+            )
+        if after["errors"] > before["errors"]:
+            regressions.append(
+                f"{scenario} errors: {before['errors']} -> {after['errors']}"
+            )
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("current", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.10)
+    args = parser.parse_args()
+    found = compare(
+        load_results(args.baseline), load_results(args.current), args.threshold
+    )
+    for regression in found:
+        print(f"regression: {regression}")
+    sys.exit(1 if found else 0)
@@ -0,0 +1,214 @@
+"""Throughput and latency of redirect, details and shorten under load.
+
+    python -m benchmarks.seed --links 100000
+    python -m benchmarks.load --links 100000 --output results/current.json
+    python -m benchmarks.load --target http://127.0.0.1:8000 --concurrency 200
+
+The default target drives the ASGI `app` in-process, lifespan included, with
+the DB_* settings and rate limiting off; a url drives a running server over
+HTTP (start it with RATE_LIMIT_ENABLED=false to measure shorten unthrottled).
+Redirect and details pick seeded links with a Zipf distribution, shorten
+creates new urls.
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+from uuid import uuid4
+
+import httpx
+from sqlalchemy import delete
+from sqlmodel import col
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from benchmarks.common import (
+    BENCH_PASSWORD,
+    BENCH_USER,
+    SEED_PREFIX,
+    Zipf,
+    environment,
+    save_results,
+    seed_url,
+    summarize,
+)
+from src.backend.db.session import create_engine
+from src.backend.main import app
+from src.backend.model import Link
+from src.backend.ratelimit import rate_limiter
+from src.backend.repository import get_links_by_digests
+from src.backend.utils import url_digest
+
+SCENARIOS = ("redirect", "details", "shorten")
+# (method, url, expected status)
+Call = tuple[str, str, int]
+
+
+async def resolve_codes(ranks: set[int], prefix: str) -> dict[int, str]:
+    """Short codes of the seeded links with the given ranks."""
+    digests = {url_digest(seed_url(rank, prefix)): rank for rank in ranks}
+    engine = create_engine()
+    try:
+        async with AsyncSession(engine) as session:
+            found = await get_links_by_digests(session, list(digests))
+    finally:
+        await engine.dispose()
+    return {digests[digest]: code for digest, code in found.items()}
+
+
+async def drop_links(urls: list[str]) -> None:
+    engine = create_engine()
+    try:
+        async with engine.begin() as conn:
+            await conn.execute(
+                delete(Link).where(
+                    col(Link.original_url_hash).in_([url_digest(url) for url in urls])
+                )
+            )
+    finally:
+        await engine.dispose()
+
+
+async def drive(
+    client: httpx.AsyncClient, calls: list[Call], concurrency: int
+) -> dict[str, Any]:
+    pending: Iterator[Call] = iter(calls)
+    latencies: list[float] = []
+    errors = 0
+
+    async def worker() -> None:
+        nonlocal errors
+        for method, url, expected in pending:
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url)
+                ok = response.status_code == expected
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - started)
+            errors += not ok
+
+    started, cpu_started = time.perf_counter(), time.process_time()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(
+        latencies,
+        errors,
+        time.perf_counter() - started,
+        time.process_time() - cpu_started,
+    )
+
+
+def build_calls(
+    scenario: str, count: int, codes: list[str], run_id: str
+) -> tuple[list[Call], list[str]]:
+    """The requests of one scenario and the urls it creates."""
+    if scenario == "redirect":
+        return [("GET", f"/{code}", 301) for code in codes[:count]], []
+    if scenario == "details":
+        return [("GET", f"/details/{code}", 200) for code in codes[:count]], []
+    urls = [f"https://bench.example.com/{run_id}/{n}" for n in range(count)]
+    calls = [
+        ("POST", str(httpx.URL("/shorten", params={"original_url": url})), 201)
+        for url in urls
+    ]
+    return calls, urls
+
+
+async def run(args: argparse.Namespace) -> dict[str, Any]:
+    zipf = Zipf(args.links, s=args.zipf_s, seed=args.seed)
+    total = args.requests + args.warmup
+    ranks = {name: zipf.samples(total) for name in ("redirect", "details")}
+    codes_by_rank = await resolve_codes(set().union(*ranks.values()), args.prefix)
+    missing = set().union(*ranks.values()) - codes_by_rank.keys()
+    if missing:
+        raise SystemExit(
+            f"{len(missing)} sampled links are not seeded, "
+            f"run `python -m benchmarks.seed --links {args.links}` first"
+        )
+
+    if args.target == "inprocess":
+        transport: httpx.AsyncBaseTransport = httpx.ASGITransport(app=app)
+        base_url = "http://bench"
+    else:
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(max_connections=args.concurrency)
+        )
+        base_url = args.target
+
+    results: dict[str, Any] = {}
+    created: list[str] = []
+    run_id = uuid4().hex
+    async with httpx.AsyncClient(
+        transport=transport,
+        base_url=base_url,
+        auth=(BENCH_USER, BENCH_PASSWORD),
+        timeout=30,
+    ) as client:
+        for scenario in args.scenarios:
+            codes = [codes_by_rank[rank] for rank in ranks.get(scenario, [])]
+            calls, urls = build_calls(scenario, total, codes, run_id)
+            created += urls
+            if args.warmup:
+                await drive(client, calls[: args.warmup], args.concurrency)
+            results[scenario] = await drive(
+                client, calls[args.warmup :], args.concurrency
+            )
+            print(
+                f"{scenario:>8}: {results[scenario]['throughput']:9.1f} req/s  "
+                f"p50 {results[scenario]['p50_ms']:7.2f} ms  "
+                f"p95 {results[scenario]['p95_ms']:7.2f} ms  "
+                f"p99 {results[scenario]['p99_ms']:7.2f} ms  "
+                f"cpu {results[scenario]['cpu_ms_per_request']:6.3f} ms/req  "
+                f"{results[scenario]['errors']} errors"
+            )
+    if created:
+        await drop_links(created)
+
+    return {
+        "environment": environment(),
+        "config": {
+            "target": args.target,
+            "links": args.links,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "zipf_s": args.zipf_s,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    # A log line per request would dominate an in-process run.
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    if args.target == "inprocess":
+        # All shortens come from one user, the limit would be what is measured.
+        rate_limiter.enabled = False
+        async with app.router.lifespan_context(app):
+            report = await run(args)
+    else:
+        report = await run(args)
+    if args.output:
+        save_results(args.output, report)
+        print(f"saved {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", default="inprocess")
+    parser.add_argument("--links", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=10_000)
+    parser.add_argument("--warmup", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--zipf-s", type=float, default=1.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--prefix", default=SEED_PREFIX)
+    parser.add_argument(
+        "--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS)
+    )
+    parser.add_argument("--output", type=Path)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,76 @@
+"""Seed links and the benchmark user for `benchmarks.load`.
+
+    python -m benchmarks.seed --links 100000
+
+Runs against the database from the DB_* settings, migrated to head. Links
+that already exist are skipped, so seeding again only adds the missing ranks.
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from benchmarks.common import BENCH_PASSWORD, BENCH_USER, SEED_PREFIX, seed_url
+from src.backend.db.session import create_engine
+from src.backend.model import User
+from src.backend.repository import allocate_codes, get_user, insert_links
+from src.backend.utils import hash_password, url_digest
+
+
+async def seed_user(session: AsyncSession) -> None:
+    if await get_user(BENCH_USER, session) is not None:
+        return
+    session.add(
+        User(
+            username=BENCH_USER,
+            full_name="Benchmark",
+            email="bench@example.com",
+            hashed_password=hash_password(BENCH_PASSWORD),
+            disabled=False,
+        )
+    )
+    await session.commit()
+
+
+async def seed_links(
+    engine: AsyncEngine, links: int, chunk_size: int, prefix: str
+) -> int:
+    inserted = 0
+    for start in range(0, links, chunk_size):
+        urls = [seed_url(rank, prefix) for rank in range(start, start + chunk_size)]
+        urls = urls[: links - start]
+        codes = await allocate_codes(engine, len(urls))
+        batch = {url_digest(url): (url, code) for url, code in zip(urls, codes)}
+        resolved = await insert_links(engine, batch)
+        # Urls already present keep their code, not the one allocated here.
+        inserted += sum(code == batch[digest][1] for digest, code in resolved.items())
+        print(f"\rseeded {start + len(urls)}/{links}", end="", flush=True)
+    print()
+    return inserted
+
+
+async def main(links: int, chunk_size: int, prefix: str) -> None:
+    engine = create_engine()
+    try:
+        async with AsyncSession(engine) as session:
+            await seed_user(session)
+        started = time.perf_counter()
+        inserted = await seed_links(engine, links, chunk_size, prefix)
+        print(
+            f"inserted {inserted} links in {time.perf_counter() - started:.1f}s "
+            f"({links - inserted} already present)"
+        )
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--links", type=int, default=100_000)
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--prefix", default=SEED_PREFIX)
+    args = parser.parse_args()
+    asyncio.run(main(args.links, args.chunk_size, args.prefix))
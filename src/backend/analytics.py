@@ -0,0 +1,335 @@
+import asyncio
+import contextlib
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import NamedTuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.backend.config import cfg
+from src.backend.model import ClickCount, HourlyClicks, LinkStats
+
+logger = logging.getLogger(__name__)
+
+# Header values are cut to this length, they end up in a primary key.
+MAX_HEADER_LENGTH = 512
+TOP_VALUES = 10
+
+INSERT_CLICKS = text(
+    """
+    INSERT INTO click (clicked_at, short_url, referrer, user_agent)
+    SELECT * FROM unnest(
+        CAST(:clicked_at AS TIMESTAMP[]),
+        CAST(:short_urls AS VARCHAR[]),
+        CAST(:referrers AS VARCHAR[]),
+        CAST(:user_agents AS VARCHAR[])
+    )
+    """
+)
+# Recomputes every hour from `lookback_hours` before the newest rolled up one,
+# so clicks written late into an already rolled up hour are still counted.
+ROLLUP_CLICKS = text(
+    """
+    INSERT INTO click_hourly (short_url, hour, referrer, user_agent, clicks)
+    SELECT short_url, date_trunc('hour', clicked_at),
+        coalesce(referrer, ''), coalesce(user_agent, ''), count(*)
+    FROM click
+    WHERE clicked_at >= coalesce(
+        (SELECT max(hour) FROM click_hourly) - interval '1 hour' * :lookback_hours,
+        '-infinity'
+    )
+    GROUP BY 1, 2, 3, 4
+    ON CONFLICT (short_url, hour, referrer, user_agent)
+    DO UPDATE SET clicks = EXCLUDED.clicks
+    """
+)
+# Taken in the transaction of every partition and rollup step, so only one
+# worker runs a step at a time; the others skip it until their next pass.
+TRY_ROLLUP_LOCK = text("SELECT pg_try_advisory_xact_lock(hashtext('click_rollup'))")
+SELECT_HOURLY = text(
+    """
+    SELECT hour, sum(clicks) AS clicks FROM click_hourly
+    WHERE short_url = :short_url AND hour >= :since
+    GROUP BY hour ORDER BY hour
+    """
+)
+SELECT_TOTAL = text(
+    "SELECT coalesce(sum(clicks), 0) FROM click_hourly WHERE short_url = :short_url"
+)
+_SELECT_TOP = """
+    SELECT {column} AS value, sum(clicks) AS clicks FROM click_hourly
+    WHERE short_url = :short_url AND {column} <> ''
+    GROUP BY {column} ORDER BY clicks DESC, value LIMIT :limit
+"""
+SELECT_TOP_REFERRERS = text(_SELECT_TOP.format(column="referrer"))
+SELECT_TOP_USER_AGENTS = text(_SELECT_TOP.format(column="user_agent"))
+
+
+class ClickEvent(NamedTuple):
+    clicked_at: datetime
+    short_url: str
+    referrer: str | None
+    user_agent: str | None
+
+
+def _header(value: str | None) -> str | None:
+    return value[:MAX_HEADER_LENGTH] if value else None
+
+
+class ClickRecorder:
+    """Collects redirect clicks on a bounded queue and inserts them in batches.
+
+    `record` never waits: when the queue is full the event is dropped and
+    counted. A background task started from `lifespan` writes up to
+    `batch_size` events at a time, at least every `flush_interval` seconds,
+    and finishes its batch when stopped.
+    """
+
+    def __init__(self, queue_size: int, batch_size: int, flush_interval: float):
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: asyncio.Queue[ClickEvent] = asyncio.Queue(queue_size)
+        self._task: asyncio.Task | None = None
+        self._stopping = False
+        # The timeout of the batch `run` is collecting, if any.
+        self._window: asyncio.Timeout | None = None
+        self.recorded = 0
+        self.dropped = 0
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    def record(
+        self, short_url: str, referrer: str | None, user_agent: str | None
+    ) -> bool:
+        event = ClickEvent(
+            datetime.now(timezone.utc).replace(tzinfo=None),
+            short_url,
+            _header(referrer),
+            _header(user_agent),
+        )
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return False
+        self.recorded += 1
+        return True
+
+    def clear(self) -> None:
+        while not self._queue.empty():
+            self._queue.get_nowait()
+
+    async def write(self, engine: AsyncEngine, batch: list[ClickEvent]) -> None:
+        params = {
+            "clicked_at": [event.clicked_at for event in batch],
+            "short_urls": [event.short_url for event in batch],
+            "referrers": [event.referrer for event in batch],
+            "user_agents": [event.user_agent for event in batch],
+        }
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(INSERT_CLICKS, params)
+        except BaseException:
+            # Clicks are best effort, a failed batch is not retried.
+            self.failed += len(batch)
+            raise
+        self.batches += 1
+        self.written += len(batch)
+
+    def _take(self) -> list[ClickEvent]:
+        batch: list[ClickEvent] = []
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def flush(self, engine: AsyncEngine) -> int:
+        """Write everything queued so far."""
+        written = 0
+        while batch := self._take():
+            await self.write(engine, batch)
+            written += len(batch)
+        return written
+
+    async def run(self, engine: AsyncEngine) -> None:
+        while not self._stopping:
+            batch: list[ClickEvent] = []
+            with contextlib.suppress(TimeoutError):
+                async with asyncio.timeout(self.flush_interval) as self._window:
+                    batch.append(await self._queue.get())
+                    while len(batch) < self.batch_size:
+                        batch.append(await self._queue.get())
+            self._window = None
+            if not batch:
+                continue
+            try:
+                await self.write(engine, batch)
+            except Exception:
+                logger.exception("Failed to write %d clicks", len(batch))
+
+    def start(self, engine: AsyncEngine) -> None:
+        self._queue = asyncio.Queue(self.queue_size)
+        self._stopping = False
+        self._task = asyncio.create_task(self.run(engine), name="click-recorder")
+
+    async def stop(self, engine: AsyncEngine) -> None:
+        """Let the background task write its batch, then whatever is still queued.
+
+        The task is not cancelled: the events it already took off the queue
+        would be lost with it.
+        """
+        if self._task is not None:
+            self._stopping = True
+            if self._window is not None and not self._window.expired():
+                # Ends the batch being collected now instead of after the interval.
+                self._window.reschedule(asyncio.get_running_loop().time())
+            await self._task
+            self._task = None
+        try:
+            written = await self.flush(engine)
+        except Exception:
+            # Best effort like every batch, see `write`.
+            logger.exception("Failed to drain the queued clicks")
+        else:
+            logger.info("Drained %d queued clicks", written)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "queued": self._queue.qsize(),
+            "recorded": self.recorded,
+            "dropped": self.dropped,
+            "written": self.written,
+            "batches": self.batches,
+            "failed": self.failed,
+        }
+
+
+class ClickRollup:
+    """Periodically folds the click log into per-link hourly counters.
+
+    Each pass also makes sure the daily `click` partitions for the next
+    `partitions_ahead` days exist, so inserts never land in the default one.
+    Every worker runs it; `TRY_ROLLUP_LOCK` keeps them from doing so at once.
+    """
+
+    def __init__(
+        self, interval: float, lookback_hours: int, partitions_ahead: int
+    ) -> None:
+        self.interval = interval
+        self.lookback_hours = lookback_hours
+        self.partitions_ahead = partitions_ahead
+        self._task: asyncio.Task | None = None
+        self.passes = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_pass_rows = 0
+
+    async def ensure_partitions(
+        self, engine: AsyncEngine, today: date | None = None
+    ) -> None:
+        """Create the missing daily partitions, each day on its own.
+
+        A day that cannot be created (its rows already sit in `click_default`)
+        is logged and counted, the following days are still created.
+        """
+        today = today or datetime.now(timezone.utc).date()
+        for offset in range(self.partitions_ahead + 1):
+            day = today + timedelta(days=offset)
+            try:
+                async with engine.begin() as conn:
+                    if not await conn.scalar(TRY_ROLLUP_LOCK):
+                        self.skipped += 1
+                        return
+                    await conn.execute(
+                        text(
+                            f"CREATE TABLE IF NOT EXISTS click_p{day:%Y%m%d} "
+                            f"PARTITION OF click FOR VALUES "
+                            f"FROM ('{day}') TO ('{day + timedelta(days=1)}')"
+                        )
+                    )
+            except Exception:
+                self.failures += 1
+                logger.exception("Failed to create the click partition of %s", day)
+
+    async def rollup(self, engine: AsyncEngine) -> int:
+        """Fold new clicks into `click_hourly`; 0 when another worker is at it."""
+        async with engine.begin() as conn:
+            if not await conn.scalar(TRY_ROLLUP_LOCK):
+                self.skipped += 1
+                return 0
+            result = await conn.execute(
+                ROLLUP_CLICKS, {"lookback_hours": self.lookback_hours}
+            )
+        self.passes += 1
+        self.last_pass_rows = result.rowcount
+        return result.rowcount
+
+    async def run(self, engine: AsyncEngine) -> None:
+        while True:
+            await self.ensure_partitions(engine)
+            try:
+                await self.rollup(engine)
+            except Exception:
+                self.failures += 1
+                logger.exception("Failed to roll up clicks")
+            await asyncio.sleep(self.interval)
+
+    def start(self, engine: AsyncEngine) -> None:
+        self._task = asyncio.create_task(self.run(engine), name="click-rollup")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "passes": self.passes,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "last_pass_rows": self.last_pass_rows,
+        }
+
+
+async def get_link_stats(
+    session: AsyncSession, short_url: str, hours: int
+) -> LinkStats:
+    """Click counters of `short_url`, read from the hourly rollups only."""
+    params = {"short_url": short_url, "limit": TOP_VALUES}
+    since = datetime.now(timezone.utc).replace(
+        tzinfo=None, minute=0, second=0, microsecond=0
+    ) - timedelta(hours=hours - 1)
+    total = await session.exec(SELECT_TOTAL, params=params)  # type: ignore
+    hourly = await session.exec(
+        SELECT_HOURLY,  # type: ignore
+        params={**params, "since": since},
+    )
+    referrers = await session.exec(SELECT_TOP_REFERRERS, params=params)  # type: ignore
+    user_agents = await session.exec(SELECT_TOP_USER_AGENTS, params=params)  # type: ignore
+    return LinkStats(
+        short_url=short_url,
+        clicks=total.scalar_one(),
+        hourly=[HourlyClicks.model_validate(row._mapping) for row in hourly],
+        referrers=[ClickCount.model_validate(row._mapping) for row in referrers],
+        user_agents=[ClickCount.model_validate(row._mapping) for row in user_agents],
+    )
+
+
+click_recorder = ClickRecorder(
+    queue_size=cfg.click_queue_size,
+    batch_size=cfg.click_batch_size,
+    flush_interval=cfg.click_flush_interval_ms / 1000,
+)
+click_rollup = ClickRollup(
+    interval=cfg.click_rollup_interval,
+    lookback_hours=cfg.click_rollup_lookback_hours,
+    partitions_ahead=cfg.click_partitions_ahead,
+)
@@ -0,0 +1,125 @@
+import json
+from collections.abc import Iterator
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.backend.config import cfg
+from src.backend.repository import (
+    allocate_codes,
+    insert_links,
+    refresh_links_by_digests,
+)
+from src.backend.shortcode import ALLOCATION_ATTEMPTS
+from src.backend.utils import url_digest
+
+NDJSON = "application/x-ndjson"
+
+
+def _url_from_item(item) -> str:
+    if isinstance(item, dict):
+        item = item.get("original_url")
+    if not isinstance(item, str) or not item:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail="Every item must be a url or an object with original_url",
+        )
+    return item
+
+
+def parse_urls(body: bytes, ndjson: bool) -> list[str]:
+    """Read the urls of a batch from a JSON array or from NDJSON lines."""
+    try:
+        if ndjson:
+            items = [json.loads(line) for line in body.splitlines() if line.strip()]
+        else:
+            items = json.loads(body)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Malformed request body"
+        )
+    if not isinstance(items, list):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail="Expected a JSON array of urls",
+        )
+    if len(items) > cfg.shorten_batch_max_size:
+        raise HTTPException(
+            status_code=status.HTTP_413_CONTENT_TOO_LARGE,
+            detail=f"At most {cfg.shorten_batch_max_size} urls per batch",
+        )
+    return [_url_from_item(item) for item in items]
+
+
+async def shorten_many(
+    engine: AsyncEngine, urls: list[str], user_id: UUID | None = None
+) -> dict[str, str]:
+    """Resolve every distinct url of the batch to a short url.
+
+    Urls are deduplicated by their normalised digest. Work is done in chunks:
+    one set-based UPDATE extending the expiry of the links that already exist,
+    as `POST /shorten` does, then one multi-row INSERT for the rest.
+    """
+    digests = {url: url_digest(url) for url in urls}
+    unique: dict[bytes, str] = {}
+    for url, digest in digests.items():
+        unique.setdefault(digest, url)
+    pending = list(unique)
+    size = cfg.shorten_batch_chunk_size
+    resolved: dict[bytes, str] = {}
+    for start in range(0, len(pending), size):
+        chunk = pending[start : start + size]
+        resolved |= await refresh_links_by_digests(engine, chunk, user_id)
+        missing = [digest for digest in chunk if digest not in resolved]
+        for _ in range(ALLOCATION_ATTEMPTS):
+            if not missing:
+                break
+            codes = await allocate_codes(engine, len(missing))
+            links = {
+                digest: (unique[digest], code) for digest, code in zip(missing, codes)
+            }
+            try:
+                resolved |= await insert_links(engine, links, user_id)
+            except IntegrityError:
+                # A fresh code clashed with a legacy one, retry with new codes.
+                continue
+            missing = [digest for digest in missing if digest not in resolved]
+        if missing:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Could not allocate short links",
+            )
+    return {url: resolved[digest] for url, digest in digests.items()}
+
+
+def _render(urls: list[str], resolved: dict[str, str], ndjson: bool) -> Iterator[bytes]:
+    size = cfg.shorten_batch_chunk_size
+    if not ndjson:
+        yield b"["
+    for start in range(0, len(urls), size):
+        lines = (
+            json.dumps({"original_url": url, "short_url": resolved[url]})
+            for url in urls[start : start + size]
+        )
+        if ndjson:
+            yield "".join(f"{line}\n" for line in lines).encode("utf8")
+        else:
+            yield ((b"," if start else b"") + ",".join(lines).encode("utf8"))
+    if not ndjson:
+        yield b"]"
+
+
+def batch_response(urls: list[str], resolved: dict[str, str], ndjson: bool) -> Response:
+    """Results in input order, streamed when the batch is large."""
+    media_type = NDJSON if ndjson else "application/json"
+    body = _render(urls, resolved, ndjson)
+    if len(urls) > cfg.shorten_batch_stream_threshold:
+        return StreamingResponse(
+            body, status_code=status.HTTP_201_CREATED, media_type=media_type
+        )
+    return Response(
+        b"".join(body), status_code=status.HTTP_201_CREATED, media_type=media_type
+    )
@@ -0,0 +1,227 @@
+"""Bloom-filter guard that answers unknown short codes without a query.
+
+A code created through another worker reaches this worker's filter only with
+the `link_created` notification of its commit, a few milliseconds later as a
+rule. Until that notification is processed the code is a definite miss here,
+so a client that creates a link on one worker and follows it on another right
+away can get a 404. Codes created through this worker are added before the
+response is sent and are never missed. Turn the filter off
+(`SHORT_CODE_FILTER_ENABLED`) where that window matters more than the saved
+lookups.
+"""
+
+import asyncio
+import contextlib
+import hashlib
+import logging
+import math
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.backend.config import cfg
+from src.backend.db.session import listen
+
+logger = logging.getLogger(__name__)
+
+# Sent by the `link_created_notify` trigger, a comma separated list of codes.
+CHANNEL = "link_created"
+COUNT_LINKS = text("SELECT count(*) FROM link")
+STREAM_CODES = text("SELECT short_url FROM link")
+
+
+class BloomFilter:
+    """Fixed size Bloom filter of strings: no false negatives, only false positives.
+
+    Sized for `capacity` items at `error_rate`; the k bit positions come from
+    one blake2b digest by double hashing.
+    """
+
+    def __init__(self, capacity: int, error_rate: float) -> None:
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.size = math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf8"), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hashes):
+            yield (first + i * second) % self.size
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(
+            bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+    @property
+    def memory_bytes(self) -> int:
+        return len(self._bits)
+
+    def estimated_error_rate(self) -> float:
+        """False positive rate at the current fill, `(1 - e^(-kn/m))^k`."""
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+
+class ShortCodeFilter:
+    """Per-worker Bloom filter of every existing short code.
+
+    Built by streaming `link` from the database, then kept current by local
+    `add` calls and by LISTENing on `CHANNEL` for codes other workers (or any
+    other writer) inserted. A code missing from the filter certainly does not
+    exist. Deleted codes stay in the filter, costing only a database lookup,
+    until the next rebuild every `rebuild_interval` seconds. Until the first
+    build finishes, and from the moment the listener connection drops until
+    the filter is rebuilt, every code is reported as possibly existing.
+    """
+
+    def __init__(
+        self,
+        error_rate: float,
+        headroom: float,
+        min_capacity: int,
+        rebuild_interval: float,
+    ) -> None:
+        self.error_rate = error_rate
+        self.headroom = headroom
+        self.min_capacity = min_capacity
+        self.rebuild_interval = rebuild_interval
+        self._filter: BloomFilter | None = None
+        # Codes added while a rebuild streams the table, replayed into it.
+        self._building: list[str] | None = None
+        self._task: asyncio.Task | None = None
+        self.lookups = 0
+        self.definite_misses = 0
+        self.notified = 0
+        self.rebuilds = 0
+        self.last_rebuild_seconds = 0.0
+
+    @property
+    def ready(self) -> bool:
+        return self._filter is not None
+
+    def might_exist(self, short_link: str) -> bool:
+        if self._filter is None:
+            return True
+        self.lookups += 1
+        if short_link in self._filter:
+            return True
+        self.definite_misses += 1
+        return False
+
+    def add(self, *short_links: str) -> None:
+        if self._building is not None:
+            self._building.extend(short_links)
+        if self._filter is not None:
+            for short_link in short_links:
+                self._filter.add(short_link)
+
+    def clear(self) -> None:
+        self._filter = None
+        self._building = None
+
+    def _on_notify(self, connection, pid, channel, payload: str) -> None:
+        codes = payload.split(",")
+        self.notified += len(codes)
+        self.add(*codes)
+
+    async def rebuild(self, engine: AsyncEngine) -> BloomFilter:
+        started = time.perf_counter()
+        self._building = []
+        try:
+            async with engine.connect() as conn:
+                count = await conn.scalar(COUNT_LINKS)
+                bloom = BloomFilter(
+                    max(int(count * self.headroom), self.min_capacity),
+                    self.error_rate,
+                )
+                result = await conn.stream(STREAM_CODES)
+                async for rows in result.partitions(10_000):
+                    for (short_link,) in rows:
+                        bloom.add(short_link)
+            for short_link in self._building:
+                bloom.add(short_link)
+        finally:
+            self._building = None
+        self._filter = bloom
+        self.rebuilds += 1
+        self.last_rebuild_seconds = time.perf_counter() - started
+        return bloom
+
+    async def run(self, engine: AsyncEngine) -> None:
+        while True:
+            lost = asyncio.Event()
+
+            def on_lost() -> None:
+                # Notifications are missed from now on, stop trusting the filter.
+                self.clear()
+                lost.set()
+
+            try:
+                async with (
+                    engine.connect() as conn,
+                    listen(conn, {CHANNEL: self._on_notify}, on_lost),
+                ):
+                    # Listening before the build, so no insert is missed.
+                    while not lost.is_set():
+                        await self.rebuild(engine)
+                        if lost.is_set():
+                            break
+                        logger.info(
+                            "Short code filter rebuilt with %d codes in %.1fs",
+                            self._filter.count if self._filter else 0,
+                            self.last_rebuild_seconds,
+                        )
+                        with contextlib.suppress(TimeoutError):
+                            await asyncio.wait_for(lost.wait(), self.rebuild_interval)
+                logger.warning("Short code filter lost its listener, rebuilding")
+            except Exception:
+                logger.exception("Short code filter failed, rebuilding")
+            self.clear()
+            await asyncio.sleep(1)
+
+    def start(self, engine: AsyncEngine) -> None:
+        self._task = asyncio.create_task(self.run(engine), name="short-code-filter")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def stats(self) -> dict[str, int | float | bool]:
+        bloom = self._filter
+        return {
+            "ready": bloom is not None,
+            "codes": bloom.count if bloom else 0,
+            "capacity": bloom.capacity if bloom else 0,
+            "hashes": bloom.hashes if bloom else 0,
+            "memory_bytes": bloom.memory_bytes if bloom else 0,
+            "target_error_rate": self.error_rate,
+            "estimated_error_rate": bloom.estimated_error_rate() if bloom else 0.0,
+            "lookups": self.lookups,
+            "definite_misses": self.definite_misses,
+            "notified": self.notified,
+            "rebuilds": self.rebuilds,
+            "last_rebuild_seconds": self.last_rebuild_seconds,
+        }
+
+
+short_code_filter = ShortCodeFilter(
+    error_rate=cfg.short_code_filter_error_rate,
+    headroom=cfg.short_code_filter_headroom,
+    min_capacity=cfg.short_code_filter_min_capacity,
+    rebuild_interval=cfg.short_code_filter_rebuild_interval,
+)
@@ -0,0 +1,96 @@
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from datetime import datetime
+from typing import NamedTuple
+
+from src.backend.config import cfg
+
+
+class CachedLink(NamedTuple):
+    original_url: str
+    expires_at: datetime
+
+
+class TTLCache[K: Hashable, V]:
+    """Bounded in-process LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: K) -> bool:
+        item = self._data.get(key)
+        return item is not None and item[0] >= self._clock()
+
+    def get(self, key: K) -> V | None:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        deadline, value = item
+        if deadline < self._clock():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: K, value: V) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (self._clock() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def replace(self, key: K, value: V) -> None:
+        """Update the value of a live entry, keeping its deadline."""
+        item = self._data.get(key)
+        if item is not None:
+            self._data[key] = (item[0], value)
+
+    def invalidate(self, key: K) -> None:
+        self._data.pop(key, None)
+
+    def invalidate_if(self, predicate: Callable[[V], bool]) -> int:
+        """Drop every entry whose value matches `predicate`, in O(size)."""
+        stale = [key for key, (_, value) in self._data.items() if predicate(value)]
+        for key in stale:
+            del self._data[key]
+        return len(stale)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+link_cache: TTLCache[str, CachedLink] = TTLCache(
+    maxsize=cfg.link_cache_size, ttl=cfg.link_cache_ttl
+)
@@ -0,0 +1,63 @@
+"""Conditional GET for `/details`.
+
+The strong `ETag` of a response is derived from the version of the links in
+it: after insert only `last_accessed_at` and `expires_at` change (see
+`src.backend.writebehind`), and `id` tells a re-created code apart. A request
+whose `If-None-Match` names it gets an empty 304 instead of the serialised
+links.
+"""
+
+from collections.abc import Iterable
+from hashlib import blake2b
+
+from fastapi import Request, status
+from fastapi.responses import Response
+
+from src.backend.config import cfg
+from src.backend.reads import LinkDetails
+
+_CACHE_HEADERS = {
+    name: value
+    for name, value in (
+        ("cache-control", cfg.details_cache_control),
+        ("vary", cfg.details_vary),
+    )
+    if value
+}
+
+
+def links_etag(links: Iterable[LinkDetails]) -> str:
+    digest = blake2b(digest_size=12)
+    for link in links:
+        digest.update(
+            f"{link.id}|{link.last_accessed_at.isoformat()}|"
+            f"{link.expires_at.isoformat()}\n".encode()
+        )
+    return f'"{digest.hexdigest()}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether the `If-None-Match` of `request` names `etag`."""
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return False
+    if header.strip() == "*":
+        return True
+    # If-None-Match compares weakly, a W/ prefix still matches.
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def not_modified(
+    request: Request, response: Response, links: Iterable[LinkDetails]
+) -> Response | None:
+    """A 304 when the client has `links` already.
+
+    Otherwise puts the `ETag` and cache headers on `response` and returns
+    None, the caller then returns the links.
+    """
+    etag = links_etag(links)
+    headers = {"etag": etag, **_CACHE_HEADERS}
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -1,3 +1,6 @@
+from typing import Literal, Self
+
+from pydantic import model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -10,8 +13,104 @@ class ConfigBase(BaseSettings):
     db_host: str
     db_port: int
     db_name: str
+    db_echo: bool = False
+    db_pool_size: int = 10
+    # Connections opened during the warm-up, at most `db_pool_size`.
+    db_pool_min_size: int = 2
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = False
+    db_statement_cache_size: int = 500
+    # Read replica, unset means every read goes to the primary.
+    db_replica_host: str | None = None
+    db_replica_port: int | None = None
+    db_replica_name: str | None = None
+    db_replica_max_lag: float = 5.0
+    db_replica_check_interval: float = 5.0
+    read_your_writes_window: float = 10.0
     username: str
     password: str
+    server_host: str = "0.0.0.0"
+    server_port: int = 8000
+    server_workers: int = 1
+    server_backlog: int = 2048
+    server_keepalive_timeout: int = 5
+    server_graceful_timeout: float = 30.0
+    # Seconds a terminating worker keeps serving while `/ready` answers 503.
+    server_drain_delay: float = 0.0
+    # Recycle a worker after this many requests (plus a random jitter).
+    server_max_requests: int | None = None
+    server_max_requests_jitter: int = 0
+    server_forwarded_allow_ips: str = "127.0.0.1"
+    server_access_log: bool = False
+    warmup_enabled: bool = True
+    # Most recently used links loaded into `link_cache` before serving.
+    warmup_links: int = 10_000
+    warmup_timeout: float = 30.0
+    link_cache_size: int = 10_000
+    link_cache_ttl: float = 60.0
+    # Cache-Control of 301 redirects, e.g. "public, max-age=300"; unset sends none.
+    redirect_cache_control: str = ""
+    # Cache-Control and Vary of /details responses; "no-cache" lets clients
+    # keep them and revalidate with the ETag. Unset sends none.
+    details_cache_control: str = "no-cache"
+    details_vary: str = ""
+    # Codes per GET /details?codes=... request.
+    details_bulk_max_codes: int = 1000
+    access_flush_interval_ms: int = 500
+    access_flush_max_entries: int = 1000
+    short_code_block_size: int = 1000
+    short_code_scramble: bool = True
+    # Secret of the scrambler, required while it is on: whoever knows it can
+    # reverse codes into ids and enumerate links. The same in every worker.
+    short_code_key: str = ""
+    short_code_filter_enabled: bool = True
+    short_code_filter_error_rate: float = 0.001
+    short_code_filter_headroom: float = 2.0
+    short_code_filter_min_capacity: int = 100_000
+    short_code_filter_rebuild_interval: float = 3600.0
+    # mmap file shared by the workers of a host, e.g. /dev/shm/url-shortener;
+    # unset keeps only the per-worker cache.
+    shared_table_path: str = ""
+    shared_table_slots: int = 1 << 20
+    shared_table_arena_bytes: int = 128 << 20
+    shared_table_warm_limit: int = 200_000
+    shorten_batch_max_size: int = 10_000
+    shorten_batch_chunk_size: int = 1000
+    shorten_batch_stream_threshold: int = 1000
+    user_links_max_page_size: int = 1000
+    # Token buckets: requests per second and burst, per user for /shorten and
+    # per client address for /users/add.
+    rate_limit_enabled: bool = True
+    rate_limit_shorten_rate: float = 10.0
+    rate_limit_shorten_burst: int = 50
+    rate_limit_users_add_rate: float = 0.1
+    rate_limit_users_add_burst: int = 5
+    rate_limit_max_clients: int = 100_000
+    # "postgres" shares the buckets of all workers through an unlogged table.
+    rate_limit_backend: Literal["local", "postgres"] = "local"
+    rate_limit_prune_interval: float = 60.0
+    auth_cache_size: int = 10_000
+    auth_cache_ttl: float = 30.0
+    reaper_interval: float = 60.0
+    reaper_batch_size: int = 1000
+    reaper_batch_pause_ms: int = 50
+    click_queue_size: int = 10_000
+    click_batch_size: int = 1000
+    click_flush_interval_ms: int = 1000
+    click_rollup_interval: float = 60.0
+    click_rollup_lookback_hours: int = 1
+    click_partitions_ahead: int = 2
+
+    @model_validator(mode="after")
+    def _require_short_code_key(self) -> Self:
+        # The key this setting once defaulted to is published, so is no secret.
+        if self.short_code_scramble and self.short_code_key in ("", "url-shortener"):
+            raise ValueError(
+                "SHORT_CODE_KEY must be set to a secret while SHORT_CODE_SCRAMBLE is on"
+            )
+        return self
 
 
 cfg = ConfigBase()
@@ -0,0 +1,142 @@
+import asyncio
+import contextlib
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.backend.cache import TTLCache
+from src.backend.config import ConfigBase, cfg
+from src.backend.db.session import create_engine
+
+logger = logging.getLogger(__name__)
+
+# Seconds the replica is behind; 0 when it has replayed everything it received
+# or is not in recovery at all (a stand-in database in tests).
+REPLICA_LAG = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp())
+    END
+    """
+)
+
+
+class ReadRouter:
+    """Chooses between the primary and the replica engine for read-only routes.
+
+    A background task checks the replica every `check_interval` seconds and
+    reads go to the primary while it is unreachable or more than `max_lag`
+    seconds behind. Keys passed to `mark_written` are read from the primary for
+    `window` seconds, so a link resolves right after it was shortened. The
+    window is per process: a link the replica misses is read again from the
+    primary (see `fallback_engine`), whichever worker wrote it.
+    """
+
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replica: AsyncEngine | None,
+        max_lag: float,
+        check_interval: float,
+        window: float,
+        window_size: int = 100_000,
+    ) -> None:
+        self.primary = primary
+        self.replica = replica
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.recent_writes: TTLCache[str, bool] = TTLCache(
+            maxsize=window_size, ttl=window
+        )
+        self._task: asyncio.Task | None = None
+        # Trusted until the first `check`, which `lifespan` runs on startup.
+        self.healthy = replica is not None
+        self.lag: float | None = None
+        self.checks = 0
+        self.check_failures = 0
+        self.replica_reads = 0
+        self.primary_reads = 0
+        self.replica_misses = 0
+
+    def mark_written(self, *keys: str) -> None:
+        for key in keys:
+            self.recent_writes.set(key, True)
+
+    def engine_for(self, *keys: str | None) -> AsyncEngine:
+        if (
+            self.replica is None
+            or not self.healthy
+            or any(key is not None and key in self.recent_writes for key in keys)
+        ):
+            self.primary_reads += 1
+            return self.primary
+        self.replica_reads += 1
+        return self.replica
+
+    async def check(self) -> bool:
+        if self.replica is None:
+            return False
+        self.checks += 1
+        try:
+            async with self.replica.connect() as conn:
+                lag = await conn.scalar(REPLICA_LAG)
+        except Exception:
+            self.check_failures += 1
+            self.lag = None
+            logger.exception("Replica health check failed")
+        else:
+            self.lag = None if lag is None else float(lag)
+        healthy = self.lag is not None and self.lag <= self.max_lag
+        if healthy != self.healthy:
+            logger.warning(
+                "Replica is %s (lag %s s)",
+                "healthy" if healthy else "unhealthy",
+                self.lag,
+            )
+        self.healthy = healthy
+        return healthy
+
+    async def run(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.check()
+
+    def start(self) -> None:
+        if self.replica is not None:
+            self._task = asyncio.create_task(self.run(), name="replica-check")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def stats(self) -> dict[str, int | float | bool | None]:
+        return {
+            "configured": self.replica is not None,
+            "healthy": self.healthy,
+            "lag": self.lag,
+            "checks": self.checks,
+            "check_failures": self.check_failures,
+            "replica_reads": self.replica_reads,
+            "primary_reads": self.primary_reads,
+            "replica_misses": self.replica_misses,
+            "recent_writes": len(self.recent_writes),
+        }
+
+
+def create_read_router(primary: AsyncEngine, config: ConfigBase = cfg) -> ReadRouter:
+    replica = None
+    if config.db_replica_host or config.db_replica_port or config.db_replica_name:
+        replica = create_engine(config, replica=True)
+    return ReadRouter(
+        primary,
+        replica,
+        max_lag=config.db_replica_max_lag,
+        check_interval=config.db_replica_check_interval,
+        window=config.read_your_writes_window,
+    )
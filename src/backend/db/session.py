@@ -1,13 +1,155 @@
-from sqlalchemy.ext.asyncio import create_async_engine
+import contextlib
+import time
+from collections.abc import AsyncIterator, Callable
+from typing import Any
+
+from fastapi import Request
+from sqlalchemy import URL
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from src.backend.config import ConfigBase
+from src.backend.config import ConfigBase, cfg
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that also records how long checkouts wait for a connection."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.acquisitions = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            self.acquisitions += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+
+def database_url(config: ConfigBase = cfg, replica: bool = False) -> URL:
+    """The primary's url, or the replica's with unset replica fields taken from it."""
+    host, port, name = config.db_host, config.db_port, config.db_name
+    if replica:
+        host = config.db_replica_host or host
+        port = config.db_replica_port or port
+        name = config.db_replica_name or name
+    return URL.create(
+        "postgresql+asyncpg",
+        username=config.db_user,
+        password=config.db_pass,
+        host=host,
+        port=port,
+        database=name,
+        query={"prepared_statement_cache_size": str(config.db_statement_cache_size)},
+    )
+
+
+def create_engine(config: ConfigBase = cfg, replica: bool = False) -> AsyncEngine:
+    """The application's engine; every pool setting comes from `ConfigBase`."""
+    return create_async_engine(
+        database_url(config, replica),
+        echo=config.db_echo,
+        poolclass=InstrumentedPool,
+        pool_size=config.db_pool_size,
+        max_overflow=config.db_max_overflow,
+        pool_timeout=config.db_pool_timeout,
+        pool_recycle=config.db_pool_recycle,
+        pool_pre_ping=config.db_pool_pre_ping,
+        # asyncpg's own cache, used by the statements `src.backend.reads` runs
+        # on the driver connection; 0 prepares none of them either.
+        connect_args={"statement_cache_size": config.db_statement_cache_size},
+    )
+
+
+def pool_stats(engine: AsyncEngine) -> dict[str, int | float]:
+    pool = engine.sync_engine.pool
+    stats: dict[str, int | float] = {
+        "size": getattr(pool, "size", lambda: 0)(),
+        "checked_in": getattr(pool, "checkedin", lambda: 0)(),
+        "checked_out": getattr(pool, "checkedout", lambda: 0)(),
+        "overflow": getattr(pool, "overflow", lambda: 0)(),
+    }
+    if isinstance(pool, InstrumentedPool):
+        stats["acquisitions"] = pool.acquisitions
+        stats["wait_seconds_total"] = pool.wait_seconds_total
+        stats["wait_seconds_max"] = pool.wait_seconds_max
+    return stats
+
+
+async def driver_connection(conn: AsyncConnection) -> Any:
+    """The asyncpg connection under the pooled `conn`."""
+    driver = (await conn.get_raw_connection()).driver_connection
+    if driver is None:
+        raise RuntimeError("The pooled connection has no driver connection")
+    return driver
+
+
+@contextlib.asynccontextmanager
+async def listen(
+    conn: AsyncConnection,
+    callbacks: dict[str, Callable[..., None]],
+    on_lost: Callable[[], None],
+) -> AsyncIterator[Any]:
+    """LISTEN on `conn` for the block, `on_lost` runs when the connection drops.
+
+    The listeners are removed before `conn` goes back to the pool, so the
+    next user of the connection is not notified.
+    """
+    driver = await driver_connection(conn)
+
+    def terminated(_) -> None:
+        on_lost()
+
+    driver.add_termination_listener(terminated)
+    try:
+        for channel, callback in callbacks.items():
+            await driver.add_listener(channel, callback)
+        yield driver
+    finally:
+        driver.remove_termination_listener(terminated)
+        if not driver.is_closed():
+            for channel, callback in callbacks.items():
+                await driver.remove_listener(channel, callback)
+
+
+async def get_session(request: Request):
+    async with AsyncSession(request.app.state.engine) as session:
+        yield session
+
+
+def read_engine(state, *short_links: str | None) -> AsyncEngine:
+    """The engine reads of `short_links` go to given the app's `state`.
+
+    The replica when `ReadRouter` allows; any recently written short link
+    pins the read to the primary.
+    """
+    router = getattr(state, "read_router", None)
+    if router is None:
+        return state.engine
+    return router.engine_for(*short_links)
+
+
+def fallback_engine(state, engine: AsyncEngine) -> AsyncEngine | None:
+    """The primary to re-read from after a miss on `engine`, None if it is one.
 
-cfg = ConfigBase()  # type: ignore
-DB_URL = f"postgresql+asyncpg://{cfg.db_user}:{cfg.db_pass}@{cfg.db_host}:{cfg.db_port}/{cfg.db_name}"
-engine = create_async_engine(DB_URL, echo=True)
+    A link shortened through another worker is outside this process's
+    read-your-writes window, the replica may not have it yet.
+    """
+    router = getattr(state, "read_router", None)
+    if router is None or engine is router.primary:
+        return None
+    router.replica_misses += 1
+    return router.primary
 
 
-async def get_session():
+async def get_read_session(request: Request):
+    """A session for read-only routes, on `read_engine` for the `short_link`."""
+    engine = read_engine(request.app.state, request.path_params.get("short_link"))
     async with AsyncSession(engine) as session:
         yield session
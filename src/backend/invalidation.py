@@ -0,0 +1,87 @@
+import asyncio
+import contextlib
+import logging
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.backend.cache import link_cache
+from src.backend.db.session import listen
+from src.backend.users import credential_cache, invalidate_user
+
+logger = logging.getLogger(__name__)
+
+# Sent by the `link_deleted_notify` trigger, a comma separated list of codes.
+LINK_DELETED_CHANNEL = "link_deleted"
+# Sent by the `user_disabled_notify` triggers, the id of one user.
+USER_DISABLED_CHANNEL = "user_disabled"
+
+
+class CacheInvalidator:
+    """Evicts this worker's cached entries that writes elsewhere made stale.
+
+    Every worker LISTENs on its own connection, so a link deleted through
+    another worker (or any other writer) stops redirecting from this one's
+    `link_cache` as soon as the notification arrives, and a user disabled or
+    deleted there stops authenticating from this one's `credential_cache`.
+    Notifications sent while the listener is down are lost: both caches are
+    cleared once it is listening again.
+    """
+
+    def __init__(self) -> None:
+        self._task: asyncio.Task | None = None
+        self.listening = False
+        self.notified = 0
+        self.reconnects = 0
+
+    def _on_link_deleted(self, connection, pid, channel, payload: str) -> None:
+        codes = payload.split(",")
+        self.notified += len(codes)
+        for short_link in codes:
+            link_cache.invalidate(short_link)
+
+    def _on_user_disabled(self, connection, pid, channel, payload: str) -> None:
+        self.notified += 1
+        invalidate_user(UUID(payload))
+
+    async def run(self, engine: AsyncEngine) -> None:
+        callbacks = {
+            LINK_DELETED_CHANNEL: self._on_link_deleted,
+            USER_DISABLED_CHANNEL: self._on_user_disabled,
+        }
+        while True:
+            lost = asyncio.Event()
+            try:
+                async with engine.connect() as conn, listen(conn, callbacks, lost.set):
+                    self.listening = True
+                    if self.reconnects:
+                        link_cache.clear()
+                        credential_cache.clear()
+                    await lost.wait()
+                logger.warning("Cache invalidator lost its listener, reconnecting")
+            except Exception:
+                logger.exception("Cache invalidator failed, reconnecting")
+            finally:
+                self.listening = False
+            self.reconnects += 1
+            await asyncio.sleep(1)
+
+    def start(self, engine: AsyncEngine) -> None:
+        self._task = asyncio.create_task(self.run(engine), name="cache-invalidator")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def stats(self) -> dict[str, int | bool]:
+        return {
+            "listening": self.listening,
+            "notified": self.notified,
+            "reconnects": self.reconnects,
+        }
+
+
+cache_invalidator = CacheInvalidator()
@@ -1,49 +1,114 @@
 import logging
 from contextlib import asynccontextmanager
-from datetime import datetime, timezone
 from typing import Annotated
-from uuid import UUID, uuid4
+from uuid import UUID
 
 import uvicorn
-from fastapi import Depends, FastAPI, HTTPException, status
-from fastapi.responses import RedirectResponse
-from sqlalchemy.ext.asyncio import create_async_engine
-from sqlmodel.ext.asyncio.session import AsyncSession
-
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
+
+from src.backend.analytics import click_recorder, click_rollup, get_link_stats
+from src.backend.batch import NDJSON, batch_response, parse_urls, shorten_many
+from src.backend.bloom import short_code_filter
+from src.backend.cache import link_cache
+from src.backend.conditional import not_modified
 from src.backend.config import cfg
-from src.backend.model import Link, UserCreate
+from src.backend.db.routing import create_read_router
+from src.backend.db.session import (
+    create_engine,
+    fallback_engine,
+    pool_stats,
+    read_engine,
+)
+from src.backend.deps import ReadSessionDep, SessionDep
+from src.backend.invalidation import cache_invalidator
+from src.backend.metrics import (
+    MetricsMiddleware,
+    instrument_engine,
+    mark_process_dead,
+    render_metrics,
+)
+from src.backend.model import Link, LinkPage, LinkRead, LinkStats, UserCreate
+from src.backend.reaper import reaper
+from src.backend.ratelimit import ClientRateLimit, UserRateLimit, rate_limiter
+from src.backend.reads import (
+    LinkDetails,
+    LinkState,
+    details_flight,
+    find_link,
+    find_links,
+    get_user_links,
+    redirect_flight,
+)
+from src.backend.redirect import RawRoute, redirect_to_original_url
 from src.backend.repository import (
     creating_user,
-    get_link_by_full_url,
     get_short_link,
+    shorten,
+    shorten_flight,
 )
-from src.backend.users import User, get_current_active_user
+from src.backend.sharedtable import create_shared_writer
+from src.backend.transfer import MEDIA_TYPES, Format, export_links
+from src.backend.users import User, credential_cache, get_current_active_user
+from src.backend.warmup import warm_up
+from src.backend.writebehind import access_buffer
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-DB_URL = f"postgresql+asyncpg://{cfg.db_user}:{cfg.db_pass}@{cfg.db_host}:{cfg.db_port}/{cfg.db_name}"
-
-
-async def get_session():
-    async with AsyncSession(app.state.engine) as session:
-        yield session
-
-
-SessionDep = Annotated[AsyncSession, Depends(get_session)]
 UserDep = Annotated[User, Depends(get_current_active_user)]
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    app.state.engine = create_async_engine(DB_URL, echo=True)
+    app.state.engine = create_engine()
+    instrument_engine(app.state.engine)
+    app.state.read_router = create_read_router(app.state.engine)
+    if app.state.read_router.replica is not None:
+        instrument_engine(app.state.read_router.replica, "replica")
     app.state.logined = False
+    await app.state.read_router.check()
+    app.state.read_router.start()
+    access_buffer.start(app.state.engine)
+    cache_invalidator.start(app.state.engine)
+    reaper.start(app.state.engine)
+    click_recorder.start(app.state.engine)
+    click_rollup.start(app.state.engine)
+    rate_limiter.start(app.state.engine)
+    if cfg.short_code_filter_enabled:
+        short_code_filter.start(app.state.engine)
+    app.state.shared_writer = create_shared_writer()
+    if app.state.shared_writer is not None:
+        app.state.shared_links = app.state.shared_writer.table
+        app.state.shared_writer.start(app.state.engine)
+    # Requests are only accepted, and `/ready` only answers 200, afterwards.
+    app.state.warmup = await warm_up(app.state) if cfg.warmup_enabled else {}
+    app.state.ready = True
     logger.info("Start app")
 
     yield
 
+    app.state.ready = False
+    if app.state.shared_writer is not None:
+        app.state.shared_links = None
+        await app.state.shared_writer.stop()
+        app.state.shared_writer.table.close()
+    await short_code_filter.stop()
+    await cache_invalidator.stop()
+    await rate_limiter.stop()
+    await reaper.stop()
+    await click_rollup.stop()
+    await click_recorder.stop(app.state.engine)
+    await access_buffer.stop(app.state.engine)
+    await app.state.read_router.stop()
+    if app.state.read_router.replica is not None:
+        await app.state.read_router.replica.dispose()
+    await app.state.engine.dispose()
+    mark_process_dead()
+
 
 app = FastAPI(title="Url shortener", lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 
 
 @app.get("/health", status_code=200)
@@ -51,84 +116,212 @@ def health_check():
     return {"status": "ok"}
 
 
-@app.get("/details/{short_link}", response_model=Link)
-async def get_details(short_link: str, session: SessionDep) -> Link:
-    result = await get_short_link(session, short_link)
-    link = result.first()
-    if not link:
-        raise HTTPException(status_code=404, detail="Link not found")
-    return link
+@app.get("/ready", status_code=200)
+def readiness_check(request: Request, response: Response):
+    """Answers 503 until the lifespan startup finished and once draining began."""
+    if getattr(request.app.state, "ready", False):
+        return {"status": "ready"}
+    response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"status": "unavailable"}
 
 
-async def short_lnk_generator(session: SessionDep) -> str:
-    short_link: str = uuid4().hex[:8]
-    while True:
-        check_short_link = await get_short_link(session, short_link)
-        if check_short_link.first() is None:
-            break
-        short_link = uuid4().hex[:8]
-    return short_link
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    content, media_type = render_metrics()
+    return Response(content, media_type=media_type)
 
 
-@app.post("/shorten", response_model=Link, status_code=201)
-async def create_short_url(
-    original_url: str,
-    session: SessionDep,
-    current_user: UserDep,
-):
-    if not current_user:
-        raise HTTPException(status_code=401, detail="Not authenticated")
+@app.get("/health/pool", status_code=200)
+def pool_check(request: Request):
+    return pool_stats(request.app.state.engine)
 
-    result = await get_link_by_full_url(session, original_url)
-    exists_link = result.first()
 
-    if exists_link:
-        return exists_link
+@app.get("/health/replica", status_code=200)
+def replica_check(request: Request):
+    router = getattr(request.app.state, "read_router", None)
+    return router.stats() if router is not None else {"configured": False}
 
-    short_link: str = await short_lnk_generator(session)
 
-    link = Link(original_url=original_url, short_url=short_link)
-    session.add(link)
-    await session.commit()
-    await session.refresh(link)
-    return link
+@app.get("/health/reaper", status_code=200)
+def reaper_check():
+    return reaper.stats()
 
 
-@app.get("/{short_link}", response_class=RedirectResponse)
-async def redirect_to_original_url(short_link: str, session: SessionDep):
-    result = await get_short_link(session, short_link)
-    link = result.first()
-    if not link:
+@app.get("/health/filter", status_code=200)
+def filter_check():
+    return short_code_filter.stats()
+
+
+@app.get("/health/cache", status_code=200)
+def cache_check():
+    return {
+        "links": link_cache.stats(),
+        "credentials": credential_cache.stats(),
+        "invalidator": cache_invalidator.stats(),
+    }
+
+
+@app.get("/health/shared", status_code=200)
+def shared_table_check(request: Request):
+    writer = getattr(request.app.state, "shared_writer", None)
+    return writer.stats() if writer is not None else {"configured": False}
+
+
+@app.get("/health/singleflight", status_code=200)
+def singleflight_check():
+    return {
+        "redirect": redirect_flight.stats(),
+        "details": details_flight.stats(),
+        "shorten": shorten_flight.stats(),
+    }
+
+
+@app.get("/health/ratelimit", status_code=200)
+def ratelimit_check():
+    return rate_limiter.stats()
+
+
+@app.get("/health/warmup", status_code=200)
+def warmup_check(request: Request):
+    return {"steps": getattr(request.app.state, "warmup", {})}
+
+
+@app.get("/health/clicks", status_code=200)
+def clicks_check():
+    return {"recorder": click_recorder.stats(), "rollup": click_rollup.stats()}
+
+
+@app.get("/details", response_model=list[LinkRead])
+async def get_many_details(
+    request: Request,
+    response: Response,
+    codes: Annotated[str, Query(description="Comma separated short links")],
+):
+    """The links of `codes` that exist, in one query; unknown codes are left out."""
+    short_links = list(dict.fromkeys(filter(None, map(str.strip, codes.split(",")))))
+    if len(short_links) > cfg.details_bulk_max_codes:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail=f"At most {cfg.details_bulk_max_codes} codes per request",
+        )
+    short_links = [code for code in short_links if short_code_filter.might_exist(code)]
+    links: list[LinkDetails] = []
+    if short_links:
+        engine = read_engine(request.app.state, *short_links)
+        links = await find_links(engine, short_links)
+        if len(links) < len(short_links) and (
+            primary := fallback_engine(request.app.state, engine)
+        ):
+            links = await find_links(primary, short_links)
+    return not_modified(request, response, links) or links
+
+
+@app.get("/details/{short_link}", response_model=LinkRead)
+async def get_details(short_link: str, request: Request, response: Response):
+    if not short_code_filter.might_exist(short_link):
+        raise HTTPException(status_code=404, detail="Link not found")
+    engine = read_engine(request.app.state, short_link)
+    link = await find_link(engine, short_link)
+    if link is None and (primary := fallback_engine(request.app.state, engine)):
+        link = await find_link(primary, short_link)
+    if link is None:
         raise HTTPException(status_code=404, detail="Link not found")
+    return not_modified(request, response, [link]) or link
 
-    if link.expires_at < datetime.now(timezone.utc).replace(tzinfo=None):
-        await session.delete(link)
-        await session.commit()
-        raise HTTPException(status_code=410, detail="Link has expired")
 
-    link.update_access_time()
+@app.get("/details/{short_link}/stats", response_model=LinkStats)
+async def get_stats(
+    short_link: str,
+    session: ReadSessionDep,
+    hours: Annotated[int, Query(ge=1, le=24 * 366)] = 24,
+) -> LinkStats:
+    return await get_link_stats(session, short_link, hours)
+
+
+@app.get("/links/export")
+def export_user_links(
+    request: Request, user: UserDep, format: Format = "ndjson"
+) -> StreamingResponse:
+    """The caller's links as NDJSON or CSV, streamed from a server-side cursor.
+
+    Every link is only exported by `python -m src.backend.transfer export`.
+    """
+    return StreamingResponse(
+        export_links(read_engine(request.app.state), format, user_id=user.id),
+        media_type=MEDIA_TYPES[format],
+        headers={"content-disposition": f'attachment; filename="links.{format}"'},
+    )
+
+
+def _mark_written(request: Request, *short_links: str) -> None:
+    """Read `short_links` from the primary for the read-your-writes window."""
+    router = getattr(request.app.state, "read_router", None)
+    if router is not None:
+        router.mark_written(*short_links)
+
+
+@app.post(
+    "/shorten",
+    response_model=LinkRead,
+    status_code=201,
+    dependencies=[Depends(UserRateLimit("shorten"))],
+)
+async def create_short_url(
+    original_url: str,
+    request: Request,
+    current_user: UserDep,
+):
+    if not current_user:
+        raise HTTPException(status_code=401, detail="Not authenticated")
 
-    str_to_jump: str = link.original_url
-    session.add(link)
-    await session.commit()
-    return RedirectResponse(str_to_jump, status_code=301)
+    row = await shorten(request.app.state.engine, original_url, current_user.id)
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Could not allocate a short link",
+        )
+    _mark_written(request, row.short_url)
+    short_code_filter.add(row.short_url)
+    return LinkDetails(*row)
+
+
+@app.post("/shorten/batch", status_code=201)
+async def create_short_urls(
+    request: Request,
+    current_user: UserDep,
+) -> Response:
+    ndjson = request.headers.get("content-type", "").startswith(NDJSON)
+    urls = parse_urls(await request.body(), ndjson)
+    resolved = await shorten_many(request.app.state.engine, urls, current_user.id)
+    _mark_written(request, *resolved.values())
+    short_code_filter.add(*resolved.values())
+    return batch_response(urls, resolved, ndjson)
 
 
 @app.delete("/{short_link}")
 async def erase_short_link(
     short_link: str,
+    request: Request,
     session: SessionDep,
     _: UserDep,
 ):
+    _mark_written(request, short_link)
+    access_buffer.discard(short_link)
     result = await get_short_link(session, short_link)
     link = result.first()
     if link:
         await session.delete(link)
         await session.commit()
+    # Only once committed, a redirect meanwhile would cache the row again.
+    link_cache.invalidate(short_link)
     return {f"{short_link}": "deleted"}
 
 
-@app.post("/users/add", status_code=201)
+@app.post(
+    "/users/add",
+    status_code=201,
+    dependencies=[Depends(ClientRateLimit("users_add"))],
+)
 async def create_user(
     payload: UserCreate, session: SessionDep
 ) -> dict[str, str | UUID]:
@@ -145,5 +338,26 @@ def read_current_user(user: UserDep):
     return {"user": user}
 
 
+@app.get("/users/me/links", response_model=LinkPage)
+async def list_user_links(
+    user: UserDep,
+    request: Request,
+    cursor: str | None = None,
+    limit: Annotated[int, Query(ge=1, le=cfg.user_links_max_page_size)] = 50,
+    state: LinkState = "all",
+):
+    links, next_cursor = await get_user_links(
+        read_engine(request.app.state), user.id, limit, cursor, state
+    )
+    # Validated into `LinkPage` once, by the response model.
+    return {"items": links, "next_cursor": next_cursor}
+
+
+# Registered last, the catch-all must not shadow any single segment GET route.
+app.router.routes.append(
+    RawRoute("/{short_link}", redirect_to_original_url, methods=["GET"])
+)
+
+
 if __name__ == "__main__":
     uvicorn.run("src.backend.main:app", host="0.0.0.0", reload=True)
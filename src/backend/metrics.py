@@ -0,0 +1,195 @@
+import os
+import re
+import time
+from functools import lru_cache
+from weakref import WeakKeyDictionary
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import Engine, event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# With several workers set PROMETHEUS_MULTIPROC_DIR to an empty directory
+# shared by all of them before the app is imported; every worker then writes
+# its samples there and any of them can serve the aggregated `/metrics`.
+MULTIPROCESS = "PROMETHEUS_MULTIPROC_DIR" in os.environ
+
+DB_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template.",
+    ["method", "route"],
+)
+REQUESTS = Counter(
+    "http_requests",
+    "HTTP responses by route template and status code.",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests being served.",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+STATEMENT_DURATION = Histogram(
+    "db_statement_duration_seconds",
+    "Time spent executing SQL statements, by operation and table.",
+    ["engine", "operation", "table"],
+    buckets=DB_BUCKETS,
+)
+POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Open connections held by the pool.",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out_connections",
+    "Pool connections currently in use.",
+    ["engine"],
+    multiprocess_mode="livesum",
+)
+POOL_CHECKOUTS = Counter(
+    "db_pool_checkouts",
+    "Connections checked out of the pool.",
+    ["engine"],
+)
+
+# The keyword the target table follows, per operation.
+_TABLE_AFTER = {
+    "SELECT": "FROM",
+    "DELETE": "FROM",
+    "INSERT": "INTO",
+    "UPDATE": "UPDATE",
+}
+_TABLE = {
+    operation: re.compile(rf"\b{keyword}\s+([\w.\"]+)", re.IGNORECASE)
+    for operation, keyword in _TABLE_AFTER.items()
+}
+
+
+# Name each instrumented engine is labelled with.
+_ENGINE_NAMES: WeakKeyDictionary[Engine, str] = WeakKeyDictionary()
+
+
+@lru_cache(maxsize=1024)
+def statement_labels(statement: str) -> tuple[str, str]:
+    """`(operation, table)` of a statement, e.g. `("SELECT", "link")`."""
+    words = statement.split(None, 1)
+    operation = words[0].upper() if words else ""
+    pattern = _TABLE.get(operation)
+    match = pattern.search(statement) if pattern else None
+    return operation, match[1].strip('"') if match else ""
+
+
+def instrument_engine(engine: AsyncEngine, name: str = "primary") -> None:
+    """Time every statement of `engine` and track its pool in the gauges."""
+    sync_engine = engine.sync_engine
+    _ENGINE_NAMES[sync_engine] = name
+    connections = POOL_CONNECTIONS.labels(name)
+    checked_out = POOL_CHECKED_OUT.labels(name)
+    checkouts = POOL_CHECKOUTS.labels(name)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        STATEMENT_DURATION.labels(name, *statement_labels(statement)).observe(elapsed)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        started = (
+            context.connection.info.get("query_started") if context.connection else None
+        )
+        if started:
+            started.pop()
+
+    @event.listens_for(sync_engine.pool, "connect")
+    def _connect(dbapi_connection, connection_record):
+        connections.inc()
+
+    @event.listens_for(sync_engine.pool, "close")
+    def _close(dbapi_connection, connection_record):
+        connections.dec()
+
+    @event.listens_for(sync_engine.pool, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        checked_out.inc()
+        checkouts.inc()
+
+    @event.listens_for(sync_engine.pool, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        checked_out.dec()
+
+
+def observe_statement(engine: AsyncEngine, statement: str, elapsed: float) -> None:
+    """Time a statement run on the driver connection, past SQLAlchemy's events."""
+    name = _ENGINE_NAMES.get(engine.sync_engine)
+    if name is not None:
+        STATEMENT_DURATION.labels(name, *statement_labels(statement)).observe(elapsed)
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording latency, status and in-flight requests.
+
+    Routes are labelled by their template (`/{short_link}`), never by the raw
+    path, so the number of series stays bounded.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_progress.dec()
+            route = scope.get("route")
+            template = getattr(route, "path", "<unmatched>")
+            REQUEST_DURATION.labels(method, template).observe(elapsed)
+            REQUESTS.labels(method, template, str(status)).inc()
+
+
+def render_metrics() -> tuple[bytes, str]:
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead() -> None:
+    """Drop this worker's live gauges from the shared multiprocess files."""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
@@ -5,8 +5,26 @@ from typing import Optional
 from uuid import UUID, uuid4
 
 from pydantic import EmailStr
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Index,
+    LargeBinary,
+    Sequence,
+    SmallInteger,
+    text,
+)
 from sqlmodel import Field, Relationship, SQLModel
 
+# Source of ids that `src.backend.shortcode` turns into short codes.
+link_short_code_seq = Sequence(
+    "link_short_code_seq", start=1, maxvalue=62**8 - 1, metadata=SQLModel.metadata
+)
+click_id_seq = Sequence("click_id_seq", metadata=SQLModel.metadata)
+# Generated codes have `shortcode.CODE_LENGTH` characters, the rest leaves
+# room for imported ones.
+SHORT_URL_MAX_LENGTH = 16
+
 
 class UserCreate(SQLModel):
     username: str
@@ -16,7 +34,13 @@ class UserCreate(SQLModel):
 
 
 class User(SQLModel, table=True):
-    id: UUID = Field(default_factory=uuid4, primary_key=True, index=True)
+    __table_args__ = (
+        # Logins are looked up case-insensitively, see `get_user`.
+        Index("ix_user_username_lower", text("lower(username)")),
+        Index("ix_user_email_lower", text("lower(email)")),
+    )
+
+    id: UUID = Field(default_factory=uuid4, primary_key=True)
     username: str
     full_name: str
     email: str
@@ -25,10 +49,44 @@ class User(SQLModel, table=True):
     links: list["Link"] = Relationship(back_populates="user")
 
 
+class LinkRead(SQLModel):
+    id: UUID
+    original_url: str
+    short_url: str
+    created_at: datetime
+    last_accessed_at: datetime
+    expires_at: datetime
+    user_id: UUID | None = None
+
+
 class Link(SQLModel, table=True):
-    id: UUID = Field(default_factory=uuid4, primary_key=True, index=True)
-    original_url: str = Field(index=True)
-    short_url: str = Field(unique=True, index=True)
+    __table_args__ = (
+        # One link per normalised original url (per owner), see `upsert_link`.
+        Index(
+            "ux_link_original_url_hash",
+            "original_url_hash",
+            "dedup_rank",
+            unique=True,
+            postgresql_where=text("user_id IS NULL"),
+        ),
+        Index(
+            "ux_link_user_original_url_hash",
+            "user_id",
+            "original_url_hash",
+            "dedup_rank",
+            unique=True,
+            postgresql_where=text("user_id IS NOT NULL"),
+        ),
+        # Keyset pages of a user's links, see `reads.get_user_links`.
+        Index("ix_link_user_created_at", "user_id", "created_at", "id"),
+    )
+
+    id: UUID = Field(default_factory=uuid4)
+    original_url: str
+    # `url_digest(original_url)`
+    original_url_hash: bytes = Field(sa_type=LargeBinary)
+    # Every lookup is by code, so it is the primary key.
+    short_url: str = Field(primary_key=True, max_length=SHORT_URL_MAX_LENGTH)
     created_at: datetime = Field(
         default_factory=lambda: datetime.now(timezone.utc).replace(tzinfo=None)
     )
@@ -37,13 +95,90 @@ class Link(SQLModel, table=True):
     )
     expires_at: datetime = Field(
         default_factory=lambda: datetime.now(timezone.utc).replace(tzinfo=None)
-        + timedelta(days=365)
+        + timedelta(days=365),
+        index=True,
     )
     user_id: UUID | None = Field(default=None, foreign_key="user.id")
+    # Only pre-existing duplicates have a non zero rank; new links never do.
+    dedup_rank: int = Field(
+        default=0, sa_type=SmallInteger, sa_column_kwargs={"server_default": "0"}
+    )
     user: Optional[User] = Relationship(back_populates="links")
 
-    def update_access_time(self):
-        self.last_accessed_at = datetime.now(timezone.utc).replace(tzinfo=None)
-        self.expires_at = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(
-            days=365
-        )
+    @staticmethod
+    def next_access_times() -> tuple[datetime, datetime]:
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return now, now + timedelta(days=365)
+
+
+class Click(SQLModel, table=True):
+    """Append-only click log, range partitioned by day on `clicked_at`.
+
+    Written in batches by `src.backend.analytics.click_recorder`, read only by
+    the rollup into `ClickHourly`.
+    """
+
+    __table_args__ = {"postgresql_partition_by": "RANGE (clicked_at)"}
+
+    # First so the primary key also serves the rollup's range scans.
+    clicked_at: datetime = Field(primary_key=True)
+    id: int | None = Field(
+        default=None,
+        sa_column=Column(
+            BigInteger,
+            click_id_seq,
+            server_default=click_id_seq.next_value(),
+            primary_key=True,
+        ),
+    )
+    short_url: str
+    referrer: str | None = None
+    user_agent: str | None = None
+
+
+class ClickHourly(SQLModel, table=True):
+    __tablename__ = "click_hourly"  # type: ignore
+
+    short_url: str = Field(primary_key=True)
+    # Indexed on its own for the rollup's `max(hour)` watermark.
+    hour: datetime = Field(primary_key=True, index=True)
+    # "" when the header was missing.
+    referrer: str = Field(primary_key=True)
+    user_agent: str = Field(primary_key=True)
+    clicks: int = Field(sa_type=BigInteger)
+
+
+class RateLimitBucket(SQLModel, table=True):
+    """Token bucket of one client and route, see `ratelimit.PostgresBuckets`."""
+
+    __tablename__ = "rate_limit_bucket"  # type: ignore
+    __table_args__ = {"prefixes": ["UNLOGGED"]}
+
+    # "<route>:<client>"
+    key: str = Field(primary_key=True)
+    tokens: float
+    updated_at: datetime
+
+
+class LinkPage(SQLModel):
+    items: list[LinkRead]
+    # Pass as `cursor` for the next page, None on the last one.
+    next_cursor: str | None = None
+
+
+class ClickCount(SQLModel):
+    value: str
+    clicks: int
+
+
+class HourlyClicks(SQLModel):
+    hour: datetime
+    clicks: int
+
+
+class LinkStats(SQLModel):
+    short_url: str
+    clicks: int
+    hourly: list[HourlyClicks]
+    referrers: list[ClickCount]
+    user_agents: list[ClickCount]
@@ -0,0 +1,224 @@
+import asyncio
+import contextlib
+import logging
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Annotated, Protocol
+
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.backend.config import cfg
+from src.backend.model import User
+from src.backend.reads import fetch
+from src.backend.users import get_current_active_user
+
+logger = logging.getLogger(__name__)
+
+# See migration a3cd3e4146f9: refills the bucket, takes a token when there is
+# one and answers the seconds until there will be, 0 when it took one.
+TAKE_TOKEN = "SELECT rate_limit_take($1, $2, $3)"
+PRUNE_BUCKETS = (
+    "DELETE FROM rate_limit_bucket "
+    "WHERE updated_at < clock_timestamp() - make_interval(secs => $1)"
+)
+
+
+@dataclass(frozen=True, slots=True)
+class Policy:
+    """`burst` requests at once, then `rate` requests per second."""
+
+    rate: float
+    burst: int
+
+    @property
+    def refill_seconds(self) -> float:
+        """Idle time after which a bucket is full again."""
+        return self.burst / self.rate
+
+
+class Buckets(Protocol):
+    async def take(self, key: str, policy: Policy) -> float:
+        """Take a token from the bucket of `key`: 0.0, or seconds to wait."""
+        ...
+
+
+class LocalBuckets:
+    """Token buckets of this process, at most `max_clients` of them.
+
+    The least recently seen client is evicted first; an evicted bucket comes
+    back full, as it would after a long enough pause.
+    """
+
+    def __init__(self, max_clients: int) -> None:
+        self.max_clients = max_clients
+        # key -> [tokens, monotonic time of the last refill]
+        self._buckets: OrderedDict[str, list[float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    async def take(self, key: str, policy: Policy) -> float:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_clients:
+                self._buckets.popitem(last=False)
+            bucket = self._buckets[key] = [float(policy.burst), now]
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(policy.burst, bucket[0] + (now - bucket[1]) * policy.rate)
+            bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            return 0.0
+        return (1 - bucket[0]) / policy.rate
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+
+class PostgresBuckets:
+    """Token buckets every worker shares, in the unlogged `rate_limit_bucket`.
+
+    One statement per request. Buckets idle for longer than a full refill are
+    pruned in the background, so the table only holds recently seen clients.
+    """
+
+    def __init__(self, engine: AsyncEngine) -> None:
+        self.engine = engine
+
+    async def take(self, key: str, policy: Policy) -> float:
+        (record,) = await fetch(
+            self.engine, TAKE_TOKEN, key, policy.rate, float(policy.burst)
+        )
+        return record[0]
+
+    async def prune(self, idle_seconds: float) -> None:
+        await fetch(self.engine, PRUNE_BUCKETS, idle_seconds)
+
+
+class RateLimiter:
+    """Per-client token buckets for the routes that have a `Policy`.
+
+    Buckets live in this process unless `start` is given an engine with
+    `backend == "postgres"`. When the shared table cannot be reached the
+    request is let through, the limiter never fails a request on its own.
+    """
+
+    def __init__(
+        self,
+        policies: dict[str, Policy],
+        max_clients: int,
+        backend: str = "local",
+        prune_interval: float = 60.0,
+        enabled: bool = True,
+    ) -> None:
+        self.policies = policies
+        self.backend = backend
+        self.prune_interval = prune_interval
+        self.enabled = enabled
+        self.local = LocalBuckets(max_clients)
+        self.buckets: Buckets = self.local
+        self._task: asyncio.Task | None = None
+        self.allowed = 0
+        self.limited = 0
+        self.failures = 0
+
+    async def check(self, route: str, client: str) -> None:
+        """Raise 429 with `Retry-After` when `client` is out of tokens."""
+        if not self.enabled:
+            return
+        try:
+            wait = await self.buckets.take(f"{route}:{client}", self.policies[route])
+        except Exception:
+            self.failures += 1
+            logger.exception("Rate limit check failed, letting the request through")
+            return
+        if wait <= 0:
+            self.allowed += 1
+            return
+        self.limited += 1
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+
+    async def run(self, buckets: PostgresBuckets) -> None:
+        idle_seconds = max(policy.refill_seconds for policy in self.policies.values())
+        while True:
+            await asyncio.sleep(self.prune_interval)
+            try:
+                await buckets.prune(idle_seconds)
+            except Exception:
+                logger.exception("Failed to prune rate limit buckets")
+
+    def start(self, engine: AsyncEngine) -> None:
+        if self.backend != "postgres":
+            return
+        buckets = PostgresBuckets(engine)
+        self.buckets = buckets
+        self._task = asyncio.create_task(self.run(buckets), name="rate-limit-prune")
+
+    async def stop(self) -> None:
+        self.buckets = self.local
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def clear(self) -> None:
+        self.local.clear()
+        self.allowed = self.limited = self.failures = 0
+
+    def stats(self) -> dict[str, int | str | bool]:
+        return {
+            "enabled": self.enabled,
+            "backend": "postgres" if self._task is not None else "local",
+            "local_clients": len(self.local),
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "failures": self.failures,
+        }
+
+
+rate_limiter = RateLimiter(
+    policies={
+        "shorten": Policy(cfg.rate_limit_shorten_rate, cfg.rate_limit_shorten_burst),
+        "users_add": Policy(
+            cfg.rate_limit_users_add_rate, cfg.rate_limit_users_add_burst
+        ),
+    },
+    max_clients=cfg.rate_limit_max_clients,
+    backend=cfg.rate_limit_backend,
+    prune_interval=cfg.rate_limit_prune_interval,
+    enabled=cfg.rate_limit_enabled,
+)
+
+
+def client_address(request: Request) -> str:
+    # The peer address, or the forwarded one uvicorn put there for trusted proxies.
+    return request.client.host if request.client else "unknown"
+
+
+class ClientRateLimit:
+    """Dependency limiting `route` per client address."""
+
+    def __init__(self, route: str) -> None:
+        self.route = route
+
+    async def __call__(self, request: Request) -> None:
+        await rate_limiter.check(self.route, f"ip:{client_address(request)}")
+
+
+class UserRateLimit(ClientRateLimit):
+    """Dependency limiting `route` per authenticated user."""
+
+    async def __call__(  # type: ignore[override]
+        self, user: Annotated[User, Depends(get_current_active_user)]
+    ) -> None:
+        await rate_limiter.check(self.route, f"user:{user.id}")
@@ -0,0 +1,157 @@
+"""Read-optimised lookups for the hot endpoints.
+
+Column-only statements run straight on the asyncpg connection under a pooled
+SQLAlchemy connection: no transaction is begun (so no BEGIN/ROLLBACK round
+trips), no result processing or ORM identity map, and asyncpg keeps each
+statement prepared per connection (up to `DB_STATEMENT_CACHE_SIZE`, none
+when it is 0). Rows come back as `RedirectTarget` named
+tuples and slotted `LinkDetails` dataclasses instead of SQLModel objects.
+Writes stay in `src.backend.repository`.
+"""
+
+import base64
+import binascii
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Literal, NamedTuple
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.backend.metrics import observe_statement
+from src.backend.singleflight import SingleFlight
+
+
+class RedirectTarget(NamedTuple):
+    original_url: str
+    expires_at: datetime
+
+
+@dataclass(slots=True, frozen=True)
+class LinkDetails:
+    """The `LinkRead` fields, in the order `DETAILS_COLUMNS` selects them."""
+
+    id: UUID
+    original_url: str
+    short_url: str
+    created_at: datetime
+    last_accessed_at: datetime
+    expires_at: datetime
+    user_id: UUID | None = None
+
+
+DETAILS_COLUMNS = (
+    "id, original_url, short_url, created_at, last_accessed_at, expires_at, user_id"
+)
+SELECT_REDIRECT = "SELECT original_url, expires_at FROM link WHERE short_url = $1"
+SELECT_DETAILS = f"SELECT {DETAILS_COLUMNS} FROM link WHERE short_url = $1"
+# One statement text whatever the number of codes, unlike an IN list.
+SELECT_DETAILS_MANY = (
+    f"SELECT {DETAILS_COLUMNS} FROM link WHERE short_url = ANY($1::varchar[])"
+)
+
+# Concurrent identical lookups share one query, see `SingleFlight`.
+redirect_flight: SingleFlight[tuple[AsyncEngine, str], RedirectTarget | None] = (
+    SingleFlight()
+)
+details_flight: SingleFlight[tuple[AsyncEngine, str], LinkDetails | None] = (
+    SingleFlight()
+)
+
+
+async def fetch(engine: AsyncEngine, query: str, *args) -> list:
+    """asyncpg records of `query`, timed like statements run by SQLAlchemy."""
+    async with engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        started = time.perf_counter()
+        records = await raw.driver_connection.fetch(query, *args)  # type: ignore
+        observe_statement(engine, query, time.perf_counter() - started)
+        return records
+
+
+async def _fetch_redirect(
+    engine: AsyncEngine, short_link: str
+) -> RedirectTarget | None:
+    records = await fetch(engine, SELECT_REDIRECT, short_link)
+    return RedirectTarget(*records[0]) if records else None
+
+
+async def _fetch_details(engine: AsyncEngine, short_link: str) -> LinkDetails | None:
+    records = await fetch(engine, SELECT_DETAILS, short_link)
+    return LinkDetails(*records[0]) if records else None
+
+
+async def find_redirect(engine: AsyncEngine, short_link: str) -> RedirectTarget | None:
+    """Where `short_link` redirects to, one query per burst."""
+    return await redirect_flight.do(
+        (engine, short_link), lambda: _fetch_redirect(engine, short_link)
+    )
+
+
+async def find_link(engine: AsyncEngine, short_link: str) -> LinkDetails | None:
+    """The details of `short_link`, one query per burst."""
+    return await details_flight.do(
+        (engine, short_link), lambda: _fetch_details(engine, short_link)
+    )
+
+
+async def find_links(engine: AsyncEngine, short_links: list[str]) -> list[LinkDetails]:
+    """The details of the `short_links` that exist, in the order asked for."""
+    records = await fetch(engine, SELECT_DETAILS_MANY, short_links)
+    links = (LinkDetails(*record) for record in records)
+    found = {link.short_url: link for link in links}
+    return [found[code] for code in short_links if code in found]
+
+
+LinkState = Literal["all", "active", "expired"]
+
+
+def encode_cursor(link: LinkDetails) -> str:
+    """Opaque position after `link` in the `(created_at, id)` order."""
+    raw = f"{link.created_at.isoformat()},{link.id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, UUID]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, link_id = raw.split(",")
+        return datetime.fromisoformat(created_at), UUID(link_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Malformed cursor"
+        )
+
+
+async def get_user_links(
+    engine: AsyncEngine,
+    user_id: UUID,
+    limit: int,
+    cursor: str | None = None,
+    state: LinkState = "all",
+) -> tuple[list[LinkDetails], str | None]:
+    """A page of the user's links, newest first, and the cursor of the next one.
+
+    Seeks past `cursor` on the `(user_id, created_at, id)` index instead of
+    skipping rows with OFFSET, so every page costs the same however deep it is.
+    """
+    args: list = [user_id]
+    conditions = ["user_id = $1"]
+    if state != "all":
+        args.append(datetime.now(timezone.utc).replace(tzinfo=None))
+        operator = ">=" if state == "active" else "<"
+        conditions.append(f"expires_at {operator} ${len(args)}")
+    if cursor is not None:
+        args.extend(decode_cursor(cursor))
+        conditions.append(f"(created_at, id) < (${len(args) - 1}, ${len(args)})")
+    args.append(limit + 1)
+    # One statement text per combination, each stays prepared.
+    query = (
+        f"SELECT {DETAILS_COLUMNS} FROM link WHERE {' AND '.join(conditions)} "
+        f"ORDER BY created_at DESC, id DESC LIMIT ${len(args)}"
+    )
+    links = [LinkDetails(*record) for record in await fetch(engine, query, *args)]
+    next_cursor = encode_cursor(links[limit - 1]) if len(links) > limit else None
+    return links[:limit], next_cursor
@@ -0,0 +1,112 @@
+import asyncio
+import contextlib
+import logging
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.backend.config import cfg
+
+logger = logging.getLogger(__name__)
+
+# Rows are picked through `ix_link_expires_at` and locked with SKIP LOCKED, so
+# several workers can reap at once and a batch never waits on a live request.
+DELETE_EXPIRED = text(
+    """
+    DELETE FROM link
+    WHERE ctid = ANY(ARRAY(
+        SELECT ctid FROM link
+        WHERE expires_at < :now
+        ORDER BY expires_at
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    ))
+    """
+)
+
+
+class ExpiredLinkReaper:
+    """Deletes expired links in the background, `batch_size` rows at a time.
+
+    Each batch is its own short transaction; the reaper sleeps `batch_pause`
+    seconds between batches and `interval` seconds between passes, so a large
+    backlog of expired rows is drained without long locks or bursts of WAL.
+    """
+
+    def __init__(self, interval: float, batch_size: int, batch_pause: float) -> None:
+        self.interval = interval
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self._task: asyncio.Task | None = None
+        self.passes = 0
+        self.batches = 0
+        self.deleted = 0
+        self.failures = 0
+        self.last_pass_deleted = 0
+        self.last_pass_seconds = 0.0
+
+    async def delete_batch(self, engine: AsyncEngine, now: datetime) -> int:
+        async with engine.begin() as conn:
+            result = await conn.execute(
+                DELETE_EXPIRED, {"now": now, "limit": self.batch_size}
+            )
+        self.batches += 1
+        self.deleted += result.rowcount
+        return result.rowcount
+
+    async def reap(self, engine: AsyncEngine) -> int:
+        """Delete every link that expired before this pass started."""
+        started = time.perf_counter()
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        deleted = 0
+        while True:
+            batch = await self.delete_batch(engine, now)
+            deleted += batch
+            if batch < self.batch_size:
+                break
+            await asyncio.sleep(self.batch_pause)
+        self.passes += 1
+        self.last_pass_deleted = deleted
+        self.last_pass_seconds = time.perf_counter() - started
+        return deleted
+
+    async def run(self, engine: AsyncEngine) -> None:
+        while True:
+            try:
+                deleted = await self.reap(engine)
+            except Exception:
+                self.failures += 1
+                logger.exception("Failed to reap expired links")
+            else:
+                if deleted:
+                    logger.info("Reaped %d expired links", deleted)
+            await asyncio.sleep(self.interval)
+
+    def start(self, engine: AsyncEngine) -> None:
+        self._task = asyncio.create_task(self.run(engine), name="expired-link-reaper")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "passes": self.passes,
+            "batches": self.batches,
+            "deleted": self.deleted,
+            "failures": self.failures,
+            "last_pass_deleted": self.last_pass_deleted,
+            "last_pass_seconds": self.last_pass_seconds,
+        }
+
+
+reaper = ExpiredLinkReaper(
+    interval=cfg.reaper_interval,
+    batch_size=cfg.reaper_batch_size,
+    batch_pause=cfg.reaper_batch_pause_ms / 1000,
+)
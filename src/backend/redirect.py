@@ -0,0 +1,115 @@
+from datetime import datetime, timezone
+
+from starlette.datastructures import Headers
+from starlette.routing import Match, Route
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from src.backend.analytics import click_recorder
+from src.backend.bloom import short_code_filter
+from src.backend.cache import CachedLink, link_cache
+from src.backend.config import cfg
+from src.backend.db.session import fallback_engine, read_engine
+from src.backend.reads import find_redirect
+from src.backend.sharedtable import to_micros
+from src.backend.utils import location_header
+from src.backend.writebehind import access_buffer
+
+_REDIRECT_HEADERS = [(b"content-length", b"0")]
+if cfg.redirect_cache_control:
+    _REDIRECT_HEADERS.append(
+        (b"cache-control", cfg.redirect_cache_control.encode("latin-1"))
+    )
+_JSON_HEADERS = [(b"content-type", b"application/json")]
+_NOT_FOUND = b'{"detail":"Link not found"}'
+_EXPIRED = b'{"detail":"Link has expired"}'
+
+
+async def _send(send: Send, status: int, headers: list, body: bytes = b"") -> None:
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_error(send: Send, status: int, body: bytes) -> None:
+    headers = [*_JSON_HEADERS, (b"content-length", str(len(body)).encode())]
+    await _send(send, status, headers, body)
+
+
+def _record_click(short_link: str, scope: Scope) -> None:
+    headers = Headers(scope=scope)
+    click_recorder.record(short_link, headers.get("referer"), headers.get("user-agent"))
+
+
+async def redirect_to_original_url(scope: Scope, receive: Receive, send: Send):
+    """`GET /{short_link}` as a bare ASGI endpoint.
+
+    Same answers as a FastAPI route would give (301, 404, 410 with the usual
+    JSON detail) without dependency injection, ORM objects or response
+    classes. The `Cache-Control` of redirects is `REDIRECT_CACHE_CONTROL`.
+    The host wide shared table, when configured, is read before the worker's
+    own cache; its entries hold the Location header as is.
+    """
+    short_link: str = scope["path_params"]["short_link"]
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    state = scope["app"].state
+    shared = getattr(state, "shared_links", None)
+    if shared is not None:
+        entry = shared.get(short_link)
+        if entry is not None and entry[1] >= to_micros(now):
+            access_buffer.record(short_link)
+            _record_click(short_link, scope)
+            await _send(send, 301, [(b"location", entry[0]), *_REDIRECT_HEADERS])
+            return
+
+    cached = link_cache.get(short_link)
+    if cached is not None:
+        if cached.expires_at >= now:
+            expires_at = access_buffer.record(short_link)
+            # Not `set`: a hot link must still leave the cache after its TTL.
+            link_cache.replace(short_link, cached._replace(expires_at=expires_at))
+            _record_click(short_link, scope)
+            headers = [(b"location", location_header(cached.original_url))]
+            await _send(send, 301, headers + _REDIRECT_HEADERS)
+            return
+        # The cached expiry may be stale, let the database decide.
+        link_cache.invalidate(short_link)
+
+    if not short_code_filter.might_exist(short_link):
+        await _send_error(send, 404, _NOT_FOUND)
+        return
+    engine = read_engine(state, short_link)
+    row = await find_redirect(engine, short_link)
+    if row is None and (primary := fallback_engine(state, engine)) is not None:
+        row = await find_redirect(primary, short_link)
+    if row is None:
+        await _send_error(send, 404, _NOT_FOUND)
+        return
+    original_url, expires_at = row
+    if expires_at < now:
+        # The row is left for the background reaper.
+        access_buffer.discard(short_link)
+        await _send_error(send, 410, _EXPIRED)
+        return
+
+    expires_at = access_buffer.record(short_link)
+    link_cache.set(short_link, CachedLink(original_url, expires_at))
+    _record_click(short_link, scope)
+    headers = [(b"location", location_header(original_url))]
+    await _send(send, 301, headers + _REDIRECT_HEADERS)
+
+
+class RawRoute(Route):
+    """A Starlette route to a bare ASGI `endpoint`.
+
+    Like FastAPI's routes it exposes itself as `scope["route"]`, so metrics
+    are labelled with its path template.
+    """
+
+    def __init__(self, path: str, endpoint: ASGIApp, methods: list[str]) -> None:
+        super().__init__(path, endpoint, methods=methods)
+        self.app = endpoint
+
+    def matches(self, scope: Scope) -> tuple[Match, Scope]:
+        match, child_scope = super().matches(scope)
+        if match is not Match.NONE:
+            child_scope["route"] = self
+        return match, child_scope
@@ -1,10 +1,23 @@
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from uuid import UUID, uuid4
+
 from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy import Row, func, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
 from sqlmodel import select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from src.backend.deps import SessionDep
 from src.backend.model import Link, User, UserCreate
-from src.backend.utils import fake_hash_password
+from src.backend.shortcode import ALLOCATION_ATTEMPTS, allocator
+from src.backend.singleflight import SingleFlight
+from src.backend.utils import hash_password, url_digest
+
+# Concurrent shortens of the same url share one upsert, see `SingleFlight`.
+shorten_flight: SingleFlight[tuple[UUID | None, bytes], Row | None] = SingleFlight()
 
 
 async def get_short_link(session: AsyncSession, short_link: str):
@@ -13,23 +26,235 @@ async def get_short_link(session: AsyncSession, short_link: str):
 
 
 async def get_link_by_full_url(session: AsyncSession, original_url: str):
-    result = await session.exec(select(Link).where(Link.original_url == original_url))
+    result = await session.exec(
+        select(Link).where(
+            Link.original_url_hash == url_digest(original_url), Link.dedup_rank == 0
+        )
+    )
     return result
 
 
-async def get_user(username: str, session: SessionDep):
+# Conflict target and predicate of the partial unique indexes declared on
+# `Link`, keyed by "is the link owned".
+_DEDUP_TARGET = {
+    False: ("original_url_hash, dedup_rank", "user_id IS NULL"),
+    True: ("user_id, original_url_hash, dedup_rank", "user_id IS NOT NULL"),
+}
+
+_UPSERT_LINK = """
+    INSERT INTO link (
+        id, original_url, original_url_hash, short_url, created_at, last_accessed_at,
+        expires_at, user_id
+    )
+    VALUES (
+        :id, :original_url, :original_url_hash, :short_url, :created_at,
+        :last_accessed_at, :expires_at, :user_id
+    )
+    ON CONFLICT ({target}) WHERE {predicate}
+    DO UPDATE SET expires_at = GREATEST(link.expires_at, EXCLUDED.expires_at)
+    RETURNING id, original_url, short_url, created_at, last_accessed_at,
+        expires_at, user_id
+"""
+_INSERT_LINKS = """
+    INSERT INTO link (
+        id, original_url, original_url_hash, short_url, created_at, last_accessed_at,
+        expires_at, user_id
+    )
+    SELECT gen_random_uuid(), v.original_url, v.original_url_hash, v.short_url,
+        :created_at, :created_at, :expires_at, CAST(:user_id AS UUID)
+    FROM unnest(
+        CAST(:original_urls AS VARCHAR[]),
+        CAST(:original_url_hashes AS BYTEA[]),
+        CAST(:short_urls AS VARCHAR[])
+    ) AS v(original_url, original_url_hash, short_url)
+    ON CONFLICT ({target}) WHERE {predicate}
+    DO UPDATE SET expires_at = GREATEST(link.expires_at, EXCLUDED.expires_at)
+    RETURNING original_url_hash, short_url
+"""
+_SELECT_LINKS_BY_DIGEST = """
+    SELECT original_url_hash, short_url FROM link
+    WHERE original_url_hash = ANY(CAST(:digests AS BYTEA[]))
+        AND dedup_rank = 0 AND {predicate} {owner}
+"""
+# Rows locked in key order first, so concurrent batches cannot deadlock.
+_REFRESH_LINKS_BY_DIGEST = """
+    UPDATE link SET expires_at = GREATEST(link.expires_at, :expires_at)
+    FROM (
+        SELECT short_url FROM link
+        WHERE original_url_hash = ANY(CAST(:digests AS BYTEA[]))
+            AND dedup_rank = 0 AND {predicate} {owner}
+        ORDER BY short_url
+        FOR UPDATE
+    ) AS locked
+    WHERE link.short_url = locked.short_url
+    RETURNING link.original_url_hash, link.short_url
+"""
+# Plain text so every statement is compiled once.
+UPSERT_LINK = {
+    owned: text(_UPSERT_LINK.format(target=target, predicate=predicate))
+    for owned, (target, predicate) in _DEDUP_TARGET.items()
+}
+INSERT_LINKS = {
+    owned: text(_INSERT_LINKS.format(target=target, predicate=predicate))
+    for owned, (target, predicate) in _DEDUP_TARGET.items()
+}
+SELECT_LINKS_BY_DIGEST = {
+    owned: text(
+        _SELECT_LINKS_BY_DIGEST.format(
+            predicate=predicate, owner="AND user_id = :user_id" if owned else ""
+        )
+    )
+    for owned, (_, predicate) in _DEDUP_TARGET.items()
+}
+REFRESH_LINKS_BY_DIGEST = {
+    owned: text(
+        _REFRESH_LINKS_BY_DIGEST.format(
+            predicate=predicate, owner="AND user_id = :user_id" if owned else ""
+        )
+    )
+    for owned, (_, predicate) in _DEDUP_TARGET.items()
+}
+
+
+@asynccontextmanager
+async def _autocommit(engine: AsyncEngine) -> AsyncIterator[AsyncConnection]:
+    async with engine.connect() as conn:
+        yield await conn.execution_options(isolation_level="AUTOCOMMIT")
+
+
+async def allocate_codes(engine: AsyncEngine, count: int) -> list[str]:
+    """`count` fresh short codes.
+
+    On a session of its own, closed before the codes are inserted, so a
+    shorten never holds more than one connection.
+    """
+    async with AsyncSession(engine) as session:
+        return await allocator.allocate_many(session, count)
+
+
+async def upsert_link(
+    engine: AsyncEngine,
+    original_url: str,
+    short_url: str,
+    user_id: UUID | None = None,
+) -> Row:
+    """Insert a link or return the one that already exists for `original_url`.
+
+    This is a single autocommitted INSERT ... ON CONFLICT ... RETURNING, so
+    concurrent shortens of the same url agree on one row. Re-shortening an
+    existing url extends its expiry.
+    """
+    created_at, expires_at = Link.next_access_times()
+    params = {
+        "id": uuid4(),
+        "original_url": original_url,
+        "original_url_hash": url_digest(original_url),
+        "short_url": short_url,
+        "created_at": created_at,
+        "last_accessed_at": created_at,
+        "expires_at": expires_at,
+        "user_id": user_id,
+    }
+    async with _autocommit(engine) as conn:
+        result = await conn.execute(UPSERT_LINK[user_id is not None], params)
+        return result.one()
+
+
+async def _shorten(
+    engine: AsyncEngine, original_url: str, user_id: UUID | None
+) -> Row | None:
+    for _ in range(ALLOCATION_ATTEMPTS):
+        (short_link,) = await allocate_codes(engine, 1)
+        try:
+            return await upsert_link(engine, original_url, short_link, user_id)
+        except IntegrityError:
+            # The fresh code clashed with a legacy one.
+            continue
+    return None
+
+
+async def shorten(
+    engine: AsyncEngine, original_url: str, user_id: UUID | None = None
+) -> Row | None:
+    """`upsert_link` under a freshly allocated code, None when none was free.
+
+    Concurrent shortens of the same normalised url by the same owner share
+    one allocation and upsert, which outlives a cancelled first caller.
+    """
+    return await shorten_flight.do(
+        (user_id, url_digest(original_url)),
+        lambda: _shorten(engine, original_url, user_id),
+    )
+
+
+async def get_links_by_digests(
+    session: AsyncSession, digests: list[bytes], user_id: UUID | None = None
+) -> dict[bytes, str]:
+    """Map each of the `url_digest`s that already has a link to its short url."""
     result = await session.exec(
-        select(User).where((User.username == username) | (User.email == username))
+        SELECT_LINKS_BY_DIGEST[user_id is not None],  # type: ignore
+        params={"digests": digests, "user_id": user_id},
     )
-    if result:
-        return result.first()
-    raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+    return {row.original_url_hash: row.short_url for row in result}
+
+
+async def refresh_links_by_digests(
+    engine: AsyncEngine, digests: list[bytes], user_id: UUID | None = None
+) -> dict[bytes, str]:
+    """`get_links_by_digests`, extending the expiry of the links found.
+
+    As `upsert_link` does for an url shortened again, so a link that expired
+    but was not reaped yet is served again.
+    """
+    _, expires_at = Link.next_access_times()
+    params = {"digests": digests, "user_id": user_id, "expires_at": expires_at}
+    async with _autocommit(engine) as conn:
+        result = await conn.execute(
+            REFRESH_LINKS_BY_DIGEST[user_id is not None], params
+        )
+        return {row.original_url_hash: row.short_url for row in result}
+
+
+async def insert_links(
+    engine: AsyncEngine,
+    links: dict[bytes, tuple[str, str]],
+    user_id: UUID | None = None,
+) -> dict[bytes, str]:
+    """Insert `url_digest -> (original_url, short_url)` with one multi-row INSERT.
+
+    Urls that got a link concurrently keep it, with its expiry extended as by
+    `upsert_link`, and map to its short url.
+    """
+    created_at, expires_at = Link.next_access_times()
+    # In digest order, so concurrent batches lock conflicting rows in one order.
+    links = dict(sorted(links.items()))
+    params = {
+        "original_urls": [original_url for original_url, _ in links.values()],
+        "original_url_hashes": list(links),
+        "short_urls": [short_url for _, short_url in links.values()],
+        "created_at": created_at,
+        "expires_at": expires_at,
+        "user_id": user_id,
+    }
+    async with _autocommit(engine) as conn:
+        result = await conn.execute(INSERT_LINKS[user_id is not None], params)
+        return {row.original_url_hash: row.short_url for row in result}
+
+
+def _login_matches(login: str):
+    login = login.lower()
+    return (func.lower(User.username) == login) | (func.lower(User.email) == login)
+
+
+async def get_user(username: str, session: SessionDep) -> User | None:
+    result = await session.exec(select(User).where(_login_matches(username)))
+    return result.first()
 
 
 async def creating_user(session: AsyncSession, payload: UserCreate):
     result = await session.exec(
         select(User).where(
-            (User.username == payload.username) | (User.email == payload.email)
+            _login_matches(payload.username) | _login_matches(payload.email)
         )
     )
 
@@ -48,7 +273,7 @@ async def creating_user(session: AsyncSession, payload: UserCreate):
         username=payload.username,
         full_name=payload.full_name,
         email=payload.email,
-        hashed_password=fake_hash_password(payload.passwd),
+        hashed_password=await run_in_threadpool(hash_password, payload.passwd),
         disabled=False,
     )
     return new_user
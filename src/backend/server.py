@@ -0,0 +1,117 @@
+"""Production entry point: `python -m src.backend.server`.
+
+Runs `src.backend.main:app` under uvicorn with the uvloop event loop (asyncio's
+where uvloop is not installed, as on Windows) and the httptools parser,
+`SERVER_WORKERS` worker processes and the other `SERVER_*` settings. On SIGTERM
+a worker first reports itself not ready on `/ready`, keeps serving for
+`SERVER_DRAIN_DELAY` seconds so load balancers can take it out of rotation,
+then stops accepting connections, waits up to `SERVER_GRACEFUL_TIMEOUT` seconds
+for requests in flight and runs the lifespan shutdown, which flushes the
+background writers and disposes of the engine.
+"""
+
+import importlib.util
+import logging
+import random
+import time
+from types import FrameType
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+from src.backend.config import cfg
+from src.backend.main import app
+from src.backend.sharedtable import SharedLinkTable
+
+logger = logging.getLogger(__name__)
+
+
+class DrainingServer(uvicorn.Server):
+    """uvicorn server that drains before it shuts down and recycles itself.
+
+    After `max_requests` plus up to `max_requests_jitter` requests (drawn once
+    per process so workers do not restart together) the worker exits the same
+    graceful way and the supervisor starts a fresh one.
+    """
+
+    def __init__(
+        self,
+        config: uvicorn.Config,
+        drain_delay: float = 0.0,
+        max_requests: int | None = None,
+        max_requests_jitter: int = 0,
+    ) -> None:
+        super().__init__(config)
+        self.drain_delay = drain_delay
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self._limit: int | None = None
+        self._drain_until: float | None = None
+
+    def handle_exit(self, sig: int, frame: FrameType | None) -> None:
+        app.state.ready = False
+        if self._drain_until is not None or not self.drain_delay:
+            super().handle_exit(sig, frame)
+            return
+        logger.info("Draining for %.1fs before shutting down", self.drain_delay)
+        self._drain_until = time.monotonic() + self.drain_delay
+
+    async def on_tick(self, counter: int) -> bool:
+        if await super().on_tick(counter):
+            return True
+        if self._drain_until is not None and time.monotonic() >= self._drain_until:
+            return True
+        if self.max_requests:
+            if self._limit is None:
+                self._limit = self.max_requests + random.randint(
+                    0, self.max_requests_jitter
+                )
+            if self.server_state.total_requests >= self._limit:
+                logger.info("Served %d requests, recycling the worker", self._limit)
+                app.state.ready = False
+                return True
+        return False
+
+
+def build_server(config=cfg) -> DrainingServer:
+    return DrainingServer(
+        uvicorn.Config(
+            "src.backend.main:app",
+            host=config.server_host,
+            port=config.server_port,
+            workers=config.server_workers,
+            # uvloop is only a dependency off Windows, see pyproject.toml.
+            loop="uvloop" if importlib.util.find_spec("uvloop") else "auto",
+            http="httptools",
+            backlog=config.server_backlog,
+            timeout_keep_alive=config.server_keepalive_timeout,
+            timeout_graceful_shutdown=config.server_graceful_timeout,
+            proxy_headers=True,
+            forwarded_allow_ips=config.server_forwarded_allow_ips,
+            access_log=config.server_access_log,
+        ),
+        drain_delay=config.server_drain_delay,
+        max_requests=config.server_max_requests,
+        max_requests_jitter=config.server_max_requests_jitter,
+    )
+
+
+def main() -> None:
+    if cfg.shared_table_path:
+        # Laid out once here, the workers only map it.
+        SharedLinkTable(
+            cfg.shared_table_path,
+            cfg.shared_table_slots,
+            cfg.shared_table_arena_bytes,
+        ).close()
+    server = build_server()
+    sock = server.config.bind_socket()
+    if server.config.workers > 1 or server.max_requests:
+        # The supervisor restarts recycled and crashed workers.
+        Multiprocess(server.config, target=server.run, sockets=[sock]).run()
+    else:
+        server.run(sockets=[sock])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,407 @@
+import asyncio
+import contextlib
+import fcntl
+import logging
+import mmap
+import os
+import struct
+import zlib
+from collections.abc import Iterator
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.backend.config import cfg
+from src.backend.db.session import listen
+from src.backend.utils import location_header
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"URLSHTB1"
+VERSION = 1
+# magic, version, slots, arena size, arena used, live entries, tombstones,
+# generation (odd while the writer resets the table).
+HEADER = struct.Struct("<8sIIQQQQQ")
+HEADER_SIZE = 64
+COUNTERS = struct.Struct("<QQQ")
+COUNTERS_OFFSET = 24
+GENERATION_OFFSET = 48
+# seq (odd while the writer updates the slot), state, code length, code,
+# location offset in the arena, location length, expiry in epoch microseconds.
+SLOT = struct.Struct("<IBB2x16sQIq4x")
+SEQ = struct.Struct("<I")
+GENERATION = struct.Struct("<Q")
+EMPTY, USED, TOMBSTONE = 0, 1, 2
+MAX_CODE_LENGTH = 16
+MAX_PROBES = 64
+MAX_LOAD = 0.7
+EPOCH = datetime(1970, 1, 1)
+
+CREATED_CHANNEL = "link_created"
+DELETED_CHANNEL = "link_deleted"
+SELECT_LINKS = text(
+    "SELECT short_url, original_url, expires_at FROM link "
+    "WHERE short_url = ANY(CAST(:short_urls AS VARCHAR[]))"
+)
+# The links most likely to be clicked again.
+SELECT_HOT_LINKS = text(
+    "SELECT short_url, original_url, expires_at FROM link "
+    "WHERE expires_at > :now ORDER BY last_accessed_at DESC LIMIT :limit"
+)
+
+
+def to_micros(moment: datetime) -> int:
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+class TableFull(Exception):
+    pass
+
+
+class SharedLinkTable:
+    """Open addressing hash table `short code -> Location header` in a shared mmap.
+
+    Every worker maps the same file; the slots point into an append-only
+    arena holding the already escaped Location bytes. Exactly one process
+    writes (see `SharedTableWriter`), readers never lock: every slot and the
+    table as a whole carry a sequence number the writer makes odd while it
+    changes them, and a read that saw it odd or changed is treated as a miss.
+    """
+
+    def __init__(self, path: str, slots: int, arena_size: int) -> None:
+        self.path = path
+        self.slots = slots
+        self.arena_size = arena_size
+        self._slots_offset = HEADER_SIZE
+        self._arena_offset = HEADER_SIZE + slots * SLOT.size
+        size = self._arena_offset + arena_size
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            # Whoever comes first (the parent process, normally) lays it out.
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            if not self._matches(fd, size):
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+                os.pwrite(
+                    fd,
+                    HEADER.pack(MAGIC, VERSION, slots, arena_size, 0, 0, 0, 0),
+                    0,
+                )
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            self._mm = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+    def _matches(self, fd: int, size: int) -> bool:
+        if os.fstat(fd).st_size != size:
+            return False
+        magic, version, slots, arena_size, *_ = HEADER.unpack(
+            os.pread(fd, HEADER.size, 0)
+        )
+        return (magic, version, slots, arena_size) == (
+            MAGIC,
+            VERSION,
+            self.slots,
+            self.arena_size,
+        )
+
+    def close(self) -> None:
+        self._mm.close()
+
+    def _header(self) -> tuple:
+        return HEADER.unpack_from(self._mm, 0)
+
+    def __len__(self) -> int:
+        return self._header()[5]
+
+    def get(self, short_link: str) -> tuple[bytes, int] | None:
+        """`(location, expires_at in epoch microseconds)` or None on a miss."""
+        code = short_link.encode()
+        if len(code) > MAX_CODE_LENGTH:
+            return None
+        mm = self._mm
+        (generation,) = GENERATION.unpack_from(mm, GENERATION_OFFSET)
+        if generation & 1:
+            return None
+        index = zlib.crc32(code) % self.slots
+        for _ in range(MAX_PROBES):
+            offset = self._slots_offset + index * SLOT.size
+            seq, state, length, stored, location_at, location_length, expires = (
+                SLOT.unpack_from(mm, offset)
+            )
+            if state == EMPTY:
+                return None
+            if state == USED and length == len(code) and stored[:length] == code:
+                start = self._arena_offset + location_at
+                location = mm[start : start + location_length]
+                if (
+                    seq & 1
+                    or SEQ.unpack_from(mm, offset)[0] != seq
+                    or GENERATION.unpack_from(mm, GENERATION_OFFSET)[0] != generation
+                ):
+                    return None
+                return location, expires
+            index = (index + 1) % self.slots
+        return None
+
+    # Writer side, only ever called by the process holding the writer lock.
+
+    def _write_slot(self, offset: int, *fields) -> None:
+        mm = self._mm
+        (seq,) = SEQ.unpack_from(mm, offset)
+        SEQ.pack_into(mm, offset, seq + 1)
+        SLOT.pack_into(mm, offset, seq + 1, *fields)
+        SEQ.pack_into(mm, offset, seq + 2)
+
+    def _set_counters(self, used: int, count: int, tombstones: int) -> None:
+        COUNTERS.pack_into(self._mm, COUNTERS_OFFSET, used, count, tombstones)
+
+    def _find(self, code: bytes) -> tuple[int | None, int | None]:
+        """Offsets of the slot holding `code` and of the first free one."""
+        free = None
+        index = zlib.crc32(code) % self.slots
+        for _ in range(MAX_PROBES):
+            offset = self._slots_offset + index * SLOT.size
+            _, state, length, stored, *_ = SLOT.unpack_from(self._mm, offset)
+            if state == EMPTY:
+                return None, free if free is not None else offset
+            if state == TOMBSTONE and free is None:
+                free = offset
+            if state == USED and length == len(code) and stored[:length] == code:
+                return offset, free
+            index = (index + 1) % self.slots
+        return None, free
+
+    def put(self, short_link: str, location: bytes, expires_at: int) -> None:
+        code = short_link.encode()
+        if len(code) > MAX_CODE_LENGTH:
+            return
+        *_, used, count, tombstones, _ = self._header()
+        existing, free = self._find(code)
+        if existing is not None:
+            _, _, _, _, location_at, location_length, _ = SLOT.unpack_from(
+                self._mm, existing
+            )
+            self._write_slot(
+                existing,
+                USED,
+                len(code),
+                code,
+                location_at,
+                location_length,
+                expires_at,
+            )
+            return
+        if (
+            free is None
+            or count + tombstones + 1 > self.slots * MAX_LOAD
+            or used + len(location) > self.arena_size
+        ):
+            raise TableFull
+        start = self._arena_offset + used
+        self._mm[start : start + len(location)] = location
+        reused = SLOT.unpack_from(self._mm, free)[1] == TOMBSTONE
+        self._write_slot(free, USED, len(code), code, used, len(location), expires_at)
+        self._set_counters(used + len(location), count + 1, tombstones - reused)
+
+    def delete(self, short_link: str) -> None:
+        code = short_link.encode()
+        existing, _ = self._find(code)
+        if existing is None:
+            return
+        fields = SLOT.unpack_from(self._mm, existing)[2:]
+        self._write_slot(existing, TOMBSTONE, *fields)
+        *_, used, count, tombstones, _ = self._header()
+        self._set_counters(used, count - 1, tombstones + 1)
+
+    def reset(self) -> None:
+        (generation,) = GENERATION.unpack_from(self._mm, GENERATION_OFFSET)
+        GENERATION.pack_into(self._mm, GENERATION_OFFSET, generation + 1)
+        self._mm[self._slots_offset : self._arena_offset] = bytes(
+            self._arena_offset - self._slots_offset
+        )
+        self._set_counters(0, 0, 0)
+        GENERATION.pack_into(self._mm, GENERATION_OFFSET, generation + 2)
+
+    def stats(self) -> dict[str, int | float]:
+        *_, used, count, tombstones, generation = self._header()
+        return {
+            "slots": self.slots,
+            "entries": count,
+            "tombstones": tombstones,
+            "load": round((count + tombstones) / self.slots, 4),
+            "arena_bytes": self.arena_size,
+            "arena_used": used,
+            "generation": generation,
+        }
+
+
+class SharedTableWriter:
+    """Keeps `table` filled; runs in every worker, writes in exactly one.
+
+    The worker holding an exclusive flock on `lock_path` is the writer, the
+    others retry every `retry_interval` seconds and take over when it exits.
+    The writer loads the `warm_limit` most recently used links, then follows
+    the `link_created`/`link_deleted` notifications sent by triggers on `link`,
+    so creations and deletions from any worker (and the reaper) reach it.
+    When the table fills up it is reset and warmed again.
+    """
+
+    def __init__(
+        self,
+        table: SharedLinkTable,
+        lock_path: str,
+        warm_limit: int,
+        retry_interval: float = 5.0,
+    ) -> None:
+        self.table = table
+        self.lock_path = lock_path
+        self.warm_limit = warm_limit
+        self.retry_interval = retry_interval
+        self._lock_fd: int | None = None
+        self._created: asyncio.Queue[list[str]] = asyncio.Queue()
+        # Codes deleted while `warm` or `fill` read links, one set per read.
+        self._reads: list[set[str]] = []
+        self._task: asyncio.Task | None = None
+        # Set once this worker, as the writer, filled the table the first time.
+        self.warmed = asyncio.Event()
+        self.resets = 0
+        self.inserted = 0
+        self.deleted = 0
+
+    @property
+    def is_writer(self) -> bool:
+        return self._lock_fd is not None
+
+    def _try_lock(self) -> bool:
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._lock_fd = fd
+        return True
+
+    def _unlock(self) -> None:
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def _on_created(self, connection, pid, channel, payload: str) -> None:
+        self._created.put_nowait(payload.split(","))
+
+    def _on_deleted(self, connection, pid, channel, payload: str) -> None:
+        for short_link in payload.split(","):
+            self.table.delete(short_link)
+            self.deleted += 1
+            for deleted in self._reads:
+                deleted.add(short_link)
+
+    @contextlib.contextmanager
+    def _reading(self) -> Iterator[set[str]]:
+        """Collects the codes deleted while links are read.
+
+        Their rows may come from a snapshot older than the deletion; putting
+        them would bring a deleted link back until it expires.
+        """
+        deleted: set[str] = set()
+        self._reads.append(deleted)
+        try:
+            yield deleted
+        finally:
+            self._reads.remove(deleted)
+
+    def _put_rows(self, rows, deleted: set[str]) -> None:
+        for short_link, original_url, expires_at in rows:
+            if short_link in deleted:
+                continue
+            self.table.put(
+                short_link, location_header(original_url), to_micros(expires_at)
+            )
+            self.inserted += 1
+
+    async def warm(self, engine: AsyncEngine) -> None:
+        self.table.reset()
+        self.resets += 1
+        params = {
+            "now": datetime.now(timezone.utc).replace(tzinfo=None),
+            "limit": min(self.warm_limit, int(self.table.slots * MAX_LOAD) // 2),
+        }
+        with self._reading() as deleted:
+            async with engine.connect() as conn:
+                result = await conn.stream(SELECT_HOT_LINKS, params)
+                async for rows in result.partitions(10_000):
+                    self._put_rows(rows, deleted)
+
+    async def fill(self, engine: AsyncEngine, short_links: list[str]) -> None:
+        with self._reading() as deleted:
+            async with engine.connect() as conn:
+                result = await conn.execute(SELECT_LINKS, {"short_urls": short_links})
+                rows = result.all()
+            try:
+                self._put_rows(rows, deleted)
+            except TableFull:
+                logger.info("Shared link table is full, resetting it")
+                await self.warm(engine)
+
+    async def _write(self, engine: AsyncEngine) -> None:
+        lost = asyncio.Event()
+        callbacks = {
+            CREATED_CHANNEL: self._on_created,
+            DELETED_CHANNEL: self._on_deleted,
+        }
+        async with engine.connect() as conn, listen(conn, callbacks, lost.set):
+            await self.warm(engine)
+            self.warmed.set()
+            logger.info("Shared link table warmed with %d links", len(self.table))
+            while not lost.is_set():
+                with contextlib.suppress(TimeoutError):
+                    short_links = await asyncio.wait_for(self._created.get(), 5)
+                    await self.fill(engine, short_links)
+        logger.warning("Shared link table writer lost its listener")
+
+    async def run(self, engine: AsyncEngine) -> None:
+        while True:
+            if self.is_writer or self._try_lock():
+                try:
+                    await self._write(engine)
+                except Exception:
+                    logger.exception("Shared link table writer failed")
+            await asyncio.sleep(self.retry_interval)
+
+    def start(self, engine: AsyncEngine) -> None:
+        self._created = asyncio.Queue()
+        self._task = asyncio.create_task(self.run(engine), name="shared-table-writer")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        self._unlock()
+
+    def stats(self) -> dict[str, int | float | bool]:
+        return {
+            **self.table.stats(),
+            "writer": self.is_writer,
+            "resets": self.resets,
+            "inserted": self.inserted,
+            "deleted": self.deleted,
+        }
+
+
+def create_shared_writer(config=cfg) -> SharedTableWriter | None:
+    """Writer of the table at `SHARED_TABLE_PATH`, None when it is not set."""
+    if not config.shared_table_path:
+        return None
+    table = SharedLinkTable(
+        config.shared_table_path,
+        config.shared_table_slots,
+        config.shared_table_arena_bytes,
+    )
+    return SharedTableWriter(
+        table, f"{config.shared_table_path}.lock", config.shared_table_warm_limit
+    )
@@ -0,0 +1,127 @@
+import asyncio
+import hashlib
+import string
+from collections import deque
+
+from sqlmodel import func, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.backend.config import cfg
+from src.backend.model import link_short_code_seq
+
+ALPHABET = string.digits + string.ascii_letters
+BASE = len(ALPHABET)
+CODE_LENGTH = 8
+CODE_SPACE = BASE**CODE_LENGTH
+# A freshly allocated code can only clash with a legacy (uuid based) one.
+ALLOCATION_ATTEMPTS = 3
+
+_INDEX = {char: value for value, char in enumerate(ALPHABET)}
+_HALF_BITS = 24
+_HALF_MASK = (1 << _HALF_BITS) - 1
+_ROUNDS = 4
+
+
+def encode(number: int, length: int = CODE_LENGTH) -> str:
+    chars = []
+    while number:
+        number, rem = divmod(number, BASE)
+        chars.append(ALPHABET[rem])
+    return "".join(reversed(chars)).rjust(length, ALPHABET[0])
+
+
+def decode(code: str) -> int:
+    number = 0
+    for char in code:
+        number = number * BASE + _INDEX[char]
+    return number
+
+
+class Scrambler:
+    """Keyed bijection on [0, CODE_SPACE) so sequential ids give unguessable codes.
+
+    A balanced Feistel network over 48 bits is a permutation of [0, 2**48);
+    cycle walking restricts it to the 62**8 values an 8 character code can hold.
+    """
+
+    def __init__(self, key: str) -> None:
+        self._key = hashlib.sha256(key.encode("utf8")).digest()
+
+    def _round(self, value: int, round_no: int) -> int:
+        digest = hashlib.blake2b(
+            value.to_bytes(3, "big") + bytes((round_no,)), key=self._key, digest_size=3
+        ).digest()
+        return int.from_bytes(digest, "big")
+
+    def _permute(self, number: int) -> int:
+        left, right = number >> _HALF_BITS, number & _HALF_MASK
+        for round_no in range(_ROUNDS):
+            left, right = right, left ^ self._round(right, round_no)
+        return (left << _HALF_BITS) | right
+
+    def _unpermute(self, number: int) -> int:
+        left, right = number >> _HALF_BITS, number & _HALF_MASK
+        for round_no in reversed(range(_ROUNDS)):
+            left, right = right ^ self._round(left, round_no), left
+        return (left << _HALF_BITS) | right
+
+    def scramble(self, number: int) -> int:
+        number = self._permute(number)
+        while number >= CODE_SPACE:
+            number = self._permute(number)
+        return number
+
+    def unscramble(self, number: int) -> int:
+        number = self._unpermute(number)
+        while number >= CODE_SPACE:
+            number = self._unpermute(number)
+        return number
+
+
+class ShortCodeAllocator:
+    """Hands out short codes from blocks of ids reserved from `link_short_code_seq`.
+
+    Only refilling a block costs a database round trip; every id is used once,
+    so codes never collide with each other, only (rarely) with legacy codes.
+    """
+
+    def __init__(self, block_size: int, scrambler: Scrambler | None = None) -> None:
+        self.block_size = block_size
+        self.scrambler = scrambler
+        self._ids: deque[int] = deque()
+        self._lock: asyncio.Lock | None = None
+        self.refills = 0
+
+    def code_for(self, number: int) -> str:
+        if self.scrambler is not None:
+            number = self.scrambler.scramble(number)
+        return encode(number)
+
+    async def _refill(self, session: AsyncSession, count: int) -> None:
+        result = await session.exec(
+            select(link_short_code_seq.next_value()).select_from(
+                func.generate_series(1, count)
+            )
+        )
+        self._ids.extend(result.all())
+        self.refills += 1
+
+    async def allocate_many(self, session: AsyncSession, count: int) -> list[str]:
+        if len(self._ids) < count:
+            if self._lock is None:
+                self._lock = asyncio.Lock()
+            async with self._lock:
+                missing = count - len(self._ids)
+                if missing > 0:
+                    await self._refill(session, max(missing, self.block_size))
+        return [self.code_for(self._ids.popleft()) for _ in range(count)]
+
+    async def allocate(self, session: AsyncSession) -> str:
+        (code,) = await self.allocate_many(session, 1)
+        return code
+
+
+allocator = ShortCodeAllocator(
+    block_size=cfg.short_code_block_size,
+    scrambler=Scrambler(cfg.short_code_key) if cfg.short_code_scramble else None,
+)
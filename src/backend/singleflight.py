@@ -0,0 +1,48 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from functools import partial
+
+
+class SingleFlight[K: Hashable, V]:
+    """Coalesces concurrent calls per key: one runs, every caller gets its outcome.
+
+    The call runs as its own task, so a caller that is cancelled while waiting
+    does not cancel it for the others; an exception reaches every caller that
+    was waiting for it. Once the call finished the next one for the key runs
+    afresh, nothing is cached.
+    """
+
+    def __init__(self) -> None:
+        self._flights: dict[K, asyncio.Task[V]] = {}
+        self.calls = 0
+        self.merged = 0
+        self.failures = 0
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: K, call: Callable[[], Awaitable[V]]) -> V:
+        task = self._flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(call())
+            self._flights[key] = task
+            task.add_done_callback(partial(self._done, key))
+            self.calls += 1
+        else:
+            self.merged += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key: K, task: asyncio.Task[V]) -> None:
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        # Also marks the exception retrieved when every caller was cancelled.
+        if not task.cancelled() and task.exception() is not None:
+            self.failures += 1
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "in_flight": len(self._flights),
+            "calls": self.calls,
+            "merged": self.merged,
+            "failures": self.failures,
+        }
@@ -0,0 +1,278 @@
+"""Export and import of the `link` table.
+
+    python -m src.backend.transfer export links.ndjson
+    python -m src.backend.transfer export links.csv --format csv
+    python -m src.backend.transfer import links.ndjson --on-conflict merge
+
+Export reads `link` through a server-side cursor and writes NDJSON or CSV in
+chunks, memory stays flat whatever the table size; `GET /links/export` streams
+the same output for the caller's own links. Import COPYs chunks of the file
+into a temporary staging table and merges each one into `link` by `short_url`:
+`skip` leaves existing links alone, `merge` extends the access and expiry
+times of those pointing to the same url. Rows whose url is already shortened
+under another code are skipped and owners that do not exist are dropped, so
+the deduplication of `Link` holds (see `STAGING_ROWS`).
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import sys
+import time
+from collections.abc import AsyncIterator, Iterable, Iterator, Sequence
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Any, Literal
+from uuid import UUID, uuid4
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.backend.db.session import create_engine, driver_connection
+from src.backend.model import Link
+from src.backend.utils import url_digest
+
+Format = Literal["ndjson", "csv"]
+OnConflict = Literal["skip", "merge"]
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+COLUMNS = (
+    "id",
+    "original_url",
+    "short_url",
+    "created_at",
+    "last_accessed_at",
+    "expires_at",
+    "user_id",
+)
+STAGING_COLUMNS = ("original_url_hash", *COLUMNS)
+CHUNK_SIZE = 10_000
+IMPORT_CHUNK_SIZE = 100_000
+
+CREATE_STAGING = text(
+    """
+    CREATE TEMPORARY TABLE IF NOT EXISTS link_import (
+        original_url_hash BYTEA NOT NULL,
+        id UUID NOT NULL,
+        original_url VARCHAR NOT NULL,
+        short_url VARCHAR NOT NULL,
+        created_at TIMESTAMP NOT NULL,
+        last_accessed_at TIMESTAMP NOT NULL,
+        expires_at TIMESTAMP NOT NULL,
+        user_id UUID
+    )
+    """
+)
+TRUNCATE_STAGING = text("TRUNCATE link_import")
+# One row per short code and per (owner, url), owners that do not exist are
+# dropped, and urls another code already serves for that owner are left out
+# so the partial unique indexes of `Link` never fire.
+STAGING_ROWS = """
+    WITH by_code AS (
+        SELECT DISTINCT ON (s.short_url) s.*, u.id AS owner_id
+        FROM link_import AS s LEFT JOIN "user" AS u ON u.id = s.user_id
+        ORDER BY s.short_url, s.last_accessed_at DESC
+    ), by_url AS (
+        SELECT DISTINCT ON (owner_id, original_url_hash) *
+        FROM by_code
+        ORDER BY owner_id, original_url_hash, last_accessed_at DESC
+    )
+    SELECT s.id, s.original_url, s.original_url_hash, s.short_url, s.created_at,
+        s.last_accessed_at, s.expires_at, s.owner_id
+    FROM by_url AS s
+    WHERE NOT EXISTS (
+        SELECT 1 FROM link AS l
+        WHERE l.original_url_hash = s.original_url_hash
+            AND l.dedup_rank = 0
+            AND l.user_id IS NOT DISTINCT FROM s.owner_id
+            AND l.short_url <> s.short_url
+    )
+"""
+_MERGE = """
+    INSERT INTO link (
+        id, original_url, original_url_hash, short_url, created_at, last_accessed_at,
+        expires_at, user_id
+    )
+    {rows}
+    ON CONFLICT {action}
+"""
+MERGE = {
+    "skip": text(_MERGE.format(rows=STAGING_ROWS, action="DO NOTHING")),
+    "merge": text(
+        _MERGE.format(
+            rows=STAGING_ROWS,
+            action="""(short_url) DO UPDATE SET
+                last_accessed_at = GREATEST(
+                    link.last_accessed_at, EXCLUDED.last_accessed_at
+                ),
+                expires_at = GREATEST(link.expires_at, EXCLUDED.expires_at)
+            WHERE link.original_url_hash = EXCLUDED.original_url_hash""",
+        )
+    ),
+}
+
+
+def _fields(link: Link) -> list[str]:
+    return [
+        str(link.id),
+        link.original_url,
+        link.short_url,
+        link.created_at.isoformat(),
+        link.last_accessed_at.isoformat(),
+        link.expires_at.isoformat(),
+        str(link.user_id) if link.user_id else "",
+    ]
+
+
+def render(links: Sequence[Link], fmt: Format, header: bool = False) -> str:
+    if fmt == "ndjson":
+        return "".join(
+            json.dumps(dict(zip(COLUMNS, _fields(link)))) + "\n" for link in links
+        )
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    if header:
+        writer.writerow(COLUMNS)
+    writer.writerows(_fields(link) for link in links)
+    return out.getvalue()
+
+
+async def export_links(
+    engine: AsyncEngine,
+    fmt: Format,
+    chunk_size: int = CHUNK_SIZE,
+    user_id: UUID | None = None,
+) -> AsyncIterator[str]:
+    """`link` rendered as `fmt`, one string per `chunk_size` rows.
+
+    Only the links of `user_id` when given, every link otherwise.
+    """
+    if fmt == "csv":
+        yield render([], fmt, header=True)
+    statement = select(Link)
+    if user_id is not None:
+        statement = statement.where(Link.user_id == user_id)
+    async with AsyncSession(engine) as session:
+        links = await session.stream_scalars(
+            statement, execution_options={"yield_per": chunk_size}
+        )
+        async for chunk in links.partitions():
+            # The identity map holds rows weakly, rendered chunks are freed.
+            yield render(chunk, fmt)
+
+
+def parse(lines: Iterable[str], fmt: Format) -> Iterator[dict[str, Any]]:
+    if fmt == "ndjson":
+        return (json.loads(line) for line in lines if line.strip())
+    return csv.DictReader(lines)
+
+
+def to_record(row: dict[str, Any]) -> tuple:
+    """Staging row in `STAGING_COLUMNS` order, defaults like a new `Link`."""
+    created_at, expires_at = Link.next_access_times()
+
+    def moment(name: str, default: datetime) -> datetime:
+        value = row.get(name)
+        return datetime.fromisoformat(value) if value else default
+
+    created_at = moment("created_at", created_at)
+    return (
+        url_digest(row["original_url"]),
+        UUID(row["id"]) if row.get("id") else uuid4(),
+        row["original_url"],
+        row["short_url"],
+        created_at,
+        moment("last_accessed_at", created_at),
+        moment("expires_at", expires_at),
+        UUID(row["user_id"]) if row.get("user_id") else None,
+    )
+
+
+async def import_links(
+    engine: AsyncEngine,
+    rows: Iterable[dict[str, Any]],
+    on_conflict: OnConflict = "skip",
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    progress=None,
+) -> tuple[int, int]:
+    """Load `rows` chunk by chunk, returns (rows read, rows written).
+
+    The next chunk is parsed in a thread while the current one is copied and
+    merged. `progress(read, written, seconds)` is called after every chunk.
+    """
+    rows = iter(rows)
+
+    def take() -> list[tuple]:
+        return [to_record(row) for row in islice(rows, chunk_size)]
+
+    read = written = 0
+    started = time.perf_counter()
+    async with engine.connect() as conn:
+        await conn.execute(CREATE_STAGING)
+        await conn.commit()
+        driver = await driver_connection(conn)
+        pending = asyncio.ensure_future(asyncio.to_thread(take))
+        try:
+            while chunk := await pending:
+                pending = asyncio.ensure_future(asyncio.to_thread(take))
+                # Begins the transaction the COPY then runs in.
+                await conn.execute(TRUNCATE_STAGING)
+                await driver.copy_records_to_table(
+                    "link_import", records=chunk, columns=STAGING_COLUMNS
+                )
+                result = await conn.execute(MERGE[on_conflict])
+                await conn.commit()
+                read += len(chunk)
+                written += result.rowcount
+                if progress is not None:
+                    progress(read, written, time.perf_counter() - started)
+        finally:
+            pending.cancel()
+    return read, written
+
+
+def _report(read: int, written: int, seconds: float) -> None:
+    rate = read / seconds if seconds else 0.0
+    print(
+        f"\rread {read} rows, wrote {written} ({rate:,.0f} rows/s)",
+        end="",
+        file=sys.stderr,
+        flush=True,
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    engine = create_engine()
+    try:
+        if args.command == "export":
+            with open(args.path, "w", encoding="utf8", newline="") as out:
+                async for chunk in export_links(engine, args.format):
+                    out.write(chunk)
+        else:
+            with open(args.path, encoding="utf8", newline="") as source:
+                await import_links(
+                    engine,
+                    parse(source, args.format),
+                    args.on_conflict,
+                    args.chunk_size,
+                    _report,
+                )
+            print(file=sys.stderr)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("command", choices=("export", "import"))
+    parser.add_argument("path", type=Path)
+    parser.add_argument("--format", choices=("ndjson", "csv"))
+    parser.add_argument("--on-conflict", choices=("skip", "merge"), default="skip")
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+    args.format = args.format or ("csv" if args.path.suffix == ".csv" else "ndjson")
+    asyncio.run(main(args))
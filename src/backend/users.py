@@ -1,42 +1,90 @@
+import hashlib
+import hmac
 import secrets
 from typing import Annotated
+from uuid import UUID
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from sqlalchemy import event
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from src.backend.deps import SessionDep
+from src.backend.cache import TTLCache
+from src.backend.config import cfg
+from src.backend.db.session import fallback_engine, read_engine
 from src.backend.model import User
 from src.backend.repository import get_user
-from src.backend.utils import fake_hash_password
+from src.backend.utils import hash_password, needs_rehash, verify_password
 
 security = HTTPBasic()
 
+# Successful verifications, keyed by a keyed digest of the credentials so the
+# cache never holds a plaintext password. Users disabled or deleted elsewhere
+# are evicted in every worker by `src.backend.invalidation.CacheInvalidator`.
+credential_cache: TTLCache[bytes, User] = TTLCache(
+    maxsize=cfg.auth_cache_size, ttl=cfg.auth_cache_ttl
+)
+_CREDENTIAL_KEY = secrets.token_bytes(32)
+# Verified against when the login is unknown, so both cases cost one KDF call.
+_DUMMY_HASH = hash_password(secrets.token_hex(16))
+
+
+def credential_key(username: str, password: str) -> bytes:
+    message = b"\0".join((username.lower().encode("utf8"), password.encode("utf8")))
+    return hmac.digest(_CREDENTIAL_KEY, message, hashlib.sha256)
+
+
+def invalidate_user(user_id: UUID) -> int:
+    return credential_cache.invalidate_if(lambda user: user.id == user_id)
+
+
+# Evicts at once in this process, the notification of the commit may come later.
+@event.listens_for(User.disabled, "set")
+def _on_user_disabled(user: User, value: bool, oldvalue, initiator) -> None:
+    if value:
+        invalidate_user(user.id)
+
 
 async def get_current_user(
-    session: SessionDep,
+    request: Request,
     credentials: Annotated[HTTPBasicCredentials, Depends(security)],
 ) -> User | None:
-    current_username_bytes = credentials.username.encode("utf8")
-    user = await get_user(
-        credentials.username,
-        session,
-    )
+    key = credential_key(credentials.username, credentials.password)
+    cached = credential_cache.get(key)
+    if cached is not None:
+        return cached
 
-    correct_username_bytes = user.username.encode("utf8")
-    is_correct_username = secrets.compare_digest(
-        current_username_bytes, correct_username_bytes
-    )
-    current_password_bytes = fake_hash_password(credentials.password).encode("utf8")
-    correct_password_bytes = user.hashed_password.encode("utf-8")
-    is_correct_password = secrets.compare_digest(
-        current_password_bytes, correct_password_bytes
+    # Looked up on short-lived sessions of its own, so no connection is held
+    # through the slow KDF below while the request's sessions are left alone.
+    state = request.app.state
+    engine = read_engine(state)
+    async with AsyncSession(engine) as session:
+        user = await get_user(credentials.username, session)
+    if user is None and (primary := fallback_engine(state, engine)) is not None:
+        # The user may have just been created and not replicated yet.
+        async with AsyncSession(primary) as session:
+            user = await get_user(credentials.username, session)
+    hashed_password = user.hashed_password if user else _DUMMY_HASH
+    is_correct_password = await run_in_threadpool(
+        verify_password, credentials.password, hashed_password
     )
-    if not (is_correct_username and is_correct_password):
+    if user is None or not is_correct_password:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Basic"},
         )
+    if needs_rehash(user.hashed_password):
+        hashed_password = await run_in_threadpool(hash_password, credentials.password)
+        async with AsyncSession(state.engine) as session:
+            user = await session.merge(user)
+            user.hashed_password = hashed_password
+            await session.commit()
+            await session.refresh(user)
+    # A detached copy, committing the request session must not expire it.
+    user = User.model_validate(user.model_dump())
+    credential_cache.set(key, user)
     return user
 
 
@@ -1,9 +1,86 @@
+import base64
+import hashlib
 import secrets
+from functools import lru_cache
+from hashlib import blake2b
+from urllib.parse import quote, urlsplit, urlunsplit
 
 
 def fake_hash_password(password: str):
     return "fakehashed" + password
 
 
+_SCRYPT_N, _SCRYPT_R, _SCRYPT_P = 2**14, 8, 1
+
+
+def hash_password(password: str) -> str:
+    """scrypt hash of `password`. CPU bound, call it from a thread pool."""
+    salt = secrets.token_bytes(16)
+    digest = hashlib.scrypt(
+        password.encode("utf8"), salt=salt, n=_SCRYPT_N, r=_SCRYPT_R, p=_SCRYPT_P
+    )
+    return "$".join(
+        ("scrypt", str(_SCRYPT_N), str(_SCRYPT_R), str(_SCRYPT_P))
+        + (base64.b64encode(salt).decode(), base64.b64encode(digest).decode())
+    )
+
+
+def verify_password(password: str, hashed_password: str) -> bool:
+    """Check `password` against `hash_password` output or a legacy fake hash."""
+    if not hashed_password.startswith("scrypt$"):
+        return compare_digest(
+            fake_hash_password(password).encode("utf8"),
+            hashed_password.encode("utf8"),
+        )
+    _, n, r, p, salt, digest = hashed_password.split("$")
+    candidate = hashlib.scrypt(
+        password.encode("utf8"),
+        salt=base64.b64decode(salt),
+        n=int(n),
+        r=int(r),
+        p=int(p),
+    )
+    return compare_digest(candidate, base64.b64decode(digest))
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    return not hashed_password.startswith(
+        f"scrypt${_SCRYPT_N}${_SCRYPT_R}${_SCRYPT_P}$"
+    )
+
+
 def compare_digest(a: bytes, b: bytes) -> bool:
     return secrets.compare_digest(a, b)
+
+
+_DEFAULT_PORTS = {"http": "80", "https": "443"}
+
+
+def normalize_url(url: str) -> str:
+    """Canonical spelling of `url` used to detect duplicate links.
+
+    Scheme and host are lower-cased, default ports and trailing slashes are
+    dropped and query parameters are sorted; everything else is kept verbatim.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    userinfo, at, hostport = parts.netloc.rpartition("@")
+    host, colon, port = hostport.lower().rpartition(":")
+    if not colon or "]" in port:
+        host, port = hostport.lower(), ""
+    if port and _DEFAULT_PORTS.get(scheme) != port:
+        host = f"{host}:{port}"
+    path = parts.path.rstrip("/") if parts.path != "/" else ""
+    query = "&".join(sorted(parts.query.split("&"))) if parts.query else ""
+    return urlunsplit((scheme, f"{userinfo}{at}{host}", path, query, parts.fragment))
+
+
+def url_digest(url: str) -> bytes:
+    """Fixed-width digest of the normalised url, see `Link.original_url_hash`."""
+    return blake2b(normalize_url(url).encode("utf8"), digest_size=16).digest()
+
+
+@lru_cache(maxsize=10_000)
+def location_header(url: str) -> bytes:
+    """`Location` value redirecting to `url`, escaped like starlette's RedirectResponse."""
+    return quote(url, safe=":/%#?=@[]!$&'()*+,;").encode("latin-1")
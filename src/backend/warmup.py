@@ -0,0 +1,121 @@
+"""Warm-up run by `lifespan` before the worker serves its first request.
+
+Each step is timed and logged; a step that fails or times out is logged and
+skipped, the worker then starts cold rather than not at all.
+
+1. `connections`: open `DB_POOL_MIN_SIZE` connections to the primary (and
+   the replica), so no request pays for a connection handshake.
+2. `statements`: run the redirect and `/details` lookups once on each of
+   them, so asyncpg has them prepared; skipped when
+   `DB_STATEMENT_CACHE_SIZE` is 0.
+3. `link_cache`: load the `WARMUP_LINKS` most recently used links into
+   `link_cache`, hottest last so they are evicted last.
+4. `filter` and `shared_table`: wait up to `WARMUP_TIMEOUT` seconds for the
+   short code filter to be built and, on the worker that writes it, for the
+   shared table to be filled.
+"""
+
+import asyncio
+import contextlib
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from datetime import datetime, timezone
+
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from src.backend.bloom import short_code_filter
+from src.backend.cache import CachedLink, link_cache
+from src.backend.config import cfg
+from src.backend.reads import SELECT_DETAILS, SELECT_REDIRECT
+from src.backend.sharedtable import SELECT_HOT_LINKS
+
+logger = logging.getLogger(__name__)
+
+HOT_STATEMENTS = (SELECT_REDIRECT, SELECT_DETAILS)
+
+
+def _engines(state) -> list[AsyncEngine]:
+    router = getattr(state, "read_router", None)
+    replica = router.replica if router is not None else None
+    return [state.engine] if replica is None else [state.engine, replica]
+
+
+async def _with_connections(
+    state, count: int, use: Callable[[AsyncConnection], Awaitable[None]]
+) -> None:
+    # Held together, so the pool has to open `count` distinct connections.
+    async with contextlib.AsyncExitStack() as stack:
+        for engine in _engines(state):
+            size = getattr(engine.pool, "size", lambda: count)()
+            for _ in range(min(count, size)):
+                await use(await stack.enter_async_context(engine.connect()))
+
+
+async def open_connections(state, count: int) -> None:
+    async def ping(conn: AsyncConnection) -> None:
+        await conn.get_raw_connection()
+
+    await _with_connections(state, count, ping)
+
+
+async def prepare_statements(state, count: int) -> None:
+    async def prepare(conn: AsyncConnection) -> None:
+        driver = (await conn.get_raw_connection()).driver_connection
+        for statement in HOT_STATEMENTS:
+            # Matches no link; asyncpg caches the prepared statement.
+            await driver.fetch(statement, "")  # type: ignore
+
+    await _with_connections(state, count, prepare)
+
+
+async def preload_links(engine: AsyncEngine, limit: int) -> int:
+    params = {"now": datetime.now(timezone.utc).replace(tzinfo=None), "limit": limit}
+    async with engine.connect() as conn:
+        rows = (await conn.execute(SELECT_HOT_LINKS, params)).all()
+    for short_link, original_url, expires_at in reversed(rows):
+        link_cache.set(short_link, CachedLink(original_url, expires_at))
+    return len(rows)
+
+
+async def wait_for_filter() -> None:
+    while not short_code_filter.ready:
+        await asyncio.sleep(0.05)
+
+
+async def wait_for_shared_table(state) -> None:
+    writer = getattr(state, "shared_writer", None)
+    if writer is not None and writer.is_writer:
+        await writer.warmed.wait()
+
+
+async def warm_up(state, config=cfg) -> dict[str, float]:
+    """Run the steps against the app's `state`, returns seconds per step."""
+    count = config.db_pool_min_size
+    steps: dict[str, Callable[[], Awaitable[object]]] = {
+        "connections": lambda: open_connections(state, count),
+        "statements": lambda: prepare_statements(state, count),
+        "link_cache": lambda: preload_links(
+            state.engine, min(config.warmup_links, link_cache.maxsize)
+        ),
+        "filter": wait_for_filter,
+        "shared_table": lambda: wait_for_shared_table(state),
+    }
+    if not config.db_statement_cache_size:
+        # Nothing stays prepared behind a transaction pooler.
+        del steps["statements"]
+    if not config.short_code_filter_enabled:
+        del steps["filter"]
+    timings: dict[str, float] = {}
+    for name, step in steps.items():
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(step(), config.warmup_timeout)
+        except TimeoutError:
+            logger.warning("Warm-up step %s timed out, skipping it", name)
+        except Exception:
+            logger.exception("Warm-up step %s failed, skipping it", name)
+        timings[name] = time.perf_counter() - started
+        logger.info("Warm-up step %s took %.3fs", name, timings[name])
+    logger.info("Warm-up took %.3fs", sum(timings.values()))
+    return timings
@@ -0,0 +1,146 @@
+import asyncio
+import contextlib
+import logging
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.backend.config import cfg
+from src.backend.model import Link
+
+logger = logging.getLogger(__name__)
+
+# The rows are locked in short_url order before they are updated, so workers
+# flushing the same hot links wait for each other instead of deadlocking.
+BULK_TOUCH = text(
+    """
+    UPDATE link
+    SET last_accessed_at = GREATEST(link.last_accessed_at, v.last_accessed_at),
+        expires_at = GREATEST(link.expires_at, v.expires_at)
+    FROM (
+        SELECT link.short_url, t.last_accessed_at, t.expires_at
+        FROM link
+        JOIN unnest(
+            CAST(:short_urls AS VARCHAR[]),
+            CAST(:last_accessed_at AS TIMESTAMP[]),
+            CAST(:expires_at AS TIMESTAMP[])
+        ) AS t(short_url, last_accessed_at, expires_at) USING (short_url)
+        ORDER BY link.short_url
+        FOR UPDATE OF link
+    ) AS v
+    WHERE link.short_url = v.short_url
+    """
+)
+
+
+class AccessTimeBuffer:
+    """Merges per-link access time updates in memory and writes them in bulk.
+
+    Redirects only call `record`; a background task started from `lifespan`
+    flushes the buffer every `flush_interval` seconds or as soon as it holds
+    `max_entries` links, with a single UPDATE per flush.
+    """
+
+    def __init__(self, flush_interval: float, max_entries: int) -> None:
+        self.flush_interval = flush_interval
+        self.max_entries = max_entries
+        self._pending: dict[str, tuple[datetime, datetime]] = {}
+        self._wakeup = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self.recorded = 0
+        self.merged = 0
+        self.flushes = 0
+        self.flushed_links = 0
+        self.failures = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def record(self, short_link: str) -> datetime:
+        """Buffer an access to `short_link` and return its new expiry time."""
+        last_accessed_at, expires_at = Link.next_access_times()
+        if short_link in self._pending:
+            self.merged += 1
+        self._pending[short_link] = (last_accessed_at, expires_at)
+        self.recorded += 1
+        if len(self._pending) >= self.max_entries:
+            self._wakeup.set()
+        return expires_at
+
+    def discard(self, short_link: str) -> None:
+        self._pending.pop(short_link, None)
+
+    def clear(self) -> None:
+        self._pending.clear()
+
+    def _requeue(self, batch: dict[str, tuple[datetime, datetime]]) -> None:
+        # Entries recorded while the batch was in flight are newer, keep them.
+        for short_link, times in batch.items():
+            self._pending.setdefault(short_link, times)
+
+    async def flush(self, engine: AsyncEngine) -> int:
+        if not self._pending:
+            return 0
+        batch, self._pending = self._pending, {}
+        params = {
+            "short_urls": list(batch),
+            "last_accessed_at": [times[0] for times in batch.values()],
+            "expires_at": [times[1] for times in batch.values()],
+        }
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(BULK_TOUCH, params)
+        except BaseException:
+            self.failures += 1
+            self._requeue(batch)
+            raise
+        self.flushes += 1
+        self.flushed_links += len(batch)
+        return len(batch)
+
+    async def run(self, engine: AsyncEngine) -> None:
+        while True:
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            self._wakeup.clear()
+            try:
+                await self.flush(engine)
+            except Exception:
+                logger.exception("Failed to flush %d access times", len(self))
+
+    def start(self, engine: AsyncEngine) -> None:
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self.run(engine), name="access-time-flusher")
+
+    async def stop(self, engine: AsyncEngine) -> None:
+        """Stop the background task and drain whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        try:
+            flushed = await self.flush(engine)
+        except Exception:
+            # The times requeued by `flush` die with the worker; raising here
+            # would only skip the rest of the lifespan shutdown.
+            logger.exception("Failed to drain %d access times", len(self))
+        else:
+            logger.info("Drained %d buffered access times", flushed)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "pending": len(self._pending),
+            "recorded": self.recorded,
+            "merged": self.merged,
+            "flushes": self.flushes,
+            "flushed_links": self.flushed_links,
+            "failures": self.failures,
+        }
+
+
+access_buffer = AccessTimeBuffer(
+    flush_interval=cfg.access_flush_interval_ms / 1000,
+    max_entries=cfg.access_flush_max_entries,
+)
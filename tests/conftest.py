@@ -9,11 +9,16 @@ from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from alembic import command
+from src.backend.analytics import click_recorder
+from src.backend.bloom import short_code_filter
+from src.backend.cache import link_cache
 from src.backend.config import cfg
-from src.backend.db.session import get_session
+from src.backend.db.session import get_read_session, get_session
 from src.backend.main import app
 from src.backend.model import User
+from src.backend.ratelimit import rate_limiter
 from src.backend.users import get_current_active_user
+from src.backend.writebehind import access_buffer
 
 ALEMBIC_CONFIG_PATH = "./alembic.ini"
 
@@ -47,8 +52,23 @@ async def temp_db(temp_db_name: str) -> AsyncGenerator[str]:
         await conn.close()
 
 
+@pytest.fixture(autouse=True)
+def clear_link_cache():
+    link_cache.clear()
+    access_buffer.clear()
+    click_recorder.clear()
+    short_code_filter.clear()
+    rate_limiter.clear()
+    yield
+    link_cache.clear()
+    access_buffer.clear()
+    click_recorder.clear()
+    short_code_filter.clear()
+    rate_limiter.clear()
+
+
 @pytest.fixture(scope="function")
-def test_user():
+async def test_user(apply_migrations, session: AsyncSession):
     fake_users_db: dict[str, dict[str, str | bool]] = {
         "appleseed": {
             "username": cfg.username,
@@ -58,11 +78,15 @@ def test_user():
             "disabled": False,
         },
     }
-    user_data = fake_users_db.get(cfg.username)
-    if user_data:
-        user = User(**user_data)
+    user = User(**fake_users_db[cfg.username])
+    # Persisted, links created on its behalf reference it.
+    session.add(user)
+    await session.commit()
+    await session.refresh(user)
+    # Detached like the users `get_current_user` hands out.
+    session.expunge(user)
     app.dependency_overrides[get_current_active_user] = lambda: user
-    yield
+    yield user
     del app.dependency_overrides[get_current_active_user]
 
 
@@ -70,12 +94,37 @@ def test_user():
 async def test_engine(temp_db: str) -> AsyncGenerator[AsyncEngine, None]:
     """Creates the Async Engine."""
     engine = create_async_engine(temp_db, echo=True)
-    async with engine.begin() as conn:
+    async with engine.connect() as conn:
         await conn.run_sync(__execute_upgrade)
+        await conn.commit()
     yield engine
     await engine.dispose()
 
 
+@pytest.fixture(scope="function")
+async def replica_engine(temp_db_name: str) -> AsyncGenerator[AsyncEngine, None]:
+    """A second migrated database standing in for a read replica."""
+    SYNC_TEST_URL = (
+        f"postgresql://{cfg.db_user}:{cfg.db_pass}@{cfg.db_host}:{cfg.db_port}"
+    )
+    replica_db_name = f"{temp_db_name}_replica"
+    conn = await asyncpg.connect(dsn=SYNC_TEST_URL)  # type: ignore
+    await conn.execute(f'CREATE DATABASE "{replica_db_name}" OWNER "{cfg.db_user}"')  # type: ignore
+    await conn.close()
+
+    engine = create_async_engine(ASYNC_TEST_DB_URL + f"/{replica_db_name}")
+    try:
+        async with engine.connect() as conn:
+            await conn.run_sync(__execute_upgrade)
+            await conn.commit()
+        yield engine
+    finally:
+        await engine.dispose()
+        conn = await asyncpg.connect(dsn=SYNC_TEST_URL)
+        await conn.execute(f'DROP DATABASE "{replica_db_name}"')
+        await conn.close()
+
+
 def __execute_upgrade(connection):
     alembic_cfg = Config("alembic.ini")
     alembic_cfg.attributes["connection"] = connection
@@ -106,6 +155,7 @@ async def client_fixture(
         yield session
 
     app.dependency_overrides[get_session] = get_session_override
+    app.dependency_overrides[get_read_session] = get_session_override
     app.state.engine = test_engine  # create_async_engine(ASYNC_TEST_DB_URL)
     async with AsyncClient(
         transport=ASGITransport(app=app), base_url="http://localhost:8000"
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from src.backend.analytics import (
+    MAX_HEADER_LENGTH,
+    TRY_ROLLUP_LOCK,
+    ClickRecorder,
+    click_recorder,
+    click_rollup,
+)
+from src.backend.config import cfg
+
+
+def test_recorder_drops_events_when_full():
+    recorder = ClickRecorder(queue_size=2, batch_size=10, flush_interval=1)
+
+    assert recorder.record("a", None, "x" * 1000)
+    assert recorder.record("b", "https://example.com/", None)
+    assert not recorder.record("c", None, None)
+
+    assert len(recorder) == 2
+    assert recorder.stats()["dropped"] == 1
+    assert len(recorder._take()[0].user_agent) == MAX_HEADER_LENGTH
+
+
+@pytest.mark.usefixtures("apply_migrations", "test_user")
+async def test_click_stats_read_rollups(client: AsyncClient, test_engine: AsyncEngine):
+    await click_rollup.ensure_partitions(test_engine)
+    response = await client.post(
+        "/shorten", params={"original_url": "https://example.com"}
+    )
+    short_url = response.json()["short_url"]
+    for referer in ("https://a.example/", "https://a.example/", None):
+        headers = {"user-agent": "test-agent"}
+        if referer:
+            headers["referer"] = referer
+        await client.get(f"/{short_url}", headers=headers, follow_redirects=False)
+
+    empty = await client.get(f"/details/{short_url}/stats")
+    assert empty.json()["clicks"] == 0
+
+    assert await click_recorder.flush(test_engine) == 3
+    await click_rollup.rollup(test_engine)
+    stats = (await client.get(f"/details/{short_url}/stats")).json()
+
+    assert stats["clicks"] == 3
+    assert [hour["clicks"] for hour in stats["hourly"]] == [3]
+    assert stats["referrers"] == [{"value": "https://a.example/", "clicks": 2}]
+    assert stats["user_agents"] == [{"value": "test-agent", "clicks": 3}]
+    async with test_engine.connect() as conn:
+        default = await conn.scalar(text("SELECT count(*) FROM click_default"))
+    assert default == 0
+
+
+@pytest.mark.usefixtures("apply_migrations")
+async def test_stop_writes_the_batch_being_collected(test_engine: AsyncEngine):
+    await click_rollup.ensure_partitions(test_engine)
+    recorder = ClickRecorder(queue_size=10, batch_size=10, flush_interval=60)
+    recorder.start(test_engine)
+    for _ in range(3):
+        recorder.record("code", None, None)
+    # The task takes the events off the queue and waits for more.
+    await asyncio.sleep(0.05)
+    assert len(recorder) == 0
+
+    await recorder.stop(test_engine)
+
+    assert recorder.stats()["written"] == 3
+
+
+async def test_stop_survives_a_failed_drain():
+    recorder = ClickRecorder(queue_size=10, batch_size=10, flush_interval=60)
+    recorder.record("code", None, None)
+    unreachable = create_async_engine(
+        f"postgresql+asyncpg://{cfg.db_user}:{cfg.db_pass}@{cfg.db_host}:1/x"
+    )
+    try:
+        await recorder.stop(unreachable)
+    finally:
+        await unreachable.dispose()
+    assert recorder.stats()["failed"] == 1
+
+
+@pytest.mark.usefixtures("apply_migrations")
+async def test_rollup_runs_on_one_worker_at_a_time(test_engine: AsyncEngine):
+    before = click_rollup.stats()
+    async with test_engine.begin() as conn:
+        assert await conn.scalar(TRY_ROLLUP_LOCK)
+        # Another worker holds the lock: this one skips the pass.
+        assert await click_rollup.rollup(test_engine) == 0
+        await click_rollup.ensure_partitions(test_engine)
+    after = click_rollup.stats()
+    assert after["skipped"] == before["skipped"] + 2
+    assert after["failures"] == before["failures"]
@@ -1,13 +1,26 @@
+import asyncio
+import json
+from collections.abc import AsyncGenerator
 from datetime import datetime, timedelta, timezone
 from uuid import uuid4
 
 import pytest
+from fastapi.responses import RedirectResponse
 from httpx import AsyncClient
-from sqlmodel import select
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel import col, select
 from sqlmodel.ext.asyncio.session import AsyncSession
 
+from src.backend import redirect
+from src.backend.cache import link_cache
+from src.backend.config import cfg
+from src.backend.invalidation import CacheInvalidator, cache_invalidator
 from src.backend.model import Link, User, UserCreate
-from src.backend.utils import fake_hash_password
+from src.backend.repository import allocate_codes, insert_links
+from src.backend.users import credential_cache
+from src.backend.utils import fake_hash_password, url_digest, verify_password
+from src.backend.writebehind import AccessTimeBuffer, access_buffer
 
 
 async def test_healthcheck(client: AsyncClient):
@@ -46,6 +59,9 @@ async def test_link_expiration(client: AsyncClient, session: AsyncSession):
 
     assert response_expired.status_code == 410
     assert response_expired.json()["detail"] == "Link has expired"
+    # Deleting is left to the reaper, the redirect does not write.
+    session.expire_all()
+    assert (await session.exec(select(Link).where(Link.short_url == short_url))).one()
 
 
 @pytest.mark.usefixtures("apply_migrations", "test_user")
@@ -138,4 +154,421 @@ async def test_create_user(client: AsyncClient, session: AsyncSession):
     assert test_user.username == name
     assert test_user.email == email
     assert test_user.full_name == full_name
-    assert test_user.hashed_password == fake_hash_password(passwd)
+    assert test_user.hashed_password.startswith("scrypt$")
+    assert verify_password(passwd, test_user.hashed_password)
+
+
+@pytest.mark.usefixtures("apply_migrations", "test_user")
+async def test_link_redirect_cached(client: AsyncClient):
+    url: str = "http://www.example.com"
+    response = await client.post("/shorten", params={"original_url": url})
+    short_url = response.json()["short_url"]
+
+    await client.get(f"/{short_url}", follow_redirects=False)
+    hits = link_cache.hits
+    response2 = await client.get(f"/{short_url}", follow_redirects=False)
+
+    assert response2.status_code == 301
+    assert response2.headers["location"] == url
+    assert link_cache.hits == hits + 1
+
+
+@pytest.mark.usefixtures("apply_migrations", "test_user")
+async def test_raw_redirect_matches_redirect_response(
+    client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+):
+    url = "https://example.com/a path/é?q=1"
+    response = await client.post("/shorten", params={"original_url": url})
+    short_url = response.json()["short_url"]
+    monkeypatch.setattr(
+        redirect,
+        "_REDIRECT_HEADERS",
+        [*redirect._REDIRECT_HEADERS, (b"cache-control", b"public, max-age=60")],
+    )
+
+    response = await client.get(f"/{short_url}", follow_redirects=False)
+
+    expected = RedirectResponse(url, status_code=301)
+    assert response.status_code == 301
+    assert response.headers["location"] == expected.headers["location"]
+    assert response.headers["content-length"] == "0"
+    assert response.headers["cache-control"] == "public, max-age=60"
+
+
+@pytest.mark.usefixtures("apply_migrations", "test_user")
+async def test_delete_invalidates_cache(client: AsyncClient):
+    url: str = "http://www.example.com"
+    response = await client.post("/shorten", params={"original_url": url})
+    short_url = response.json()["short_url"]
+    await client.get(f"/{short_url}", follow_redirects=False)
+
+    await client.delete(f"/{short_url}")
+    response2 = await client.get(f"/{short_url}", follow_redirects=False)
+
+    assert short_url not in link_cache
+    assert response2.status_code == 404
+
+
+@pytest.fixture
+async def invalidator(test_engine: AsyncEngine) -> AsyncGenerator[CacheInvalidator]:
+    cache_invalidator.start(test_engine)
+    try:
+        for _ in range(100):
+            if cache_invalidator.listening:
+                break
+            await asyncio.sleep(0.01)
+        yield cache_invalidator
+    finally:
+        await cache_invalidator.stop()
+
+
+@pytest.mark.usefixtures("apply_migrations", "test_user")
+async def test_link_deleted_elsewhere_leaves_the_cache(
+    client: AsyncClient, invalidator: CacheInvalidator, temp_db: str
+):
+    response = await client.post(
+        "/shorten", params={"original_url": "http://www.example.com"}
+    )
+    short_url = response.json()["short_url"]
+    # Another worker, with its own engine.
+    other = create_async_engine(temp_db)
+    try:
+        for _ in range(3):
+            await client.get(f"/{short_url}", follow_redirects=False)
+        assert short_url in link_cache
+
+        async with other.begin() as conn:
+            await conn.execute(
+                text("DELETE FROM link WHERE short_url = :code"), {"code": short_url}
+            )
+        for _ in range(100):
+            if short_url not in link_cache:
+                break
+            await asyncio.sleep(0.01)
+        response = await client.get(f"/{short_url}", follow_redirects=False)
+    finally:
+        await other.dispose()
+
+    assert response.status_code == 404
+    assert invalidator.stats()["notified"] >= 1
+
+
+@pytest.mark.usefixtures("apply_migrations", "test_user")
+async def test_redirect_access_time_write_behind(
+    client: AsyncClient, session: AsyncSession, test_engine: AsyncEngine
+):
+    url: str = "http://www.example.com"
+    response = await client.post("/shorten", params={"original_url": url})
+    short_url = response.json()["short_url"]
+    created = await session.exec(select(Link).where(Link.short_url == short_url))
+    created_at = created.one().last_accessed_at
+
+    await client.get(f"/{short_url}", follow_redirects=False)
+    await client.get(f"/{short_url}", follow_redirects=False)
+
+    assert len(access_buffer) == 1
+    assert await access_buffer.flush(test_engine) == 1
+    assert len(access_buffer) == 0
+
+    session.expire_all()
+    result = await session.exec(select(Link).where(Link.short_url == short_url))
+    assert result.one().last_accessed_at > created_at
+
+
+@pytest.mark.usefixtures("apply_migrations")
+async def test_concurrent_access_flushes_do_not_deadlock(test_engine: AsyncEngine):
+    urls = [f"https://example.com/{n}" for n in range(500)]
+    codes = await allocate_codes(test_engine, len(urls))
+    await insert_links(
+        test_engine,
+        {url_digest(url): (url, code) for url, code in zip(urls, codes)},
+    )
+    buffers = []
+    # Every worker records the same hot links, in its own order.
+    for order in (
+        codes,
+        codes[::-1],
+        codes[::2] + codes[1::2],
+        codes[1::2] + codes[::2],
+    ):
+        buffer = AccessTimeBuffer(flush_interval=60, max_entries=len(codes) + 1)
+        for code in order:
+            buffer.record(code)
+        buffers.append(buffer)
+
+    flushed = await asyncio.gather(*(buffer.flush(test_engine) for buffer in buffers))
+
+    assert flushed == [len(codes)] * len(buffers)
+
+
+async def test_access_buffer_stop_survives_a_failed_drain():
+    buffer = AccessTimeBuffer(flush_interval=60, max_entries=100)
+    buffer.record("code")
+    unreachable = create_async_engine(
+        f"postgresql+asyncpg://{cfg.db_user}:{cfg.db_pass}@{cfg.db_host}:1/x"
+    )
+    try:
+        await buffer.stop(unreachable)
+    finally:
+        await unreachable.dispose()
+    assert buffer.failures == 1
+    assert len(buffer) == 1
+
+
+@pytest.mark.usefixtures("apply_migrations", "test_user")
+async def test_shorten_same_url_returns_existing_link(
+    client: AsyncClient, session: AsyncSession
+):
+    url: str = "http://www.example.com/same"
+    responses = await asyncio.gather(
+        *(client.post("/shorten", params={"original_url": url}) for _ in range(5))
+    )
+
+    assert {response.status_code for response in responses} == {201}
+    assert len({response.json()["short_url"] for response in responses}) == 1
+    result = await session.exec(select(Link).where(Link.original_url == url))
+    assert len(result.all()) == 1
+
+
+@pytest.mark.usefixtures("apply_migrations", "test_user")
+async def test_shorten_batch(client: AsyncClient, session: AsyncSession):
+    existing = await client.post(
+        "/shorten", params={"original_url": "http://www.example.com/0"}
+    )
+    urls = [f"http://www.example.com/{n % 3}" for n in range(6)]
+
+    response = await client.post("/shorten/batch", json=urls)
+
+    data = response.json()
+    assert response.status_code == 201
+    assert [item["original_url"] for item in data] == urls
+    assert data[0]["short_url"] == existing.json()["short_url"]
+    assert data[0] == data[3]
+    assert len({item["short_url"] for item in data}) == 3
+    result = await session.exec(
+        select(Link).where(col(Link.original_url).in_(set(urls)))
+    )
+    assert len(result.all()) == 3
+
+
+@pytest.mark.usefixtures("apply_migrations", "test_user")
+async def test_shorten_batch_extends_expired_links(
+    client: AsyncClient, session: AsyncSession, test_engine: AsyncEngine
+):
+    urls = ["http://www.example.com/expired", "http://www.example.com/raced"]
+    codes = []
+    for url in urls:
+        response = await client.post("/shorten", params={"original_url": url})
+        codes.append(response.json()["short_url"])
+    yesterday = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=1)
+    for link in (await session.exec(select(Link))).all():
+        link.expires_at = yesterday
+        session.add(link)
+    await session.commit()
+
+    response = await client.post("/shorten/batch", json=urls[:1])
+    # As when the link is created between the lookup and the INSERT.
+    (raced,) = await allocate_codes(test_engine, 1)
+    digest = url_digest(urls[1])
+    user_id = (await session.exec(select(Link.user_id))).first()
+    inserted = await insert_links(test_engine, {digest: (urls[1], raced)}, user_id)
+
+    assert response.json()[0]["short_url"] == codes[0]
+    assert inserted == {digest: codes[1]}
+    for code in codes:
+        response = await client.get(f"/{code}", follow_redirects=False)
+        assert response.status_code == 301
+
+
+@pytest.mark.usefixtures("apply_migrations", "test_user")
+async def test_shorten_batch_ndjson_streamed(
+    client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(cfg, "shorten_batch_stream_threshold", 2)
+    monkeypatch.setattr(cfg, "shorten_batch_chunk_size", 2)
+    urls = [f"http://www.example.com/{n}" for n in range(5)]
+    body = "\n".join(json.dumps({"original_url": url}) for url in urls)
+
+    response = await client.post(
+        "/shorten/batch",
+        content=body,
+        headers={"content-type": "application/x-ndjson"},
+    )
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert response.status_code == 201
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert [line["original_url"] for line in lines] == urls
+
+
+@pytest.mark.usefixtures("apply_migrations", "test_user")
+async def test_shorten_batch_too_large(
+    client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(cfg, "shorten_batch_max_size", 2)
+
+    response = await client.post("/shorten/batch", json=["a", "b", "c"])
+
+    assert response.status_code == 413
+
+
+@pytest.mark.usefixtures("apply_migrations", "test_user")
+async def test_shorten_normalised_url_returns_existing_link(client: AsyncClient):
+    response = await client.post(
+        "/shorten", params={"original_url": "HTTP://Example.com:80/path/?b=2&a=1"}
+    )
+    response2 = await client.post(
+        "/shorten", params={"original_url": "http://example.com/path?a=1&b=2"}
+    )
+
+    assert response2.json()["short_url"] == response.json()["short_url"]
+
+
+async def create_basic_user(session: AsyncSession, username: str, password: str):
+    user = User(
+        username=username,
+        full_name="Jane Doe",
+        email=f"{username}@example.com",
+        hashed_password=fake_hash_password(password),
+        disabled=False,
+    )
+    session.add(user)
+    await session.commit()
+    await session.refresh(user)
+    return user
+
+
+@pytest.mark.usefixtures("apply_migrations")
+async def test_basic_auth_case_insensitive_and_cached(
+    client: AsyncClient, session: AsyncSession
+):
+    credential_cache.clear()
+    name = uuid4().hex[:8]
+    await create_basic_user(session, name, "secret")
+
+    response = await client.get("/users/me", auth=(name.upper(), "secret"))
+    hits = credential_cache.hits
+    response2 = await client.get("/users/me", auth=(f"{name}@example.com", "secret"))
+    response3 = await client.get("/users/me", auth=(name.upper(), "secret"))
+
+    assert response.status_code == 200
+    assert response2.status_code == 200
+    assert response3.status_code == 200
+    assert credential_cache.hits == hits + 1
+
+
+@pytest.mark.usefixtures("apply_migrations")
+async def test_basic_auth_rehashes_legacy_password(
+    client: AsyncClient, session: AsyncSession
+):
+    credential_cache.clear()
+    name = uuid4().hex[:8]
+    user = await create_basic_user(session, name, "secret")
+
+    await client.get("/users/me", auth=(name, "secret"))
+
+    await session.refresh(user)
+    assert user.hashed_password.startswith("scrypt$")
+    assert verify_password("secret", user.hashed_password)
+
+
+@pytest.mark.usefixtures("apply_migrations")
+async def test_basic_auth_wrong_password(client: AsyncClient, session: AsyncSession):
+    credential_cache.clear()
+    name = uuid4().hex[:8]
+    await create_basic_user(session, name, "secret")
+
+    response = await client.get("/users/me", auth=(name, "wrong"))
+    response2 = await client.get("/users/me", auth=("nobody", "secret"))
+
+    assert response.status_code == 401
+    assert response2.status_code == 401
+    assert len(credential_cache) == 0
+
+
+@pytest.mark.usefixtures("apply_migrations")
+async def test_disabling_user_invalidates_credentials(
+    client: AsyncClient, session: AsyncSession
+):
+    credential_cache.clear()
+    name = uuid4().hex[:8]
+    user = await create_basic_user(session, name, "secret")
+    await client.get("/users/me", auth=(name, "secret"))
+    assert len(credential_cache) == 1
+
+    user.disabled = True
+    session.add(user)
+    await session.commit()
+
+    response = await client.get("/users/me", auth=(name, "secret"))
+    assert response.status_code == 400
+
+
+@pytest.mark.usefixtures("apply_migrations")
+async def test_user_disabled_elsewhere_leaves_the_cache(
+    client: AsyncClient,
+    session: AsyncSession,
+    test_engine: AsyncEngine,
+    invalidator: CacheInvalidator,
+):
+    credential_cache.clear()
+    name = uuid4().hex[:8]
+    user = await create_basic_user(session, name, "secret")
+    await client.get("/users/me", auth=(name, "secret"))
+    assert len(credential_cache) == 1
+
+    # Without the ORM, as another worker would, so no event invalidates it here.
+    async with test_engine.begin() as conn:
+        await conn.execute(
+            text('UPDATE "user" SET disabled = true WHERE id = :id'), {"id": user.id}
+        )
+    for _ in range(100):
+        if len(credential_cache) == 0:
+            break
+        await asyncio.sleep(0.01)
+    assert len(credential_cache) == 0
+
+    response = await client.get("/users/me", auth=(name, "secret"))
+    assert response.status_code == 400
+
+
+async def test_pool_stats(client: AsyncClient):
+    response = await client.get("/health/pool")
+
+    assert response.status_code == 200
+    assert {"size", "checked_in", "checked_out", "overflow"} <= response.json().keys()
+
+
+@pytest.mark.usefixtures("apply_migrations")
+async def test_list_user_links_pages_by_cursor(
+    client: AsyncClient, session: AsyncSession, test_user: User
+):
+    urls = [f"https://example.com/{n}" for n in range(5)]
+    await client.post("/shorten/batch", json=urls)
+    expired = (
+        await session.exec(select(Link).where(Link.original_url == urls[0]))
+    ).one()
+    assert expired.user_id == test_user.id
+    expired.expires_at = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(
+        days=1
+    )
+    session.add(expired)
+    await session.commit()
+
+    seen: list[str] = []
+    cursor = None
+    while True:
+        params = {"limit": 2} | ({"cursor": cursor} if cursor else {})
+        page = (await client.get("/users/me/links", params=params)).json()
+        seen += [link["original_url"] for link in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert sorted(seen) == sorted(urls)
+    active = await client.get("/users/me/links", params={"state": "active"})
+    assert len(active.json()["items"]) == 4
+    expired_page = await client.get("/users/me/links", params={"state": "expired"})
+    assert [link["original_url"] for link in expired_page.json()["items"]] == [urls[0]]
+    malformed = await client.get("/users/me/links", params={"cursor": "nope"})
+    assert malformed.status_code == 400
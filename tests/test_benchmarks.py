@@ -0,0 +1,37 @@
+from collections import Counter
+
+from benchmarks.common import Zipf, percentile, summarize
+from benchmarks.compare import compare
+
+
+def test_zipf_is_skewed_and_reproducible():
+    samples = Zipf(1000, seed=1).samples(10_000)
+
+    assert samples == Zipf(1000, seed=1).samples(10_000)
+    assert all(0 <= rank < 1000 for rank in samples)
+    counts = Counter(samples)
+    assert counts[0] > counts[1] > counts[10] > counts.get(500, 0)
+
+
+def test_summarize_percentiles():
+    latencies = [n / 1000 for n in range(1, 101)]
+
+    summary = summarize(latencies, errors=2, elapsed=2.0)
+
+    assert percentile(sorted(latencies), 0.5) == 0.05
+    assert summary["throughput"] == 50.0
+    assert (summary["p50_ms"], summary["p95_ms"], summary["p99_ms"]) == (
+        50.0,
+        95.0,
+        99.0,
+    )
+    assert summary["errors"] == 2
+
+
+def test_compare_flags_regressions():
+    def report(throughput: float, p95: float) -> dict:
+        result = {"throughput": throughput, "p50_ms": 1.0, "p95_ms": p95}
+        return {"results": {"redirect": result | {"p99_ms": p95, "errors": 0}}}
+
+    assert compare(report(1000, 5.0), report(950, 5.2), threshold=0.1) == []
+    assert len(compare(report(1000, 5.0), report(800, 6.0), threshold=0.1)) == 3
@@ -0,0 +1,134 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.backend.bloom import BloomFilter, short_code_filter
+from src.backend.model import Link
+from src.backend.utils import url_digest
+
+
+async def until_ready(timeout: float = 10) -> None:
+    """Fails instead of hanging when the filter never gets built."""
+
+    async def ready() -> None:
+        while not short_code_filter.ready:
+            await asyncio.sleep(0.01)
+
+    await asyncio.wait_for(ready(), timeout)
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=10_000, error_rate=0.01)
+    codes = [uuid4().hex[:8] for _ in range(10_000)]
+    for code in codes:
+        bloom.add(code)
+
+    assert all(code in bloom for code in codes)
+    false_positives = sum(uuid4().hex[:8] in bloom for _ in range(10_000))
+    assert false_positives < 200
+    assert bloom.estimated_error_rate() == pytest.approx(0.01, rel=0.2)
+    assert bloom.memory_bytes < 15_000
+
+
+@pytest.mark.usefixtures("apply_migrations", "test_user")
+async def test_filtered_miss_skips_database(
+    client: AsyncClient, test_engine: AsyncEngine
+):
+    response = await client.post(
+        "/shorten", params={"original_url": "https://example.com"}
+    )
+    short_url = response.json()["short_url"]
+    await short_code_filter.rebuild(test_engine)
+
+    assert (await client.get(f"/{short_url}")).status_code == 301
+    missing = await client.get("/zzzzzzzz")
+    assert missing.status_code == 404
+    assert short_code_filter.definite_misses == 1
+    assert short_code_filter.stats()["codes"] == 1
+
+
+@pytest.mark.usefixtures("apply_migrations", "test_user")
+async def test_code_from_another_worker_misses_until_notified(
+    client: AsyncClient, test_engine: AsyncEngine, temp_db: str
+):
+    await short_code_filter.rebuild(test_engine)
+    url = "https://example.com/other-worker"
+    other = create_async_engine(temp_db)
+    try:
+        async with other.begin() as conn:
+            await conn.execute(
+                text(
+                    "INSERT INTO link (id, original_url, original_url_hash, "
+                    "short_url, created_at, last_accessed_at, expires_at) "
+                    "VALUES (gen_random_uuid(), :url, :digest, 'other', now(), "
+                    "now(), now() + interval '1 day')"
+                ),
+                {"url": url, "digest": url_digest(url)},
+            )
+    finally:
+        await other.dispose()
+
+    # The documented window: committed, but not notified here yet.
+    assert (await client.get("/other")).status_code == 404
+    short_code_filter._on_notify(None, 0, "link_created", "other")
+    assert (await client.get("/other", follow_redirects=False)).status_code == 301
+
+
+@pytest.mark.usefixtures("apply_migrations")
+async def test_filter_learns_codes_inserted_elsewhere(
+    session: AsyncSession, test_engine: AsyncEngine
+):
+    short_code_filter.start(test_engine)
+    try:
+        await until_ready()
+        assert not short_code_filter.might_exist("elsewhere")
+        notified = short_code_filter.notified
+
+        url = "https://example.com/elsewhere"
+        session.add(
+            Link(
+                original_url=url,
+                original_url_hash=url_digest(url),
+                short_url="elsewhere",
+            )
+        )
+        await session.commit()
+        for _ in range(100):
+            if short_code_filter.might_exist("elsewhere"):
+                break
+            await asyncio.sleep(0.01)
+
+        assert short_code_filter.might_exist("elsewhere")
+        assert short_code_filter.notified == notified + 1
+    finally:
+        await short_code_filter.stop()
+
+
+@pytest.mark.usefixtures("apply_migrations")
+async def test_filter_stops_answering_when_listener_dies(test_engine: AsyncEngine):
+    short_code_filter.start(test_engine)
+    try:
+        await until_ready()
+        async with test_engine.connect() as conn:
+            await conn.execute(
+                text(
+                    "SELECT pg_terminate_backend(pid) FROM pg_stat_activity "
+                    "WHERE query LIKE 'LISTEN%' AND pid <> pg_backend_pid()"
+                )
+            )
+        for _ in range(100):
+            if not short_code_filter.ready:
+                break
+            await asyncio.sleep(0.01)
+
+        # Until it is rebuilt every code goes to the database.
+        assert not short_code_filter.ready
+        assert short_code_filter.might_exist("after-loss")
+        await until_ready()
+    finally:
+        await short_code_filter.stop()
@@ -0,0 +1,66 @@
+from src.backend.cache import TTLCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_cache_hit_and_miss():
+    cache: TTLCache[str, str] = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", "1")
+
+    assert cache.get("a") == "1"
+    assert cache.get("b") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_cache_lru_eviction():
+    cache: TTLCache[str, str] = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+
+    assert "b" not in cache
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
+    assert cache.evictions == 1
+
+
+def test_cache_ttl_expiration():
+    clock = FakeClock()
+    cache: TTLCache[str, str] = TTLCache(maxsize=2, ttl=10, clock=clock)
+    cache.set("a", "1")
+    clock.now = 11
+
+    assert cache.get("a") is None
+    assert len(cache) == 0
+    assert cache.expirations == 1
+
+
+def test_cache_invalidate():
+    cache: TTLCache[str, str] = TTLCache(maxsize=2, ttl=10)
+    cache.set("a", "1")
+    cache.invalidate("a")
+    cache.invalidate("missing")
+
+    assert cache.get("a") is None
+
+
+def test_cache_replace_keeps_deadline():
+    clock = FakeClock()
+    cache: TTLCache[str, str] = TTLCache(maxsize=2, ttl=10, clock=clock)
+    cache.set("a", "1")
+    clock.now = 9
+    cache.replace("a", "2")
+    cache.replace("missing", "3")
+
+    assert cache.get("a") == "2"
+    assert "missing" not in cache
+    clock.now = 11
+    assert cache.get("a") is None
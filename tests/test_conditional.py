@@ -0,0 +1,70 @@
+from datetime import timedelta
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import update
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.backend.model import Link
+
+
+async def _shorten(client: AsyncClient, url: str) -> str:
+    response = await client.post("/shorten", params={"original_url": url})
+    return response.json()["short_url"]
+
+
+@pytest.mark.usefixtures("apply_migrations", "test_user")
+async def test_details_revalidates_with_etag(
+    client: AsyncClient, session: AsyncSession
+):
+    short_url = await _shorten(client, "https://example.com/etag")
+
+    first = await client.get(f"/details/{short_url}")
+    etag = first.headers["etag"]
+    assert first.headers["cache-control"] == "no-cache"
+    assert "vary" not in first.headers
+
+    cached = await client.get(
+        f"/details/{short_url}", headers={"if-none-match": f'"other", {etag}'}
+    )
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+
+    # An access moves the version on, the old copy is stale.
+    await session.exec(
+        update(Link)
+        .where(Link.short_url == short_url)
+        .values(last_accessed_at=Link.last_accessed_at + timedelta(seconds=1))
+    )
+    await session.commit()
+    fresh = await client.get(f"/details/{short_url}", headers={"if-none-match": etag})
+    assert fresh.status_code == 200
+    assert fresh.headers["etag"] != etag
+    assert fresh.json()["short_url"] == short_url
+
+
+@pytest.mark.usefixtures("apply_migrations", "test_user")
+async def test_bulk_details(client: AsyncClient):
+    first = await _shorten(client, "https://example.com/a")
+    second = await _shorten(client, "https://example.com/b")
+
+    response = await client.get(
+        "/details", params={"codes": f"{second}, missing,{first},{second}"}
+    )
+
+    assert response.status_code == 200
+    assert [link["short_url"] for link in response.json()] == [second, first]
+    cached = await client.get(
+        "/details",
+        params={"codes": f"{second},{first}"},
+        headers={"if-none-match": response.headers["etag"]},
+    )
+    assert cached.status_code == 304
+    # Duplicates count once.
+    repeated = await client.get("/details", params={"codes": ",".join(["x"] * 2000)})
+    assert repeated.json() == []
+    too_many = await client.get(
+        "/details", params={"codes": ",".join(f"x{i}" for i in range(1001))}
+    )
+    assert too_many.status_code == 422
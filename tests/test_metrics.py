@@ -0,0 +1,50 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.backend.metrics import instrument_engine, statement_labels
+
+
+def test_statement_labels():
+    assert statement_labels("SELECT link.id FROM link WHERE x = $1") == (
+        "SELECT",
+        "link",
+    )
+    assert statement_labels("\n    INSERT INTO click (a) SELECT 1") == (
+        "INSERT",
+        "click",
+    )
+    assert statement_labels("UPDATE link SET a = 1") == ("UPDATE", "link")
+    assert statement_labels("BEGIN") == ("BEGIN", "")
+
+
+@pytest.mark.usefixtures("apply_migrations", "test_user")
+async def test_metrics_endpoint(client: AsyncClient, test_engine: AsyncEngine):
+    instrument_engine(test_engine, "test")
+    response = await client.post(
+        "/shorten", params={"original_url": "https://example.com"}
+    )
+    short_url = response.json()["short_url"]
+    await client.get(f"/{short_url}", follow_redirects=False)
+
+    response = await client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_requests_total{method="GET",route="/{short_link}",status="301"}' in (
+        body
+    )
+    assert 'http_request_duration_seconds_count{method="POST",route="/shorten"}' in (
+        body
+    )
+    assert (
+        'db_statement_duration_seconds_count{engine="test",operation="INSERT",table="link"}'
+        in (body)
+    )
+    # The redirect's lookup runs on the driver connection, it is timed too.
+    assert (
+        'db_statement_duration_seconds_count{engine="test",operation="SELECT",table="link"}'
+        in (body)
+    )
+    assert 'db_pool_checked_out_connections{engine="test"}' in body
@@ -0,0 +1,78 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.backend.ratelimit import (
+    LocalBuckets,
+    Policy,
+    PostgresBuckets,
+    RateLimiter,
+    rate_limiter,
+)
+
+
+async def test_local_buckets_refill_and_stay_bounded(monkeypatch: pytest.MonkeyPatch):
+    now = 100.0
+    monkeypatch.setattr("src.backend.ratelimit.time.monotonic", lambda: now)
+    buckets = LocalBuckets(max_clients=2)
+    policy = Policy(rate=2.0, burst=3)
+
+    assert [await buckets.take("a", policy) for _ in range(3)] == [0.0] * 3
+    assert await buckets.take("a", policy) == pytest.approx(0.5)
+    now += 1.0
+    assert await buckets.take("a", policy) == 0.0
+    assert await buckets.take("a", policy) == 0.0
+    assert await buckets.take("a", policy) > 0
+
+    await buckets.take("b", policy)
+    await buckets.take("c", policy)
+    # "a" was the least recently seen and is back with a full bucket.
+    assert len(buckets) == 2
+    assert await buckets.take("a", policy) == 0.0
+
+
+@pytest.mark.usefixtures("apply_migrations", "test_user")
+async def test_routes_answer_429_with_retry_after(
+    client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setitem(rate_limiter.policies, "shorten", Policy(rate=0.5, burst=2))
+    monkeypatch.setitem(rate_limiter.policies, "users_add", Policy(rate=0.1, burst=1))
+
+    statuses = [
+        (await client.post("/shorten", params={"original_url": url})).status_code
+        for url in ("https://example.com/1", "https://example.com/2", "https://x.org")
+    ]
+    assert statuses == [201, 201, 429]
+    limited = await client.post("/shorten", params={"original_url": "https://y.org"})
+    assert limited.headers["retry-after"] == "2"
+
+    payload = {"username": "x", "passwd": "y", "full_name": "z", "email": "e@e.org"}
+    assert (await client.post("/users/add", json=payload)).status_code == 201
+    limited = await client.post("/users/add", json=payload)
+    assert limited.status_code == 429
+    assert limited.headers["retry-after"] == "10"
+    assert (await client.get("/health/ratelimit")).json()["limited"] == 3
+
+
+@pytest.mark.usefixtures("apply_migrations")
+async def test_postgres_buckets_are_shared(test_engine: AsyncEngine):
+    policy = Policy(rate=1.0, burst=2)
+    workers = [
+        RateLimiter({"shorten": policy}, max_clients=10, backend="postgres")
+        for _ in range(2)
+    ]
+    for limiter in workers:
+        limiter.start(test_engine)
+    try:
+        first, second = (limiter.buckets for limiter in workers)
+        assert await first.take("shorten:ip:1", policy) == 0.0
+        assert await second.take("shorten:ip:1", policy) == 0.0
+        assert await first.take("shorten:ip:1", policy) > 0
+        assert await second.take("shorten:ip:2", policy) == 0.0
+
+        assert isinstance(first, PostgresBuckets)
+        await first.prune(idle_seconds=0)
+        assert await first.take("shorten:ip:1", policy) == 0.0
+    finally:
+        for limiter in workers:
+            await limiter.stop()
@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.backend.model import Link
+from src.backend.reaper import ExpiredLinkReaper
+from src.backend.utils import url_digest
+
+
+@pytest.mark.usefixtures("apply_migrations")
+async def test_reaper_deletes_expired_links_in_batches(
+    session: AsyncSession, test_engine: AsyncEngine
+):
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    for number in range(7):
+        url = f"https://example.com/{number}"
+        session.add(
+            Link(
+                original_url=url,
+                original_url_hash=url_digest(url),
+                short_url=f"code{number:04d}",
+                expires_at=now + timedelta(days=-1 if number < 5 else 1),
+            )
+        )
+    await session.commit()
+    reaper = ExpiredLinkReaper(interval=60, batch_size=2, batch_pause=0)
+
+    assert await reaper.reap(test_engine) == 5
+
+    remaining = await session.exec(select(Link.short_url))
+    assert sorted(remaining.all()) == ["code0005", "code0006"]
+    assert reaper.batches == 3
+    assert reaper.stats()["deleted"] == 5
+    assert await reaper.reap(test_engine) == 0
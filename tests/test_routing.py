@@ -0,0 +1,75 @@
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from src.backend.cache import link_cache
+from src.backend.config import cfg
+from src.backend.db.routing import ReadRouter
+from src.backend.db.session import get_read_session
+from src.backend.main import app
+
+
+@pytest.fixture
+def read_router(test_engine: AsyncEngine, replica_engine: AsyncEngine):
+    router = ReadRouter(
+        test_engine, replica_engine, max_lag=5, check_interval=5, window=10
+    )
+    override = app.dependency_overrides.pop(get_read_session, None)
+    app.state.read_router = router
+    yield router
+    del app.state.read_router
+    if override is not None:
+        app.dependency_overrides[get_read_session] = override
+
+
+@pytest.mark.usefixtures("apply_migrations", "test_user")
+async def test_reads_go_to_replica_outside_write_window(
+    client: AsyncClient, read_router: ReadRouter
+):
+    assert await read_router.check()
+    response = await client.post(
+        "/shorten", params={"original_url": "https://example.com"}
+    )
+    short_url = response.json()["short_url"]
+
+    # Just written, read from the primary.
+    response = await client.get(f"/{short_url}", follow_redirects=False)
+    assert response.status_code == 301
+
+    link_cache.clear()
+    read_router.recent_writes.clear()
+    # The stand-in replica never receives the link, as when another worker
+    # wrote it: the miss is read again from the primary.
+    response = await client.get(f"/{short_url}", follow_redirects=False)
+    assert response.status_code == 301
+    assert read_router.replica_reads == 1
+    assert read_router.replica_misses == 1
+    details = await client.get(f"/details/{short_url}")
+    assert details.json()["short_url"] == short_url
+    assert read_router.replica_misses == 2
+
+    read_router.healthy = False
+    response = await client.get(f"/{short_url}", follow_redirects=False)
+    assert response.status_code == 301
+
+
+async def test_lagging_or_unreachable_replica_is_unhealthy(
+    test_engine: AsyncEngine, replica_engine: AsyncEngine
+):
+    router = ReadRouter(
+        test_engine, replica_engine, max_lag=-1, check_interval=5, window=10
+    )
+    assert not await router.check()
+    assert router.lag == 0
+    assert router.engine_for("code") is test_engine
+
+    unreachable = create_async_engine(
+        f"postgresql+asyncpg://{cfg.db_user}:{cfg.db_pass}@{cfg.db_host}:1/x"
+    )
+    router = ReadRouter(
+        test_engine, unreachable, max_lag=5, check_interval=5, window=10
+    )
+    assert not await router.check()
+    assert router.check_failures == 1
+    assert router.engine_for() is test_engine
+    await unreachable.dispose()
@@ -0,0 +1,46 @@
+import importlib.util
+import signal
+
+import pytest
+from httpx import AsyncClient
+
+from src.backend.main import app
+from src.backend.server import DrainingServer, build_server
+
+
+async def test_ready_reflects_app_state(
+    client: AsyncClient, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(app.state, "ready", False, raising=False)
+    assert (await client.get("/ready")).status_code == 503
+    monkeypatch.setattr(app.state, "ready", True)
+    assert (await client.get("/ready")).json() == {"status": "ready"}
+
+
+def test_server_uses_uvloop_and_httptools():
+    config = build_server().config
+    assert (config.loop, config.http) == ("uvloop", "httptools")
+
+
+def test_server_falls_back_without_uvloop(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name: None)
+    assert build_server().config.loop == "auto"
+
+
+async def test_drain_reports_unready_before_exiting(monkeypatch: pytest.MonkeyPatch):
+    server = DrainingServer(build_server().config, drain_delay=0.05)
+    monkeypatch.setattr(app.state, "ready", True, raising=False)
+    server.handle_exit(signal.SIGTERM, None)
+
+    assert not app.state.ready
+    assert not await server.on_tick(1)
+    monkeypatch.setattr("time.monotonic", lambda: float("inf"))
+    assert await server.on_tick(2)
+
+
+async def test_worker_recycles_after_max_requests():
+    server = DrainingServer(build_server().config, max_requests=10)
+    server.server_state.total_requests = 9
+    assert not await server.on_tick(1)
+    server.server_state.total_requests = 10
+    assert await server.on_tick(2)
@@ -0,0 +1,45 @@
+import pytest
+from sqlalchemy import text
+
+from src.backend.config import cfg
+from src.backend.db.session import InstrumentedPool, create_engine, pool_stats
+from src.backend.reads import SELECT_REDIRECT, fetch
+
+
+async def test_create_engine_from_config(temp_db: str):
+    config = cfg.model_copy(
+        update={"db_pool_size": 3, "db_max_overflow": 2, "db_echo": False}
+    )
+    engine = create_engine(config)
+    try:
+        async with engine.connect() as conn:
+            await conn.exec_driver_sql("SELECT 1")
+            stats = pool_stats(engine)
+            assert stats["checked_out"] == 1
+    finally:
+        await engine.dispose()
+
+    assert isinstance(engine.pool, InstrumentedPool)
+    assert engine.pool.size() == 3
+    assert engine.pool._max_overflow == 2
+    assert engine.echo is False
+    assert stats["acquisitions"] == 1
+    assert engine.url.query["prepared_statement_cache_size"] == str(
+        cfg.db_statement_cache_size
+    )
+
+
+@pytest.mark.usefixtures("apply_migrations")
+async def test_statement_cache_size_zero_prepares_nothing():
+    # Behind pgbouncer in transaction mode, no statement may stay prepared.
+    config = cfg.model_copy(update={"db_pool_size": 1, "db_statement_cache_size": 0})
+    engine = create_engine(config)
+    try:
+        assert await fetch(engine, SELECT_REDIRECT, "missing") == []
+        async with engine.connect() as conn:
+            prepared = (
+                await conn.scalars(text("SELECT statement FROM pg_prepared_statements"))
+            ).all()
+    finally:
+        await engine.dispose()
+    assert SELECT_REDIRECT not in prepared
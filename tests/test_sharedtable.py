@@ -0,0 +1,153 @@
+import asyncio
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.backend.main import app
+from src.backend.model import Link
+from src.backend.sharedtable import (
+    SharedLinkTable,
+    SharedTableWriter,
+    TableFull,
+    to_micros,
+)
+from src.backend.utils import url_digest
+
+LATER = to_micros(datetime.now() + timedelta(days=1))
+
+
+def test_readers_see_the_writers_entries(tmp_path: Path):
+    path = str(tmp_path / "links")
+    writer = SharedLinkTable(path, slots=64, arena_size=4096)
+    # A second mapping of the file stands in for another worker.
+    reader = SharedLinkTable(path, slots=64, arena_size=4096)
+
+    writer.put("abc", b"https://example.com/a", LATER)
+    writer.put("abd", b"https://example.com/b", LATER)
+    assert reader.get("abc") == (b"https://example.com/a", LATER)
+    assert reader.get("abd") == (b"https://example.com/b", LATER)
+    assert reader.get("abe") is None
+
+    writer.put("abc", b"https://example.com/a", LATER + 1)
+    assert reader.get("abc") == (b"https://example.com/a", LATER + 1)
+    writer.delete("abc")
+    assert reader.get("abc") is None
+    assert reader.get("abd") is not None
+    assert reader.stats()["entries"] == 1
+    assert reader.stats()["tombstones"] == 1
+
+    writer.reset()
+    assert reader.get("abd") is None
+    assert reader.stats()["generation"] == 2
+
+
+def test_full_table_refuses_inserts(tmp_path: Path):
+    table = SharedLinkTable(str(tmp_path / "links"), slots=10, arena_size=64)
+    for n in range(7):
+        table.put(f"c{n}", b"u", LATER)
+    with pytest.raises(TableFull):
+        table.put("c7", b"u", LATER)
+
+    table.reset()
+    table.put("long", b"x" * 64, LATER)
+    with pytest.raises(TableFull):
+        table.put("more", b"x", LATER)
+
+
+def test_only_one_writer_holds_the_lock(tmp_path: Path):
+    table = SharedLinkTable(str(tmp_path / "links"), slots=16, arena_size=64)
+    lock_path = str(tmp_path / "links.lock")
+    first = SharedTableWriter(table, lock_path, warm_limit=10)
+    second = SharedTableWriter(table, lock_path, warm_limit=10)
+
+    assert first._try_lock()
+    assert not second._try_lock()
+    first._unlock()
+    assert second._try_lock()
+    second._unlock()
+
+
+@pytest.mark.usefixtures("apply_migrations")
+async def test_writer_follows_creations_and_deletions(
+    tmp_path: Path, session: AsyncSession, test_engine: AsyncEngine
+):
+    url = "https://example.com/hot"
+    session.add(
+        Link(original_url=url, original_url_hash=url_digest(url), short_url="hot")
+    )
+    await session.commit()
+    table = SharedLinkTable(str(tmp_path / "links"), slots=1024, arena_size=65536)
+    writer = SharedTableWriter(table, str(tmp_path / "links.lock"), warm_limit=100)
+
+    writer.start(test_engine)
+    try:
+        await asyncio.wait_for(writer.warmed.wait(), 10)
+        assert table.get("hot")[0] == b"https://example.com/hot"
+
+        url = "https://example.com/new path"
+        session.add(
+            Link(original_url=url, original_url_hash=url_digest(url), short_url="new")
+        )
+        await session.commit()
+        for _ in range(100):
+            if table.get("new") is not None:
+                break
+            await asyncio.sleep(0.01)
+        assert table.get("new")[0] == b"https://example.com/new%20path"
+
+        link = (await session.exec(select(Link).where(Link.short_url == "hot"))).one()
+        await session.delete(link)
+        await session.commit()
+        for _ in range(100):
+            if table.get("hot") is None:
+                break
+            await asyncio.sleep(0.01)
+        assert table.get("hot") is None
+        assert writer.stats()["writer"]
+    finally:
+        await writer.stop()
+        table.close()
+
+
+@pytest.mark.usefixtures("apply_migrations")
+async def test_redirect_reads_the_shared_table(client: AsyncClient, tmp_path: Path):
+    table = SharedLinkTable(str(tmp_path / "links"), slots=16, arena_size=256)
+    table.put("shared", b"https://example.com/shared", LATER)
+    table.put("stale", b"https://example.com/stale", to_micros(datetime.now()) - 1)
+    app.state.shared_links = table
+    try:
+        response = await client.get("/shared")
+        assert response.status_code == 301
+        assert response.headers["location"] == "https://example.com/shared"
+        # An expired entry falls through to the database.
+        assert (await client.get("/stale")).status_code == 404
+    finally:
+        app.state.shared_links = None
+        table.close()
+
+
+def test_rows_read_before_a_deletion_are_not_put_back(tmp_path: Path):
+    table = SharedLinkTable(str(tmp_path / "links"), slots=16, arena_size=256)
+    writer = SharedTableWriter(table, str(tmp_path / "links.lock"), warm_limit=10)
+    expires_at = datetime.now() + timedelta(days=1)
+
+    with writer._reading() as deleted:
+        # The notification arrives while the rows are read.
+        writer._on_deleted(None, 0, "link_deleted", "gone")
+        writer._put_rows(
+            [
+                ("gone", "https://example.com/a", expires_at),
+                ("kept", "https://example.com/b", expires_at),
+            ],
+            deleted,
+        )
+
+    assert table.get("gone") is None
+    assert table.get("kept") is not None
+    assert writer._reads == []
+    table.close()
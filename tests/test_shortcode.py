@@ -0,0 +1,58 @@
+import pytest
+from pydantic import ValidationError
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.backend.config import ConfigBase
+from src.backend.shortcode import (
+    CODE_LENGTH,
+    CODE_SPACE,
+    Scrambler,
+    ShortCodeAllocator,
+    decode,
+    encode,
+)
+
+
+def test_encode_decode_roundtrip():
+    for number in (0, 1, 61, 62, 123456789, CODE_SPACE - 1):
+        code = encode(number)
+        assert len(code) == CODE_LENGTH
+        assert decode(code) == number
+
+
+def test_scrambler_is_bijective():
+    scrambler = Scrambler("secret")
+    scrambled = [scrambler.scramble(number) for number in range(1, 2000)]
+
+    assert len(set(scrambled)) == len(scrambled)
+    assert all(0 <= number < CODE_SPACE for number in scrambled)
+    assert [scrambler.unscramble(number) for number in scrambled] == list(
+        range(1, 2000)
+    )
+    assert scrambled != sorted(scrambled)
+
+
+def test_scrambler_depends_on_key():
+    assert Scrambler("a").scramble(42) != Scrambler("b").scramble(42)
+
+
+@pytest.mark.usefixtures("apply_migrations")
+async def test_allocator_reserves_blocks(session: AsyncSession):
+    scrambler = Scrambler("secret")
+    allocator = ShortCodeAllocator(block_size=10, scrambler=scrambler)
+
+    codes = [await allocator.allocate(session) for _ in range(25)]
+
+    assert len(set(codes)) == 25
+    assert allocator.refills == 3
+    ids = sorted(scrambler.unscramble(decode(code)) for code in codes)
+    assert ids == list(range(1, 26))
+
+
+@pytest.mark.parametrize("key", ["", "url-shortener"])
+def test_scrambling_requires_a_secret_key(key: str):
+    with pytest.raises(ValidationError, match="SHORT_CODE_KEY"):
+        ConfigBase(short_code_key=key)
+    assert (
+        ConfigBase(short_code_key=key, short_code_scramble=False).short_code_key == key
+    )
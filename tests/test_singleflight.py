@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+from httpx import AsyncClient
+
+from src.backend.reads import details_flight
+from src.backend.repository import shorten_flight
+from src.backend.singleflight import SingleFlight
+
+
+async def test_concurrent_calls_share_one_execution():
+    flight: SingleFlight[str, int] = SingleFlight()
+    executions = 0
+
+    async def call() -> int:
+        nonlocal executions
+        executions += 1
+        await asyncio.sleep(0.01)
+        return executions
+
+    results = await asyncio.gather(*(flight.do("key", call) for _ in range(10)))
+
+    assert results == [1] * 10
+    assert flight.stats() == {"in_flight": 0, "calls": 1, "merged": 9, "failures": 0}
+    # Finished calls are not cached.
+    assert await flight.do("key", call) == 2
+
+
+async def test_errors_reach_every_caller():
+    flight: SingleFlight[str, int] = SingleFlight()
+
+    async def call() -> int:
+        await asyncio.sleep(0.01)
+        raise LookupError("boom")
+
+    results = await asyncio.gather(
+        *(flight.do("key", call) for _ in range(3)), return_exceptions=True
+    )
+
+    assert all(isinstance(result, LookupError) for result in results)
+    assert flight.failures == 1
+
+
+async def test_cancelled_caller_does_not_cancel_the_call():
+    flight: SingleFlight[str, str] = SingleFlight()
+    release = asyncio.Event()
+
+    async def call() -> str:
+        await release.wait()
+        return "done"
+
+    first = asyncio.create_task(flight.do("key", call))
+    second = asyncio.create_task(flight.do("key", call))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+
+    assert await second == "done"
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+
+@pytest.mark.usefixtures("apply_migrations", "test_user")
+async def test_concurrent_requests_are_coalesced(client: AsyncClient):
+    url = "https://example.com/viral"
+    calls, merged = shorten_flight.calls, shorten_flight.merged
+    created = await asyncio.gather(
+        *(client.post("/shorten", params={"original_url": url}) for _ in range(5))
+    )
+    assert len({response.json()["short_url"] for response in created}) == 1
+    assert shorten_flight.calls - calls + shorten_flight.merged - merged == 5
+    assert shorten_flight.merged > merged
+
+    short_url = created[0].json()["short_url"]
+    merged = details_flight.merged
+    details = await asyncio.gather(
+        *(client.get(f"/details/{short_url}") for _ in range(5))
+    )
+    assert {response.json()["original_url"] for response in details} == {url}
+    assert details_flight.merged > merged
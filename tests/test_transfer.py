@@ -0,0 +1,99 @@
+import csv
+import io
+import json
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.backend.model import Link
+from src.backend.transfer import export_links, import_links, parse
+from src.backend.utils import url_digest
+
+URLS = [f"https://example.com/{n}" for n in range(25)]
+
+
+@pytest.mark.usefixtures("apply_migrations", "test_user")
+async def test_export_streams_the_callers_links(
+    client: AsyncClient, session: AsyncSession
+):
+    await client.post("/shorten/batch", json=URLS)
+    # Somebody else's link is not exported.
+    other = "https://example.com/other"
+    session.add(
+        Link(original_url=other, original_url_hash=url_digest(other), short_url="other")
+    )
+    await session.commit()
+
+    ndjson = await client.get("/links/export")
+    rows = [json.loads(line) for line in ndjson.text.splitlines()]
+    assert ndjson.headers["content-type"] == "application/x-ndjson"
+    assert sorted(row["original_url"] for row in rows) == sorted(URLS)
+
+    exported = await client.get("/links/export", params={"format": "csv"})
+    reader = csv.DictReader(io.StringIO(exported.text))
+    assert sorted(row["short_url"] for row in reader) == sorted(
+        row["short_url"] for row in rows
+    )
+
+
+@pytest.mark.usefixtures("apply_migrations", "test_user")
+async def test_import_restores_an_export(
+    client: AsyncClient, session: AsyncSession, test_engine: AsyncEngine
+):
+    await client.post("/shorten/batch", json=URLS)
+    dump = "".join([chunk async for chunk in export_links(test_engine, "csv", 10)])
+    await session.exec(delete(Link))  # type: ignore
+    await session.commit()
+    progress = []
+
+    read, written = await import_links(
+        test_engine,
+        parse(io.StringIO(dump, newline=""), "csv"),
+        chunk_size=10,
+        progress=lambda *report: progress.append(report),
+    )
+
+    assert (read, written) == (25, 25)
+    assert [report[:2] for report in progress] == [(10, 10), (20, 20), (25, 25)]
+    links = (await session.exec(select(Link))).all()
+    assert sorted(link.original_url for link in links) == sorted(URLS)
+    assert all(link.user_id is not None for link in links)
+
+    again = await import_links(test_engine, parse(io.StringIO(dump), "csv"))
+    assert again == (25, 0)
+
+
+@pytest.mark.usefixtures("apply_migrations")
+async def test_import_merges_and_keeps_urls_unique(
+    session: AsyncSession, test_engine: AsyncEngine
+):
+    rows = [
+        {"original_url": "https://example.com/a", "short_url": "a1"},
+        # Same url under another code and the same code twice: one link each.
+        {"original_url": "https://example.com/a", "short_url": "a2"},
+        {"original_url": "https://example.com/b", "short_url": "b1"},
+        {"original_url": "https://example.com/b", "short_url": "b1"},
+        # The owner does not exist here.
+        {
+            "original_url": "https://example.com/c",
+            "short_url": "c1",
+            "user_id": "00000000-0000-0000-0000-000000000001",
+        },
+    ]
+    assert await import_links(test_engine, rows) == (5, 3)
+
+    later = {
+        "original_url": "https://example.com/b",
+        "short_url": "b1",
+        "expires_at": "2100-01-01T00:00:00",
+    }
+    assert await import_links(test_engine, [later], on_conflict="merge") == (1, 1)
+    link = (await session.exec(select(Link).where(Link.short_url == "b1"))).one()
+    assert link.expires_at.year == 2100
+    assert (
+        await session.exec(select(Link).where(Link.short_url == "c1"))
+    ).one().user_id is None
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.backend.cache import link_cache
+from src.backend.config import cfg
+from src.backend.db.session import pool_stats
+from src.backend.model import Link
+from src.backend.reads import SELECT_REDIRECT
+from src.backend.utils import url_digest
+from src.backend.warmup import warm_up
+
+
+@pytest.mark.usefixtures("apply_migrations")
+async def test_warm_up_opens_connections_and_preloads_hot_links(
+    session: AsyncSession, test_engine: AsyncEngine
+):
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    for number in range(4):
+        url = f"https://example.com/{number}"
+        session.add(
+            Link(
+                original_url=url,
+                original_url_hash=url_digest(url),
+                short_url=f"warm{number}",
+                last_accessed_at=now - timedelta(minutes=number),
+                # The last one expired and is not loaded.
+                expires_at=now + timedelta(days=-1 if number == 3 else 1),
+            )
+        )
+    await session.commit()
+    config = cfg.model_copy(
+        update={
+            "db_pool_min_size": 3,
+            "warmup_links": 2,
+            "short_code_filter_enabled": False,
+        }
+    )
+
+    timings = await warm_up(SimpleNamespace(engine=test_engine), config)
+
+    assert list(timings) == ["connections", "statements", "link_cache", "shared_table"]
+    assert pool_stats(test_engine)["checked_in"] == 3
+    assert "warm0" in link_cache and "warm1" in link_cache
+    assert "warm2" not in link_cache and "warm3" not in link_cache
+    async with test_engine.connect() as conn:
+        prepared = await conn.scalars(
+            text("SELECT statement FROM pg_prepared_statements")
+        )
+        assert SELECT_REDIRECT in prepared.all()